@@ -26,12 +26,27 @@ import time
 import os
 import requests
 import secrets
+from functools import lru_cache
 
 from src.process_data import load_species_data, load_homo_sapiens, load_name_table, cm_to_in,load_species_with_taxonomy
 from src.wiki import get_blurb, get_commons_thumb      
 from src.utils import assign_random_depth
 from src.taxonomic_tree import build_taxonomy_elements
 from src.image_cache import url_to_stem
+from src import http_client
+from src import single_flight
+from src import bg_jobs
+from src import negative_cache
+from src import image_pack
+from src import image_variants
+from src import r2_manifest
+from src import species_assets
+from src.species_index import SpeciesIndex
+from src.filter_index import FilterIndex
+from src.size_index import SizeIndex
+from src.depth_bounds import DepthBounds
+from src.taxonomy_index import TaxonomyIndex
+from src.name_search import NameSearch
     
 from src.fav_utils.routes_fav import register_fav_routes
 from src.fav_utils.scoring import top_species, record_weekly_winner_if_missing
@@ -118,6 +133,7 @@ for p in glob.glob("assets/species/humanscale/*.webp"):
 # ---------- Load & prep dataframe ---------------------------------------------------
 df_full = load_species_with_taxonomy()  # heavy table + taxonomic data (cached in process_data)
 df_light = load_name_table()     # 5‑col view on the cached frame   
+species_idx = SpeciesIndex(df_full)   # "Genus Species" → row position (O(1) lookups)
 
 # --- Popular-species whitelist -----------------------------------
 popular_df   = pd.read_csv("data/processed/popular_species.csv")        # <-- path in /mnt/data
@@ -127,6 +143,19 @@ popular_set  = set(popular_df["Genus"] + " " + popular_df["Species"])
 transp_df  = pd.read_csv("data/processed/transparency_blacklist.csv")
 transp_set = set(transp_df["Genus"] + " " + transp_df["Species"])
 
+# Species → image / sound / citation / chat (python -m src.species_assets)
+species_assets.load()
+
+# Per-row wiki/popular/size/depth bitmaps + memoised filter → positions
+filter_idx = FilterIndex(df_full, popular_set, species_idx)
+size_idx   = SizeIndex(df_full, filter_idx, species_idx)   # small → large ranks
+depth_bounds = DepthBounds(filter_idx)    # static bounds table + per-filter eligible ids
+
+# Typeahead index over the dropdown labels (common + scientific names)
+name_search = NameSearch(df_light["dropdown_label"].tolist(),
+                         fuzzy=os.getenv("NAME_SEARCH_FUZZY", "1") == "1")
+_dd_labels = df_light["dropdown_label"].to_numpy(dtype=object)
+
 gc.collect() 
 
 # --- Common-name dictionary ------------------------------------------
@@ -148,6 +177,11 @@ def _label_with_common(taxon: str) -> str:
     return f"{taxon} ({cmn})" if cmn else taxon
 
 
+# order → family → genus → species cascade: node ranges + per-filter counts
+taxonomy_idx = TaxonomyIndex(filter_idx, labeler=_label_with_common)
+taxonomy_idx.warm()      # common wiki/pop combos ready before workers fork
+
+
 
 # ---------- Build Dash app ----------------------------------------------------------
 # external sheets (font + bootstrap)
@@ -217,19 +251,222 @@ def _stems(gs: str, w: int):
         url_to_stem(f"{title}_{w}_raw"),   # raw
     )
 
+if USE_R2:
+    r2_manifest.start(R2_PUBLIC)        # existence checks become set lookups
+
 def _r2_has(name: str) -> bool:
+    return _r2_has_path(f"image_cache/{name}")
+
+def _r2_has_path(rel_path: str) -> bool:
+    known = r2_manifest.has(rel_path)
+    if known is not None:
+        return known
     try:
-        r = requests.head(f"{R2_PUBLIC}/image_cache/{name}", timeout=2)
+        r = http_client.head(f"{R2_PUBLIC}/{rel_path.lstrip('/')}", timeout=2)
         return r.status_code == 200
     except Exception:
         return False
 
-def _r2_has_path(rel_path: str) -> bool:
+
+# --- client-side search bundle (python -m src.build_search_bundle) ---
+SEARCH_BUNDLE_DIR = os.path.abspath(os.getenv("SEARCH_BUNDLE_DIR", "data/processed/search"))
+
+def _search_bundle_url():
     try:
-        r = requests.head(f"{R2_PUBLIC}/{rel_path.lstrip('/')}", timeout=2)
-        return r.status_code == 200
+        with open(os.path.join(SEARCH_BUNDLE_DIR, "manifest.json")) as fh:
+            name = json.load(fh)["file"]
     except Exception:
-        return False
+        return None          # no bundle → typeahead stays on the server
+    return f"/search-bundle/{name}" if os.path.exists(os.path.join(SEARCH_BUNDLE_DIR, name)) else None
+
+SEARCH_BUNDLE_URL = _search_bundle_url()
+
+
+@app.server.route("/search-bundle/<path:fname>")
+def search_bundle(fname):
+    """Content-hashed name index, served from its precompressed .br/.gz twin."""
+    if not fname.startswith("names.") or not fname.endswith(".json"):
+        abort(404)
+    accept = request.headers.get("Accept-Encoding", "")
+    for enc, ext in (("br", ".br"), ("gzip", ".gz"), (None, "")):
+        path = os.path.join(SEARCH_BUNDLE_DIR, fname + ext)
+        if (enc is None or enc in accept) and os.path.exists(path):
+            break
+    else:
+        abort(404)
+
+    resp = send_from_directory(SEARCH_BUNDLE_DIR, fname + ext,
+                               mimetype="application/json", conditional=True)
+    if enc:
+        resp.headers["Content-Encoding"] = enc    # flask-compress leaves it alone
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
+
+@app.server.route("/nav/size-order")
+def size_order():
+    """Small → large navigation payload for assets/size_nav.js (one per wiki/pop combo)."""
+    wiki_on = request.args.get("wiki") == "1"
+    pop_on  = request.args.get("pop")  == "1"
+    raw, etag = size_idx.client_payload(wiki_on, pop_on)
+
+    # flask-compress rewrites the tag to "<etag>:gzip" → compare the prefix
+    sent = {t.split(":", 1)[0] for t in request.if_none_match.as_set()}
+    if etag in sent:
+        resp = server.response_class(status=304)
+    else:
+        resp = server.response_class(raw, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "public, max-age=3600"
+    return resp
+
+
+@app.server.route("/nav/size-current")
+def size_current_info():
+    """Length / order of one species outside the size-order payload (assets/size_nav.js)."""
+    resp = server.response_class(json.dumps(size_idx.current(request.args.get("gs", ""))),
+                                 mimetype="application/json")
+    resp.headers["Cache-Control"] = "public, max-age=3600"
+    return resp
+
+
+@app.server.route("/nav/species-table")
+def species_table():
+    """Static depth-bounds table for the depth navigation (ids → name, shallow, deep)."""
+    etag = depth_bounds.table_etag
+    sent = {t.split(":", 1)[0] for t in request.if_none_match.as_set()}
+    if etag in sent:
+        resp = server.response_class(status=304)
+    else:
+        resp = server.response_class(depth_bounds.table_json, mimetype="application/json")
+    resp.set_etag(etag)
+    # ?v=<t> from the eligible-bounds payload: that version never changes
+    if request.args.get("v") == etag:
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+# /stats exposes worker internals: localhost only (e.g. `fly ssh console`,
+# then curl), or anywhere with STATS_TOKEN sent as the X-Stats-Token header
+STATS_TOKEN = os.getenv("STATS_TOKEN", "")
+
+@app.server.route("/stats")
+def worker_stats():
+    """Per-worker counters: single-flight coalescing, lru hit rates, persisted misses."""
+    token = request.headers.get("X-Stats-Token", "")
+    if not (request.remote_addr in ("127.0.0.1", "::1")
+            or (STATS_TOKEN and secrets.compare_digest(token, STATS_TOKEN))):
+        abort(404)
+    body = {
+        "pid": os.getpid(),
+        "single_flight": single_flight.stats(),
+        "lru": {f.__name__: f.cache_info()._asdict()
+                for f in (get_blurb, get_commons_thumb, _cdn_url_at)},
+        "negative_cache": negative_cache.stats(),
+        "r2_manifest": r2_manifest.stats() if USE_R2 else None,
+        "species_assets": species_assets.stats(),
+    }
+    resp = server.response_class(json.dumps(body), mimetype="application/json")
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.server.route("/bg-status/<stem>")
+def bg_status(stem: str):
+    """State of a queued background-removal job (assets/bg_swap.js polls this)."""
+    if not re.fullmatch(r"[0-9a-f]{32}", stem):
+        abort(404)
+    resp = server.response_class(json.dumps({"state": bg_jobs.state(stem)}),
+                                 mimetype="application/json")
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+def _gs_name(gs: str) -> str:
+    """?gs= value ("Genus_species") → "Genus species"."""
+    return gs.replace("_", " ").strip()
+
+
+def _r2_image_name(gs, prefer_raw: bool, vw=None, w: int = 640, fname=None):
+    """First image_cache/ object on R2 for gs (processed → raw, flipped by prefer_raw), else fname."""
+    known = species_assets.image_name(_gs_name(gs), prefer_raw=prefer_raw, vw=vw) if gs else None
+    # table entries are trusted unless the R2 manifest says the object is missing
+    # (table built from a tree that was not synced yet) → probe the candidates
+    if known and w == 640 and r2_manifest.has(f"image_cache/{known}") is not False:
+        return known
+    candidates = []
+    if gs:
+        p, r = _stems(gs, w)
+        for stem in ((r, p) if prefer_raw else (p, r)):
+            if vw:
+                candidates.append(image_variants.variant_name(stem, vw))
+            candidates.append(f"{stem}.webp")
+    if fname:
+        candidates.append(fname)
+
+    seen = set()
+    for name in [x for x in candidates if not (x in seen or seen.add(x))]:
+        if _r2_has(name):
+            return name
+    return None
+
+
+class _NotOnR2(Exception):
+    """Raised (not returned) by _cdn_url_at so lru_cache never keeps a miss."""
+
+
+@lru_cache(maxsize=8192)
+def _cdn_url_at(generation: int, gs: str, prefer_raw: bool, vw: int | None):
+    """_cdn_image_url for one R2 manifest generation: a refresh starts new keys."""
+    name = _r2_image_name(gs, prefer_raw, vw)
+    if name is None:
+        raise _NotOnR2(gs)
+    return f"{R2_PUBLIC}/image_cache/{name}"
+
+
+def _cdn_image_url(gs: str, prefer_raw: bool, vw: int | None = None):
+    """Direct R2 URL of gs's image (or its vw-wide variant), None if not on R2 (yet)."""
+    try:
+        return _cdn_url_at(r2_manifest.generation(), gs, prefer_raw, vw)
+    except _NotOnR2:
+        return None
+
+
+def _cdn_image(gs_name: str, thumb):
+    """(src, srcset) on R2 for a /cached-images thumb, skipping the route's 302; None → keep thumb."""
+    if not USE_R2 or not thumb or not thumb.startswith("/cached-images/"):
+        return None
+    slug = gs_name.replace(" ", "_")
+    prefer_raw = "variant=raw" in thumb or gs_name in transp_set
+    full = _cdn_image_url(slug, prefer_raw)
+    if full is None:
+        return None
+    parts = [f"{url} {vw}w" for vw in image_variants.WIDTHS if vw < image_variants.BASE_WIDTH
+             and (url := _cdn_image_url(slug, prefer_raw, vw)) not in (None, full)]
+    parts.append(f"{full} {image_variants.BASE_WIDTH}w")
+    return full, ", ".join(parts)
+
+
+def _serve_local_image(stem: str, vw: int | None = None):
+    """<stem>'s vw-wide variant, else the full image, from the packs or image_cache/; None if absent."""
+    avif_ok = "image/avif" in request.headers.get("Accept", "")
+    for w in ((vw, None) if vw else (None,)):
+        if avif_ok:
+            f = image_variants.variant_name(stem, w, "avif")
+            if os.path.exists(os.path.join(CACHE_DIR, f)):
+                resp = send_from_directory(CACHE_DIR, f)
+                resp.headers["Vary"] = "Accept"
+                return resp
+        f = image_variants.variant_name(stem, w)
+        packed = image_pack.serve(f[:-len(".webp")], os.path.join(CACHE_DIR, f))
+        if packed is not None:
+            return packed
+        if os.path.exists(os.path.join(CACHE_DIR, f)):
+            return send_from_directory(CACHE_DIR, f)
+    return None
 
 
 @app.server.route("/cached-images/<path:fname>")
@@ -244,12 +481,23 @@ def cached_images(fname: str):
         w = int(request.args.get("w", "640"))
     except Exception:
         w = 640
+    vw = request.args.get("vw", type=int)          # srcset variant width (image_variants)
+    if vw not in image_variants.WIDTHS:
+        vw = None
+
+    prefer = (request.args.get("variant") or "").lower()
 
     # Dev: serve from disk with same preference order
     # Dev: serve from disk; respect ?variant=raw and transparency blacklist
     if not USE_R2:
+        # Prebuilt table: the file to serve is already resolved (variant included)
+        known = species_assets.image_name(_gs_name(gs), prefer_raw=prefer == "raw", vw=vw) if gs else None
+        if known:
+            parsed = image_variants.parse_name(known)
+            resp = _serve_local_image(parsed[0], parsed[1]) if parsed else None
+            if resp is not None:
+                return resp
         if gs:
-            prefer = (request.args.get("variant") or "").lower()
             title = _canon_title(gs)                   # normalize (handles Wiki equivalents)
             prefer_raw = (prefer == "raw") or (title in transp_set)
 
@@ -257,33 +505,29 @@ def cached_images(fname: str):
             order = (r, p) if prefer_raw else (p, r)   # flip when raw is preferred
 
             for stem in order:
-                f = f"{stem}.webp"
-                if os.path.exists(os.path.join(CACHE_DIR, f)):
-                    return send_from_directory(CACHE_DIR, f)
+                resp = _serve_local_image(stem, vw)
+                if resp is not None:
+                    return resp
 
         # exact filename fallback
+        parsed = image_variants.parse_name(os.path.basename(fname))
+        if parsed:
+            resp = _serve_local_image(parsed[0], parsed[1] or vw)
+            if resp is not None:
+                return resp
         return send_from_directory(CACHE_DIR, fname)
 
 
-    # Prod: redirect to whichever exists on R2 (processed → raw → requested)
-    candidates = []
-    if gs:
-        prefer = (request.args.get("variant") or "").lower()
-        p, r = _stems(gs, w)
-        candidates.extend([f"{r}.webp", f"{p}.webp"]) if prefer == "raw" else candidates.extend([f"{p}.webp", f"{r}.webp"])
+    # Prod: redirect to whichever exists on R2 (processed → raw → requested).
+    # Callbacks emit these URLs directly (_cdn_image); this is for old links.
     if not fname.endswith(".webp"):
         fname = f"{fname}.webp"
-    candidates.append(fname)
-
-    seen = set()
-    for name in [x for x in candidates if not (x in seen or seen.add(x))]:
-
-        if _r2_has(name):
-            resp = redirect(f"{R2_PUBLIC}/image_cache/{name}", code=302)
-            resp.headers["Cache-Control"] = "public, max-age=86400"
-            return resp
-
-    return abort(404)
+    name = _r2_image_name(gs, prefer == "raw", vw, w, fname)
+    if name is None:
+        return abort(404)
+    resp = redirect(f"{R2_PUBLIC}/image_cache/{name}", code=302)
+    resp.headers["Cache-Control"] = "public, max-age=86400"
+    return resp
 
     
 @app.server.route("/about/")
@@ -468,7 +712,7 @@ species_of_week_card = html.Div(
             id="sow-body",
             style={"display": "flex", "alignItems": "center", "gap": "0.6rem"},
             children=[
-                html.Img(id="sow-thumb",
+                html.Img(id="sow-thumb", sizes=image_variants.SOW_SIZES,
                          style={"width": "64px", "height": "64px", "objectFit": "cover", "borderRadius": "6px"}),
                 html.Div([
                     html.Div(id="sow-common",     style={"fontSize": "0.95rem", "fontWeight": 600}),
@@ -671,7 +915,7 @@ centre_flex = html.Div(id="page-centre-flex", children=[
 
         # this div now contains the image AND the up/down buttons
         html.Div(id="image-inner", children=[
-            html.Img(id="species-img"),
+            html.Img(id="species-img", sizes=image_variants.SPECIES_SIZES),
             html.Img(
                 id="arrow-img", src="/assets/species/scale/arrow.webp",
                 style={
@@ -966,6 +1210,9 @@ app.layout = dbc.Container([
         dcc.Store(id="eligible-depth-bounds-locked", storage_type="session"),
         dcc.Store(id="depth-order-store-all",        storage_type="session"),
         dcc.Store(id="depth-order-store-locked",     storage_type="session"),
+        dcc.Store(id="size-order-store"),            # /nav/size-order payload
+        dcc.Store(id="size-current-store"),          # {gs, len, ord} of the selected species
+        dcc.Store(id="bg-pending"),                  # {stem, src} while rembg runs (src/bg_jobs.py)
         dcc.Store(id="depth-store",                  storage_type="memory"),
 
 
@@ -978,6 +1225,8 @@ app.layout = dbc.Container([
         dcc.Store(id="favs-store",storage_type="local"),      # persists in localStorage
         dcc.Store(id="compare-store", data=False, storage_type="session"),
         dcc.Store(id="common-opt-cache", data=[]),
+        dcc.Store(id="search-bundle-url", data=SEARCH_BUNDLE_URL),
+        dcc.Store(id="common-search-fallback"),        # → server filter_common
         
         # --- Mobile detector + desktop-only feature toast ---
         dcc.Store(id="is-mobile", data=False, storage_type="memory"),
@@ -1057,11 +1306,9 @@ def filter_order(wiki_val, pop_val, fav_val, toggle_val,
     if "taxa" not in toggle_val:
         return [], None
 
-    df_use = _apply_shared_filters(df_full, wiki_val, pop_val,
-                                   fav_val, favs_data)
+    key = filter_idx.key(wiki_val, pop_val, fav_val, favs_data)
     # ---------- Order dropdown ----------
-    orders = sorted(df_use["order"].dropna().unique())
-    opts   = [{"label": _label_with_common(o), "value": o} for o in orders]
+    opts, orders = taxonomy_idx.options("order", key)
 
     return opts, current if current in orders else None
 
@@ -1082,14 +1329,10 @@ def filter_family(order_val, wiki_val, pop_val, fav_val, toggle_val,
     if "taxa" not in toggle_val:
         return [], None      # toggle OFF → blank + cleared
 
-    df_use = _apply_shared_filters(df_full, wiki_val, pop_val,
-                                   fav_val, favs_data)
-    if order_val:
-        df_use = df_use[df_use["order"] == order_val]
+    key = filter_idx.key(wiki_val, pop_val, fav_val, favs_data)
 
     # ---------- Family dropdown ----------
-    families = sorted(df_use["family"].dropna().unique())
-    opts     = [{"label": _label_with_common(f), "value": f} for f in families]
+    opts, families = taxonomy_idx.options("family", key, order_val)
 
 
     return opts, current if current in families else None
@@ -1108,15 +1351,8 @@ def filter_family(order_val, wiki_val, pop_val, fav_val, toggle_val,
 )
 def filter_genus(wiki_val, pop_val, fav_val,
                  order_val, family_val, favs_data, current):
-    df_use = _apply_shared_filters(df_full, wiki_val, pop_val,
-                                   fav_val, favs_data)     
-    if order_val:
-        df_use = df_use[df_use["order"] == order_val]
-    if family_val:
-        df_use = df_use[df_use["family"] == family_val]
-
-    genera = sorted(df_use["genus"].dropna().unique())     # use df_full’s column
-    opts   = [{"label": g, "value": g} for g in genera]
+    key = filter_idx.key(wiki_val, pop_val, fav_val, favs_data)
+    opts, genera = taxonomy_idx.options("genus", key, order_val, family_val)   # df_full’s GBIF column
     return opts, current if current in genera else None
 
 
@@ -1136,11 +1372,8 @@ def update_species_options(genus, wiki_val, pop_val,
     if not genus:
         return [], None
 
-    df_use = _apply_shared_filters(df_light, wiki_val, pop_val,
-                                   fav_val, favs_data)
-    df_use = df_use[df_use["Genus"] == genus]
-
-    species_list = sorted(df_use["Species"].unique())
+    key = filter_idx.key(wiki_val, pop_val, fav_val, favs_data)
+    species_list = taxonomy_idx.species(key, genus)
     opts = [{"label": s, "value": s} for s in species_list]
     return opts, current if current in species_list else (
         species_list[0] if len(species_list) == 1 else None
@@ -1206,30 +1439,25 @@ def choose_species(species_val, genus_val, common_val, rnd, rnd_nav,
 
         size_on  = "size"  in size_val
         depth_on = "depth" in depth_val
-        df_use = get_filtered_df(size_on, depth_on, wiki_val, pop_val)
-
-        if fav_val and "fav" in fav_val:
-            fav_set = set(json.loads(favs_data or "[]"))
-            df_use  = df_use[df_use["Genus_Species"].isin(fav_set)]
-        if df_use.empty:
+        pos = filter_idx.positions(wiki_val, pop_val, fav_val, favs_data,
+                                   size_on=size_on, depth_on=depth_on)
+        if len(pos) == 0:
             raise PreventUpdate
             
          # ── honour order-lock *only* for nav-random ─────────────
         if trig == "nav-random-btn" and lock_on and current_sel:
-            try:
-                cur_order = (
-                    df_full.loc[df_full["Genus_Species"] == current_sel, "order"]
-                    .iloc[0]
-                )
-                df_use = df_use[df_use["order"] == cur_order]
-            except IndexError:
-                pass        # keep whole list if lookup fails      
+            cur_order = species_idx.order(current_sel)
+            if cur_order is not None:   # keep whole list if lookup fails
+                pos = filter_idx.select(pos, "order", cur_order)
+                if len(pos) == 0:
+                    raise PreventUpdate
 
         # Prefer a *different* species; fall back if only one candidate.
-        if len(df_use) > 1 and current_sel in set(df_use["Genus_Species"]):
-            df_use = df_use[df_use["Genus_Species"] != current_sel]
+        cur_pos = species_idx.pos(current_sel)
+        if len(pos) > 1 and cur_pos is not None:
+            pos = pos[pos != cur_pos]
 
-        row = df_use.sample(1).iloc[0]
+        row = df_full.iloc[int(pos[random.randrange(len(pos))])]
         return _emit(f"{row.Genus} {row.Species}")
 
     # 2) Common-name dropdown
@@ -1309,7 +1537,9 @@ def fill_citation(gs_name, sound_on):
         raise PreventUpdate
 
     genus, species = gs_name.split(" ", 1)
-    row = df_full.loc[df_full["Genus_Species"] == gs_name].iloc[0]
+    row = species_idx.row(gs_name)
+    if row is None:
+        raise PreventUpdate
 
     # ---------- try Wikimedia Commons -------------
 
@@ -1436,38 +1666,27 @@ def fill_citation(gs_name, sound_on):
 
 
     sound_block = []
-    mp3_rel, txt_rel, _ = _sound_paths(genus, species)
-    if os.path.exists(txt_rel):
-        try:
-            with open(txt_rel, "r", encoding="utf-8") as f:
-                citation_text = f.read().strip()
-            if citation_text:
-                url_pattern = r"(https?://\S+|www\.\S+)"
-                
-                formatted_text = re.sub(
-                    url_pattern,
-                    lambda m: (
-                        f"[Link]({(link := m.group(0).rstrip('.'))})"
-                        + ("." if m.group(0).endswith(".") else "")
-                    ),
-                    citation_text
-                )
-
-
-
-                sound_block = [
-                    html.Br(), html.Br(),
-                    html.Strong("Audio: "),
-                    dcc.Markdown(formatted_text, dangerously_allow_html=True)
-                ]
-        except Exception:
-            pass
+    citation_text = _sound_citation(genus, species)
+    if citation_text:
+        url_pattern = r"(https?://\S+|www\.\S+)"
+        formatted_text = re.sub(
+            url_pattern,
+            lambda m: (
+                f"[Link]({(link := m.group(0).rstrip('.'))})"
+                + ("." if m.group(0).endswith(".") else "")
+            ),
+            citation_text
+        )
+        sound_block = [
+            html.Br(), html.Br(),
+            html.Strong("Audio: "),
+            dcc.Markdown(formatted_text, dangerously_allow_html=True)
+        ]
 
     taxonomy_block=[html.Br(), html.Br(),  html.Span("Taxonomic information (kingdoms/phyla/classes/orders/families): Derived dataset GBIF.org (7 August 2025) Filtered export of GBIF occurrence data.  "), html.A('DOI', href="https://doi.org/10.15468/dd.wbjqgn", target="_blank"),]
     
     personality_block = []
-    chat_json = f"assets/species/chat/{genus}_{species}.json"
-    if os.path.exists(chat_json):
+    if _has_chat(gs_name):
         personality_block = [
             html.Br(), html.Br(),
             html.Span("Personality text generated by ChatGPT 5. May contain errors.")
@@ -1531,44 +1750,15 @@ def format_references_as_spans(text):
     return result
 
 
-def _apply_shared_filters(frame: pd.DataFrame,
-                          wiki_val, pop_val, fav_val=None, favs_data=None):
-    mask = pd.Series(True, index=frame.index)
-    if "wiki" in wiki_val:
-        mask &= frame["has_wiki_page"]
-    if "pop" in pop_val:
-        mask &= frame["Genus_Species"].isin(popular_set)
-    if fav_val and "fav" in fav_val:
-        fav_set = set(json.loads(favs_data or "[]"))
-        mask &= frame["Genus_Species"].isin(fav_set)
-    return frame.loc[mask]              # view → O(1) no RAM / time
-    
-
 def get_filtered_df(size_on, depth_on, wiki_val, pop_val, seed=None):
     """
     seed is accepted only for backward-compatibility.
     It’s no longer used because RandDepth is pre-computed once per session.
     """
-    df_use = _apply_shared_filters(df_full, wiki_val, pop_val)
-
-    # ── SIZE ───────────────────────────────────────────────
-    if size_on:
-        # require a *real* positive measurement in centimetres
-        df_use = df_use[df_use["Length_cm"].notna() & (df_use["Length_cm"] > 0)]
-
-    # ── DEPTH ──────────────────────────────────────────────
-    if depth_on:
-        df_use = df_use[
-            # 1️⃣ commercial pair complete
-            (df_use["DepthRangeComShallow"].notna() &
-             df_use["DepthRangeComDeep"   ].notna())
-            |
-            # 2️⃣ generic pair complete
-            (df_use["DepthRangeShallow"   ].notna() &
-             df_use["DepthRangeDeep"      ].notna())
-        ]
-
-    return df_use
+    # size: a *real* positive measurement in centimetres
+    # depth: commercial pair complete OR generic pair complete
+    return df_full.iloc[filter_idx.positions(wiki_val, pop_val,
+                                             size_on=size_on, depth_on=depth_on)]
 
 
 
@@ -1591,6 +1781,12 @@ def _units(value_bool):
 def _sound_paths(genus: str, species: str):
     base = f"{genus}_{species}".replace(" ", "_")
     base_dir = os.path.join("assets", "species", "sound")
+    txt_rel = os.path.join(base_dir, f"{base}.txt")
+
+    assets = species_assets.get(f"{genus} {species}")
+    if assets is not None:                    # prebuilt table → no probing
+        audio_url = assets.get("sound", "")
+        return ("" if USE_R2 else audio_url.lstrip("/")), txt_rel, audio_url
 
     candidates = [f"{base}.ogg", f"{base}.mp3", f"{base}.wav"]
 
@@ -1598,10 +1794,13 @@ def _sound_paths(genus: str, species: str):
     audio_url = ""
 
     if USE_R2:
-        # Check R2 for whichever extension exists
-        for fname in candidates:
-            rel_path = f"assets/species/sound/{fname}"
-            if _r2_has_path(rel_path):
+        # Check R2 for every extension at once; first candidate that exists wins
+        rels = [f"assets/species/sound/{fname}" for fname in candidates]
+        found = [r2_manifest.has(rel) for rel in rels]
+        if None in found:                     # no manifest loaded → probe R2
+            found = [f.result() for f in [http_client.submit(_r2_has_path, rel) for rel in rels]]
+        for rel_path, ok in zip(rels, found):
+            if ok:
                 audio_url = "/" + rel_path        # keep leading slash; media_url() will rewrite
                 break
     else:
@@ -1613,10 +1812,21 @@ def _sound_paths(genus: str, species: str):
                 audio_url = f"/assets/species/sound/{fname}"
                 break
 
-    txt_rel = os.path.join(base_dir, f"{base}.txt")
     return audio_rel, txt_rel, audio_url
 
 
+def _sound_citation(genus: str, species: str) -> str:
+    assets = species_assets.get(f"{genus} {species}")
+    if assets is not None:
+        return assets.get("cite", "")
+    txt_rel = os.path.join("assets", "species", "sound", f"{genus}_{species}.txt".replace(" ", "_"))
+    try:
+        with open(txt_rel, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
 
 
 # NEW: sound – show/hide icon and set audio src when species changes
@@ -1697,8 +1907,9 @@ def update_order_lock_label(locked, species_id, old_class):
     if not locked or not species_id:
         return "", base_class               # hide when OFF
 
-    order = df_full.loc[df_full["Genus_Species"] == species_id, "order"]
-    order_name = order.iloc[0] if not order.empty else "?"
+    order_name = species_idx.order(species_id)
+    if order_name is None:
+        order_name = "?"
     return f"Navigating among {order_name} only", base_class + " active"
 
 
@@ -1706,8 +1917,10 @@ def update_order_lock_label(locked, species_id, old_class):
 
 @app.callback(
     Output("species-img",  "src"),
+    Output("species-img",  "srcSet"),
     Output("species-img",  "alt"),
     Output("info-content", "children"),
+    Output("bg-pending",   "data"),
     Input("selected-species", "data"),
     Input("units-toggle",     "value")     # value is True/False
 )
@@ -1732,21 +1945,22 @@ def update_image(gs_name, units_bool):
         raise PreventUpdate
 
     genus, species = gs_name.split(" ", 1)
-    summary, url = get_blurb(genus, species, 4)
+    # blurb (Wikipedia) and image (Commons) are independent → fetch concurrently
+    blurb_future = http_client.submit(get_blurb, genus, species, 4)
     # ── skip bg‐removal for any species on the blacklist
     skip_bg = gs_name in transp_set
     thumb, *_ = get_commons_thumb(
         genus, species,
         remove_bg=not skip_bg
     )
+    summary, url = blurb_future.result()
 
     # -------- pull the chosen row once -------
     #row = df_wiki.loc[df_wiki["Genus_Species"] == gs_name].iloc[0]
     
-    row_full = df_full.loc[df_full["Genus_Species"] == gs_name]
-    if row_full.empty:                 
+    row = species_idx.row(gs_name)
+    if row is None:
         raise PreventUpdate
-    row = row_full.iloc[0]
 
     # ---------- LENGTH ----------
     if units == "metric":
@@ -1960,11 +2174,26 @@ def update_image(gs_name, units_bool):
     else:
         img_src = base_src
 
+    # narrower copies go through /cached-images (falls back to full size if missing)
+    img_srcset = image_variants.srcset(
+        f"{raw_src}{'&' if '?' in raw_src else '?'}gs={slug}", full_src=img_src)
 
+    # R2: point straight at the objects instead of the /cached-images 302
+    direct = _cdn_image(gs_name, thumb)
+    if direct:
+        img_src, img_srcset = direct
+
+
+    # processed image still being generated? → raw is shown now, the browser swaps later
+    bg_pending = None
+    if bg_jobs.ENABLED and raw_src.startswith("/cached-images/") and "variant=raw" not in raw_src:
+        stem = raw_src.split("/cached-images/", 1)[1].split(".", 1)[0]
+        if bg_jobs.state(stem) != "done":
+            bg_pending = {"stem": stem, "src": img_src, "srcset": img_srcset}
 
     alt_text = f"Image of {row.FBname or ''} ({gs_name})".strip()
     gc.collect()
-    return img_src, alt_text, info_lines
+    return img_src, img_srcset, alt_text, info_lines, bg_pending
 
 
 
@@ -2034,7 +2263,9 @@ def sync_dropdowns(gs_name):
     genus, species = gs_name.split(" ", 1)
 
     # df_full already carries GBIF taxonomy columns (order / family / …)
-    row     = df_full.loc[df_full["Genus_Species"] == gs_name].iloc[0]   # ← always exactly 1 row
+    row     = species_idx.row(gs_name)
+    if row is None:
+        raise PreventUpdate
     family  = row.family
     order_  = row.order
 
@@ -2069,42 +2300,96 @@ def do_import(contents):
     txt = base64.b64decode(contents.split(",")[1]).decode()
     return txt
 
-@app.callback(
-    Output("common-dd", "options"),
-    Output("common-opt-cache", "data"),
-    Output("common-dd", "value"),       # ← keep this output
+# common-name typeahead in the browser (assets/name_search.js); when the
+# bundle is missing / still loading, or finds nothing, hand the query to
+# the server (typo-tolerant) via common-search-fallback
+app.clientside_callback(
+    """
+    function(search, wikiVal, popVal, favVal, bundleUrl, favsJson, current, cached){
+      var nu = window.dash_clientside.no_update;
+
+      // ── 1. user isn’t typing → keep everything as is ──────────────
+      if (!search || search.length < 2) return [nu, nu, nu, nu];
+
+      var trig   = (dash_clientside.callback_context.triggered[0]||{}).prop_id || "";
+      var typing = trig === "common-dd.search_value";
+      var S = window.pelagicaSearch;
+      if (S && bundleUrl) S.load(bundleUrl);
+
+      var favs = null;
+      if ((favVal || []).indexOf("fav") >= 0) {
+        try { favs = new Set(JSON.parse(favsJson || "[]")); } catch (e) { favs = new Set(); }
+      }
+      var options = S ? S.search(search, {
+        wiki: (wikiVal || []).indexOf("wiki") >= 0,
+        pop:  (popVal  || []).indexOf("pop")  >= 0,
+        favs: favs, limit: 50
+      }) : null;
+
+      if (!options || !options.length) {
+        return [nu, nu, nu, {q: search, typing: typing, t: Date.now()}];
+      }
+
+      // ── 2. skip update if options identical ───────────────────────
+      if (JSON.stringify(options) === JSON.stringify(cached || [])) return [nu, nu, nu, nu];
+
+      // typing → leave `value` untouched; filters toggled → drop it if now invalid
+      if (typing) return [options, options, nu, nu];
+      var ok = options.some(function(o){ return o.value === current; });
+      return [options, options, ok ? current : null, nu];
+    }
+    """,
+    Output("common-dd", "options", allow_duplicate=True),
+    Output("common-opt-cache", "data", allow_duplicate=True),
+    Output("common-dd", "value", allow_duplicate=True),
+    Output("common-search-fallback", "data"),
     Input("common-dd",  "search_value"),
     Input("wiki-toggle","value"),
     Input("popular-toggle","value"),
     Input("favs-toggle","value"),
+    State("search-bundle-url", "data"),
     State("favs-store","data"),
     State("common-dd","value"),
     State("common-opt-cache", "data"),
+    prevent_initial_call=True,
 )
-def filter_common(search, wiki_val, pop_val, fav_val, favs_data, current, cached):
 
-    df_use = _apply_shared_filters(df_light, wiki_val, pop_val, fav_val, favs_data)
+
+@app.callback(
+    Output("common-dd", "options", allow_duplicate=True),
+    Output("common-opt-cache", "data", allow_duplicate=True),
+    Output("common-dd", "value", allow_duplicate=True),       # ← keep this output
+    Input("common-search-fallback", "data"),
+    State("wiki-toggle","value"),
+    State("popular-toggle","value"),
+    State("favs-toggle","value"),
+    State("favs-store","data"),
+    State("common-dd","value"),
+    State("common-opt-cache", "data"),
+    prevent_initial_call=True,
+)
+def filter_common(req, wiki_val, pop_val, fav_val, favs_data, current, cached):
+    search = (req or {}).get("q")
 
     # ── 1. user isn’t typing → keep everything as is ─────────────────
     if not search or len(search) < 2:
         return no_update, cached, current
 
-    # ── 2. build a suggestion list (≤50) ─────────────────────────────
-    mask = df_use["dropdown_label"].str.contains(search, case=False, na=False)
-    matches = df_use[mask].head(50)
+    # ── 2. build a suggestion list (≤50, ranked) ────────────────────
+    mask = filter_idx.mask(wiki_val, pop_val, fav_val, favs_data)
+    hits = name_search.search(search, mask=mask, limit=50)
 
     options = [
-        {"label": r.dropdown_label, "value": r.Genus_Species}
-        for _, r in matches.iterrows()
+        {"label": _dd_labels[p], "value": filter_idx.names[p]}
+        for p in hits
     ]
 
     # ── 3. skip update if options identical ──────────────────────────
     if options == cached:
         return no_update, cached, no_update
 
-    # 2) If the callback was triggered by typing, leave `value` untouched
-    triggered_prop = next(iter(ctx.triggered_prop_ids))
-    if triggered_prop == "common-dd.search_value":
+    # 2) If the request came from typing, leave `value` untouched
+    if req.get("typing"):
         return options, options, no_update   # ← stops the field from resetting
 
     # 3) Otherwise (filters toggled, etc.) update `value` if it became invalid
@@ -2195,31 +2480,17 @@ def close_search_mobile(n, current_class):
     State("selected-species", "data"),
 )
 def build_eligible_bounds(wiki_val, pop_val, fav_val, lock_on, favs_data, current):
+    # ids into /nav/species-table (rows with usable bounds only), memoised per filter
     # 1) full eligible set (IGNORE lock here)
-    df_all = _apply_shared_filters(df_full, wiki_val, pop_val, fav_val, favs_data)
-
-    # choose Com bounds when present, else raw
-    sh_all = df_all["DepthRangeComShallow"].where(df_all["DepthRangeComShallow"].notna(),
-                                                  df_all["DepthRangeShallow"])
-    dp_all = df_all["DepthRangeComDeep"].where(df_all["DepthRangeComDeep"].notna(),
-                                               df_all["DepthRangeDeep"])
-
-    meta_all = (df_all.assign(_sh=sh_all, _dp=dp_all)[["Genus_Species", "_sh", "_dp", "order"]]
-                       .dropna(subset=["_sh", "_dp"]) )
-    meta_all = meta_all[meta_all["_dp"] >= meta_all["_sh"]]
-
-    # 2) locked subset (APPLY lock only for stepping)
-    if lock_on and current in df_full["Genus_Species"].values:
-        current_order = df_full.loc[df_full["Genus_Species"].eq(current), "order"].iloc[0]
-        df_locked = meta_all[meta_all["order"].eq(current_order)]
-    else:
-        df_locked = meta_all
+    all_ids = depth_bounds.eligible(wiki_val, pop_val, fav_val, favs_data)
 
-    # Compact lists: [gs, sh, dp] (and a second list for locked)
-    all_list    = [[gs, float(sh), float(dp)] for gs, sh, dp, _ in meta_all.itertuples(index=False, name=None)]
-    locked_list = [[gs, float(sh), float(dp)] for gs, sh, dp, _ in df_locked.itertuples(index=False, name=None)]
+    # 2) locked subset (APPLY lock only for stepping); None → same as all
+    locked_ids = None
+    if lock_on and current in species_idx:
+        locked_ids = depth_bounds.eligible(wiki_val, pop_val, fav_val, favs_data,
+                                           lock_order=species_idx.order(current))
 
-    return all_list, locked_list
+    return all_ids, locked_ids
 
 
 # --- Unlock ONLY when the selected species crosses to a different order ---
@@ -2245,8 +2516,12 @@ def unlock_on_cross_order(new_gs, lock_on, locked_list):
         if not sample_gs:
             raise PreventUpdate  # nothing to compare against → keep lock
 
-        old_order = df_full.loc[df_full["Genus_Species"].eq(sample_gs), "order"].iloc[0]
-        new_order = df_full.loc[df_full["Genus_Species"].eq(new_gs),   "order"].iloc[0]
+        if sample_gs not in species_idx or new_gs not in species_idx:
+            raise PreventUpdate
+        old_order = species_idx.order(sample_gs)
+        new_order = species_idx.order(new_gs)
+    except PreventUpdate:
+        raise
     except Exception:
         # Any lookup hiccup → do nothing rather than surprise-unlock
         raise PreventUpdate
@@ -2262,89 +2537,101 @@ def unlock_on_cross_order(new_gs, lock_on, locked_list):
 app.clientside_callback(
     """
     function(boundsAll, boundsLocked, seed){
-      // bounds*: [[gs, shallow, deep], ...]
-      if (!Array.isArray(boundsAll) || !boundsAll.length) {
+      // bounds*: {t, n, ids: b64 int32} → rows of /nav/species-table (assets/depth_table.js)
+      var DT = window.pelagicaDepthTable;
+      var idsAll = DT ? DT.ids(boundsAll) : null;
+      if (!idsAll || !idsAll.length) {
         return [null, null, null];
       }
+      var idsLocked = DT.ids(boundsLocked);   // null → lock off (same as all)
 
-      // FNV-1a 32-bit
-      function h32(s){
-        var h = 2166136261>>>0;
-        for (var i=0;i<s.length;i++){ h ^= s.charCodeAt(i); h = Math.imul(h, 16777619); }
-        return h>>>0;
-      }
-      // Mulberry32 PRNG
-      function mulberry32(a){
-        return function(){
-          var t = a += 0x6D2B79F5;
-          t = Math.imul(t ^ t >>> 15, t | 1);
-          t ^= t + Math.imul(t ^ t >>> 7, t | 61);
-          return ((t ^ t >>> 14) >>> 0) / 4294967296;
-        };
-      }
+      return DT.table(boundsAll.t).then(function(table){
+        if (!table) return [null, null, null];
 
-      var base = (seed|0)>>>0;
-
-      // Override species → force 0–5 m
-      var overrides = new Set([
-        "Delphinus delphis",
-        "Homo sapiens",
-        "Mirounga leonina",
-        "Lobodon carcinophaga",
-        "Stenella coeruleoalba",
-        "Odobenus rosmarus",
-        "Stenella frontalis",
-        "Pagophilus groenlandicus",
-        "Stenella longirostris",
-        "Stenella attenuata",
-        "Grampus griseus",
-        "Tursiops truncatus"
-      ]);
-
-      var map   = {};
-      var arrAll = [];
-
-      // Build biased depths for ALL eligible species (quick jumps ignore lock)
-      for (var i=0; i<boundsAll.length; i++){
-        var gs = boundsAll[i][0];
-        var s  = +boundsAll[i][1];
-        var d  = +boundsAll[i][2];
-
-        // overrides → clamp bounds to 0..5 m
-        if (overrides.has(gs)) { s = 0.0; d = 5.0; }
-
-        // skip invalid ranges
-        if (!(d >= s)) { continue; }
-
-        // per-species RNG seeded by (session seed XOR hash(gs))
-        var rng = mulberry32((base ^ h32(gs))>>>0);
-        var u = rng();
-
-        var depth;
-        if (s < 200) {
-          // shallow bias: u^1.3
-          depth = s + Math.pow(u, 1.3) * (d - s);
-        } else if (s < 2000) {
-          // medium bias: uniform
-          depth = s + u * (d - s);
-        } else {
-          // deep bias: 1 - (1-u)^2
-          depth = s + (1 - Math.pow(1 - u, 2.0)) * (d - s);
+        // FNV-1a 32-bit
+        function h32(s){
+          var h = 2166136261>>>0;
+          for (var i=0;i<s.length;i++){ h ^= s.charCodeAt(i); h = Math.imul(h, 16777619); }
+          return h>>>0;
+        }
+        // Mulberry32 PRNG
+        function mulberry32(a){
+          return function(){
+            var t = a += 0x6D2B79F5;
+            t = Math.imul(t ^ t >>> 15, t | 1);
+            t ^= t + Math.imul(t ^ t >>> 7, t | 61);
+            return ((t ^ t >>> 14) >>> 0) / 4294967296;
+          };
         }
 
-        map[gs] = depth;
-        arrAll.push([gs, depth]);
-      }
+        var base = (seed|0)>>>0;
+
+        // Override species → force 0–5 m
+        var overrides = new Set([
+          "Delphinus delphis",
+          "Homo sapiens",
+          "Mirounga leonina",
+          "Lobodon carcinophaga",
+          "Stenella coeruleoalba",
+          "Odobenus rosmarus",
+          "Stenella frontalis",
+          "Pagophilus groenlandicus",
+          "Stenella longirostris",
+          "Stenella attenuata",
+          "Grampus griseus",
+          "Tursiops truncatus"
+        ]);
+
+        var map   = {};
+        var arrAll = [];
+
+        // Build biased depths for ALL eligible species (quick jumps ignore lock)
+        for (var i=0; i<idsAll.length; i++){
+          var id = idsAll[i];
+          var gs = table.gs[id];
+          var s  = table.sh[id];
+          var d  = table.dp[id];
+
+          // overrides → clamp bounds to 0..5 m
+          if (overrides.has(gs)) { s = 0.0; d = 5.0; }
+
+          // skip invalid ranges
+          if (!(d >= s)) { continue; }
+
+          // per-species RNG seeded by (session seed XOR hash(gs))
+          var rng = mulberry32((base ^ h32(gs))>>>0);
+          var u = rng();
+
+          var depth;
+          if (s < 200) {
+            // shallow bias: u^1.3
+            depth = s + Math.pow(u, 1.3) * (d - s);
+          } else if (s < 2000) {
+            // medium bias: uniform
+            depth = s + u * (d - s);
+          } else {
+            // deep bias: 1 - (1-u)^2
+            depth = s + (1 - Math.pow(1 - u, 2.0)) * (d - s);
+          }
 
-      // Sort ALL by depth → used by quick jumps (filters only)
-      arrAll.sort(function(a,b){ return a[1]-b[1]; });
-      var orderAll = arrAll.map(function(x){ return x[0]; });
+          map[gs] = depth;
+          arrAll.push([gs, depth]);
+        }
 
-      // Locked order = same ranking but filtered to the locked set
-      var lockedSet = new Set((boundsLocked||[]).map(function(x){ return x[0]; }));
-      var orderLocked = orderAll.filter(function(gs){ return lockedSet.has(gs); });
+        // Sort ALL by depth → used by quick jumps (filters only)
+        arrAll.sort(function(a,b){ return a[1]-b[1]; });
+        var orderAll = arrAll.map(function(x){ return x[0]; });
 
-      return [map, orderAll, orderLocked];
+        // Locked order = same ranking but filtered to the locked set
+        var orderLocked = orderAll;
+        if (idsLocked) {
+          var lockedSet = new Set();
+          for (var j=0; j<idsLocked.length; j++) lockedSet.add(table.gs[idsLocked[j]]);
+          orderLocked = orderAll.filter(function(gs){ return lockedSet.has(gs); });
+        }
+
+        return [map, orderAll, orderLocked];
+      });
     }
     """,
     [
@@ -2426,43 +2713,93 @@ app.clientside_callback(
     prevent_initial_call=True,
 )
 
-@app.callback(
+# raw-first images: swap in the background-removed file once it is ready
+app.clientside_callback(
+    """
+    function(job){
+      if (!job || !job.stem || !window.pelagicaBg) {
+        return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+      }
+      return window.pelagicaBg.waitFor(job.stem).then(function(ok){
+        var img = document.getElementById("species-img");
+        var nu = window.dash_clientside.no_update;
+        // species changed meanwhile, or the job failed → leave the image alone
+        if (!ok || !img || img.getAttribute("src") !== job.src) return [nu, nu];
+        var bust = function(u){ return u + (u.indexOf("?") >= 0 ? "&" : "?") + "bg=1"; };
+        var set = job.srcset ? job.srcset.split(", ").map(function(c){
+          var i = c.lastIndexOf(" ");
+          return bust(c.slice(0, i)) + c.slice(i);          // keep the "<w>w" descriptor
+        }).join(", ") : nu;
+        return [bust(job.src), set];
+      });
+    }
+    """,
+    Output("species-img", "src", allow_duplicate=True),
+    Output("species-img", "srcSet", allow_duplicate=True),
+    Input("bg-pending", "data"),
+    prevent_initial_call=True,
+)
+
+
+# size-order payload: fetched once per (wiki, popular) combo, ETag-cached
+app.clientside_callback(
+    """
+    function(wikiVal, popVal){
+      var wiki = (wikiVal || []).indexOf("wiki") >= 0 ? "1" : "0";
+      var pop  = (popVal  || []).indexOf("pop")  >= 0 ? "1" : "0";
+      return fetch("/nav/size-order?wiki=" + wiki + "&pop=" + pop)
+        .then(function(r){ return r.ok ? r.json() : window.dash_clientside.no_update; })
+        .catch(function(){ return window.dash_clientside.no_update; });
+    }
+    """,
+    Output("size-order-store", "data"),
+    Input("wiki-toggle",    "value"),
+    Input("popular-toggle", "value"),
+)
+
+
+# length / order of the selected species, fetched only when it is not in
+# the size-order payload (not size-eligible, or filters changed since)
+app.clientside_callback(
+    """
+    function(current, nav, cur){
+      var nu = window.dash_clientside.no_update;
+      if (!current || !nav || !window.pelagicaSizeNav) return nu;
+      if (window.pelagicaSizeNav.known(nav, current)) return nu;
+      if (cur && cur.gs === current) return nu;
+      return fetch("/nav/size-current?gs=" + encodeURIComponent(current))
+        .then(function(r){ return r.ok ? r.json() : nu; })
+        .catch(function(){ return nu; });
+    }
+    """,
+    Output("size-current-store", "data"),
+    Input("selected-species", "data"),
+    Input("size-order-store", "data"),
+    State("size-current-store", "data"),
+    prevent_initial_call=True
+)
+
+
+# size prev/next disabled state (clientside, see assets/size_nav.js)
+app.clientside_callback(
+    """
+    function(current, nav, favVal, lockOn, cur, favsJson){
+      if (!current || !window.pelagicaSizeNav) return window.dash_clientside.no_update;
+      var favOn = (favVal || []).indexOf("fav") >= 0;
+      var ends = window.pelagicaSizeNav.ends(nav, favOn, favsJson, lockOn, current, cur);
+      return ends ? ends : window.dash_clientside.no_update;
+    }
+    """,
     Output("prev-btn", "disabled"),
     Output("next-btn", "disabled"),
     Input("selected-species",  "data"),
-    Input("wiki-toggle",       "value"),
-    Input("popular-toggle",    "value"),
+    Input("size-order-store",  "data"),
     Input("favs-toggle",       "value"),
     Input("order-lock-state",  "data"),
+    Input("size-current-store", "data"),
     State("favs-store",        "data"),
     prevent_initial_call=True
 )
-def disable_size_extremes(current, wiki_val, pop_val, fav_val, lock_on, favs_json):
-    if not current:
-        raise PreventUpdate
-
-    # same filter logic as step_size()
-    df_use = get_filtered_df(True, False, wiki_val, pop_val)
-
-    if fav_val and "fav" in fav_val:
-        favs = set(json.loads(favs_json or "[]"))
-        df_use = df_use[df_use["Genus_Species"].isin(favs)]
-
-    if lock_on:
-        try:
-            order = df_full.loc[df_full["Genus_Species"] == current, "order"].iloc[0]
-            df_use = df_use[df_use["order"] == order]
-        except Exception:
-            pass
-
-    if df_use.empty:
-        raise PreventUpdate
-
-    df_use  = df_use.sort_values(["Length_cm", "Length_in"], na_position="last")
-    species = df_use["Genus_Species"].tolist()
-    idx = species.index(current) if current in species else 0
-
-    return (idx <= 0, idx >= len(species) - 1)
 
 
 
@@ -2738,79 +3075,32 @@ app.clientside_callback(
 # Size‑axis navigation (left / right)
 # -------------------------------------------------------------------
 
-@app.callback(
+# size step (clientside): block on mobile, clamp at either end – no wrap
+app.clientside_callback(
+    """
+    function(nNext, nPrev, nav, favVal, favsJson, lockOn, current, isMobile, cur){
+      if (isMobile || !window.pelagicaSizeNav) return window.dash_clientside.no_update;
+
+      var trig = (dash_clientside.callback_context.triggered[0]||{}).prop_id || "";
+      var dir  = trig.startsWith("prev-btn") ? -1 : +1;
+      var favOn = (favVal || []).indexOf("fav") >= 0;
+
+      var next = window.pelagicaSizeNav.step(nav, favOn, favsJson, lockOn, current, dir, cur);
+      return next ? next : window.dash_clientside.no_update;
+    }
+    """,
     Output("selected-species", "data", allow_duplicate=True),
     Input("next-btn",  "n_clicks"),
     Input("prev-btn",  "n_clicks"),
-    State("size-toggle",    "value"),
-    State("depth-toggle",   "value"),
-    State("wiki-toggle",    "value"),
-    State("popular-toggle", "value"),
-    State("favs-toggle",    "value"),
-    State("favs-store",     "data"),
-    State("order-lock-state","data"),
-    State("selected-species","data"),
-    State("rand-seed",      "data"),
-    State("is-mobile","data"),
-    prevent_initial_call=True
+    State("size-order-store", "data"),
+    State("favs-toggle",      "value"),
+    State("favs-store",       "data"),
+    State("order-lock-state", "data"),
+    State("selected-species", "data"),
+    State("is-mobile",        "data"),
+    State("size-current-store", "data"),
+    prevent_initial_call=True,
 )
-def step_size(n_next, n_prev,
-              size_val, depth_val, wiki_val, pop_val,
-              fav_val, favs_data,
-              lock_on,
-              current, seed, is_mobile):
-    if is_mobile:
-        raise PreventUpdate                    
-    if ctx.triggered_id not in ("prev-btn", "next-btn"):
-        raise PreventUpdate
-
-    # ---- filters (size axis ON, depth axis OFF) -------------------
-    df_use = get_filtered_df(True, False, wiki_val, pop_val, seed)
-
-    if fav_val and "fav" in fav_val:
-        fav_set = set(json.loads(favs_data or "[]"))
-        df_use  = df_use[df_use["Genus_Species"].isin(fav_set)]
-
-    if lock_on and current:
-        try:
-            order = df_full.loc[df_full["Genus_Species"] == current, "order"].iloc[0]
-            df_use = df_use[df_use["order"] == order]
-        except IndexError:
-            pass
-
-    if df_use.empty:
-        raise PreventUpdate
-
-    # ---- sort small → large --------------------------------------
-    df_use  = df_use.sort_values(["Length_cm", "Length_in"])
-    species = df_use["Genus_Species"].tolist()
-
-    # Choose an index for `current` (nearest by length if not present)
-    if current in species:
-        idx = species.index(current)
-    else:
-        try:
-            cur_len = float(
-                df_full.loc[df_full["Genus_Species"] == current, "Length_cm"].dropna().iloc[0]
-            )
-            lens = df_use["Length_cm"].to_numpy(dtype=float)
-            # position where cur_len would be inserted
-            pos = int(np.searchsorted(lens, cur_len, side="left"))
-            # candidates: pos-1 and pos
-            cand_idxs = [max(0, pos-1), min(len(lens)-1, pos)]
-            # pick the closer one
-            idx = min(cand_idxs, key=lambda i: abs(lens[i] - cur_len))
-        except Exception:
-            idx = 0  # safe fallback
-
-    step = -1 if ctx.triggered_id == "prev-btn" else 1
-    new_idx = max(0, min(len(species) - 1, idx + step))  # ← clamp, no wrap
-
-    if new_idx == idx:
-        # At smallest/largest already — optionally emit a toast via another Output
-        raise PreventUpdate
-
-    return species[new_idx]
 
 
 # -------------------------------------------------------------------
@@ -2864,11 +3154,9 @@ def step_depth(n_up, n_down,
 
     # order-lock filter
     if lock_on:
-        try:
-            order = df_full.loc[df_full["Genus_Species"] == current, "order"].iloc[0]
+        order = species_idx.order(current)
+        if order is not None:   # current not found – ignore
             df_use = df_use[df_use["order"] == order]
-        except IndexError:
-            pass   # current not found – ignore
 
     if df_use.empty:
         raise PreventUpdate
@@ -2970,23 +3258,12 @@ def jump_to_size_extremes(n_large, n_small,
     if trig is None:
         raise PreventUpdate
 
-    # Use your existing helper; depth flag is False here.
-    df_use = get_filtered_df(size_on=True, depth_on=False,
-                             wiki_val=wiki_val, pop_val=pop_val)
-
-    # Apply favs if enabled
-    if fav_val and "fav" in fav_val:
-        fav_set = set(json.loads(favs_data or "[]"))
-        df_use = df_use[df_use["Genus_Species"].isin(fav_set)]
-    if df_use.empty:
+    # size-eligible subset (favs applied), already in small → large order
+    ranks = size_idx.subset(wiki_val, pop_val, fav_val, favs_data)
+    new_gs = size_idx.extreme(ranks, largest=(trig == "largest-btn"))
+    if new_gs is None:
         raise PreventUpdate
 
-    # Sort by size; keep your existing tie-breaker
-    df_use = df_use.sort_values(["Length_cm", "Length_in"], na_position="last")
-
-    row = df_use.iloc[-1] if trig == "largest-btn" else df_use.iloc[0]
-    new_gs = row["Genus_Species"]
-
     if new_gs == (current or ""):
         raise PreventUpdate
     return new_gs
@@ -3064,12 +3341,11 @@ def update_scale_tooltip(gs_name, is_on):
         raise PreventUpdate
 
     genus, species = gs_name.split(" ", 1)
-    row = df_full.loc[df_full["Genus_Species"] == gs_name].iloc[0]
+    species_len = species_idx.length_cm(gs_name)
 
-    if pd.isna(row.Length_cm):
+    if pd.isna(species_len):
         raise PreventUpdate
 
-    species_len = row.Length_cm
     best = min(_scale_db, key=lambda d: abs(d["length_cm"] - species_len))
     desc = best["desc"]
 
@@ -3095,8 +3371,7 @@ def update_sizecmp(gs_name, is_on, human_val):
         return "", {"display": "none"}, ""
 
     genus, species = gs_name.split(" ", 1)
-    row = df_full.loc[df_full["Genus_Species"] == gs_name].iloc[0]
-    length = row.Length_cm
+    length = species_idx.length_cm(gs_name)
     if pd.isna(length) or length == 0:
         return "", {"display": "none"}, ""
 
@@ -3324,7 +3599,8 @@ def make_tree_figure(df, target_species):
     import plotly.graph_objects as go
 
     # ---- Build elements & metadata (from taxonomic_tree.py) ----
-    els, root = build_taxonomy_elements(df, target_species)
+    els, root = build_taxonomy_elements(
+        df, target_species, index=species_idx if df is df_full else None)
 
     node_meta = {}
     edges = []
@@ -3561,10 +3837,30 @@ def make_tree_figure(df, target_species):
     return fig
 
 
+def _sow_srcset(thumb, genus, species, full_src):
+    """64 px card: let the browser take the 160/320 px variant instead of the full image."""
+    if not thumb:
+        return None
+    return image_variants.srcset(f"{thumb}{'&' if '?' in thumb else '?'}gs={genus}_{species}",
+                                 full_src=full_src)
+
+
+def _sow_image(thumb, genus, species):
+    """(src, srcset) for the card: direct R2 objects when resolvable, else the app routes."""
+    direct = _cdn_image(f"{genus} {species}", thumb)
+    if direct:
+        return direct
+    base = to_cdn(thumb or "/assets/img/placeholder_fish.webp")
+    if base.startswith("/cached-images/"):
+        base = f"{base}{'&' if '?' in base else '?'}gs={genus}_{species}"
+    return base, _sow_srcset(thumb, genus, species, base)
+
+
 SOW_PINNED_SPECIES = os.getenv("SOW_PINNED_SPECIES", "Grimpoteuthis discoveryi")  # Oarfish
 
 @app.callback(
     Output("sow-thumb","src"),
+    Output("sow-thumb","srcSet"),
     Output("sow-common","children"),
     Output("sow-scientific","children"),
     Output("sow-note","children"),
@@ -3588,10 +3884,8 @@ def update_species_of_week(_):
         thumb = thumb or "/assets/img/placeholder_fish.webp"
         common = COMMON_NAMES.get(sp, "")
         rollout_note = f"Inaugural pick — live weekly rotation starts {cutoff.date().isoformat()} (UTC) based on your most favourited species"
-        base = to_cdn(thumb or "/assets/img/placeholder_fish.webp")
-        if base.startswith("/cached-images/"):
-            base = f"{base}{'&' if '?' in base else '?'}gs={genus}_{species}"
-        return (base, common, sp, rollout_note, "Species of the Week")
+        src, srcset = _sow_image(thumb, genus, species)
+        return (src, srcset, common, sp, rollout_note, "Species of the Week")
 
 
     # Live weekly favourite w/ suppression + tie-breakers
@@ -3599,7 +3893,7 @@ def update_species_of_week(_):
     sp, _scores = top_species(debug=False, option="ever_favved")  # production
 
     if not sp:
-        return ("/assets/img/placeholder_fish.webp", "", "—",
+        return ("/assets/img/placeholder_fish.webp", None, "", "—",
                 "No favourites recorded last week", "Species of the Week")
 
     # --- ADD THESE LINES ---
@@ -3612,10 +3906,8 @@ def update_species_of_week(_):
     genus, species = sp.split(" ", 1)
     skip_bg = sp in transp_set
     thumb, *_ = get_commons_thumb(genus, species, remove_bg=not skip_bg)
-    base = to_cdn(thumb or "/assets/img/placeholder_fish.webp")
-    if base.startswith("/cached-images/"):
-        base = f"{base}{'&' if '?' in base else '?'}gs={genus}_{species}"
-    return (base, common, sp, note, "Species of the Week")
+    src, srcset = _sow_image(thumb, genus, species)
+    return (src, srcset, common, sp, note, "Species of the Week")
 
 
 
@@ -3813,6 +4105,25 @@ app.clientside_callback(
 )
 
 
+def _chat_path(gs_name: str) -> str:
+    genus, species = gs_name.split(" ", 1)
+    return f"assets/species/chat/{genus}_{species}.json"
+
+def _has_chat(gs_name: str) -> bool:
+    assets = species_assets.get(gs_name)
+    if assets is not None:
+        return "chat" in assets
+    return os.path.exists(_chat_path(gs_name))
+
+def _chat_intros(gs_name: str) -> list:
+    assets = species_assets.get(gs_name)
+    if assets is not None:
+        return assets.get("chat") or []
+    with open(_chat_path(gs_name), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return (data or {}).get("intros") or []
+
+
 @app.callback(
     Output("chat-handle", "style"),
     Input("selected-species", "data"),
@@ -3821,12 +4132,9 @@ app.clientside_callback(
 def toggle_chat_icon(gs_name):
     if not gs_name:
         raise PreventUpdate
-    try:
-        genus, species = gs_name.split(" ", 1)
-    except ValueError:
+    if " " not in gs_name:
         return {"display":"none"}
-    path = f"assets/species/chat/{genus}_{species}.json"
-    return {"display":"grid"} if os.path.exists(path) else {"display":"none"}
+    return {"display":"grid"} if _has_chat(gs_name) else {"display":"none"}
 
 @app.callback(
     Output("chat-content", "children"),
@@ -3836,14 +4144,10 @@ def toggle_chat_icon(gs_name):
 def load_chat(gs_name):
     if not gs_name:
         raise PreventUpdate
-    genus, species = gs_name.split(" ", 1)
-    path = f"assets/species/chat/{genus}_{species}.json"
-    if not os.path.exists(path):
+    if not _has_chat(gs_name):
         raise PreventUpdate
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        msgs = (data or {}).get("intros") or []
+        msgs = _chat_intros(gs_name)
         if not msgs:
             return "No chat available."
         return dcc.Markdown(random.choice(msgs))
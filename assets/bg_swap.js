@@ -0,0 +1,33 @@
+// assets/bg_swap.js
+// Raw-first species images (see src/bg_jobs.py): while the background-
+// removed file is generated, /cached-images serves the raw thumbnail.
+// waitFor(stem) polls /bg-status/<stem> and resolves true once the
+// processed file exists, false on failure or after ~60 s.
+(function () {
+  const waits = new Map();      // stem → Promise<boolean>
+
+  function poll(stem, deadline, delay) {
+    return new Promise(function (resolve) { setTimeout(resolve, delay); })
+      .then(function () { return fetch("/bg-status/" + stem, { cache: "no-store" }); })
+      .then(function (r) { return r.ok ? r.json() : { state: null }; })
+      .catch(function () { return { state: null }; })
+      .then(function (s) {
+        if (s.state === "done") return true;
+        if (s.state === "failed" || Date.now() > deadline) return false;
+        // null = queued on another worker: keep asking until the deadline
+        return poll(stem, deadline, Math.min(delay * 1.5, 4000));
+      });
+  }
+
+  function waitFor(stem) {
+    let p = waits.get(stem);
+    if (!p) {
+      p = poll(stem, Date.now() + 60000, 800);
+      waits.set(stem, p);
+      p.then(function (ok) { if (!ok) waits.delete(stem); });
+    }
+    return p;
+  }
+
+  window.pelagicaBg = { waitFor: waitFor };
+})();
@@ -0,0 +1,53 @@
+// assets/depth_table.js
+// Decodes the depth-navigation payloads (see src/depth_bounds.py).
+//
+//   /nav/species-table  { gs: [name per id], sh: b64 float32, dp: b64 float32 }
+//   eligible-depth-bounds-*  { t: table etag, n, ids: b64 int32 }
+//
+// The table is fetched as /nav/species-table?v=<t> (immutable per version):
+// a payload whose t differs from the table held so far triggers a refetch,
+// so ids from a redeploy are never read against an older table.  Decoded
+// id lists are cached by their base64 string.
+(function () {
+  let tablePromise = null;
+  let tableVersion = null;
+  const idCache = new Map();          // b64 → Int32Array
+
+  function decode(b64, Type) {
+    const bin = atob(b64 || "");
+    const bytes = new Uint8Array(bin.length);
+    for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    return new Type(bytes.buffer);
+  }
+
+  function table(version) {
+    if (!tablePromise || (version && version !== tableVersion)) {
+      const v = version || "";
+      tableVersion = version || null;
+      const p = fetch("/nav/species-table" + (v ? "?v=" + encodeURIComponent(v) : ""))
+        .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+        .then(function (t) {
+          return { gs: t.gs, sh: decode(t.sh, Float32Array), dp: decode(t.dp, Float32Array) };
+        })
+        .catch(function () {
+          if (tablePromise === p) { tablePromise = null; tableVersion = null; }
+          return null;
+        });
+      tablePromise = p;
+    }
+    return tablePromise;
+  }
+
+  function ids(eligible) {
+    if (!eligible || typeof eligible.ids !== "string") return null;
+    let a = idCache.get(eligible.ids);
+    if (!a) {
+      a = decode(eligible.ids, Int32Array);
+      if (idCache.size > 16) idCache.clear();
+      idCache.set(eligible.ids, a);
+    }
+    return a;
+  }
+
+  window.pelagicaDepthTable = { table: table, ids: ids };
+})();
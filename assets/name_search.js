@@ -0,0 +1,81 @@
+// assets/name_search.js
+// Browser-side typeahead for common-dd (zero round trips per keystroke).
+//
+// The bundle is built by `python -m src.build_search_bundle` and served
+// precompressed from /search-bundle/<names.HASH.json>; its URL reaches the
+// page through the "search-bundle-url" store.  Ranking mirrors the server
+// (src/name_search.py): label prefix → word prefix → substring.  While the
+// bundle is missing or still loading, the clientside callback falls back
+// to the server's filter_common.
+(function () {
+  const state = { url: null, promise: null, data: null };
+
+  function fold(s) {
+    return (s || "")
+      .normalize("NFKD").replace(/[\u0300-\u036f]/g, "")
+      .toLowerCase()
+      .replace(/[^0-9a-z]+/g, " ")
+      .trim();
+  }
+
+  function prepare(b) {
+    const n = b.values.length;
+    const keys = new Array(n);
+    for (let i = 0; i < n; i++) keys[i] = fold(b.labels[i]);
+    // scan rows in key order so every tier comes out alphabetical
+    const order = Array.from({ length: n }, (_, i) => i)
+      .sort((a, c) => (keys[a] < keys[c] ? -1 : keys[a] > keys[c] ? 1 : a - c));
+    return { labels: b.labels, values: b.values, flags: b.flags, keys: keys, order: order };
+  }
+
+  function load(url) {
+    if (!url) return null;
+    if (state.url === url && state.promise) return state.promise;
+    state.url = url;
+    state.data = null;
+    state.promise = fetch(url)
+      .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+      .then(function (b) { if (state.url === url) state.data = prepare(b); return state.data; })
+      .catch(function () { state.promise = null; return null; });
+    return state.promise;
+  }
+
+  function search(query, opts) {
+    const d = state.data;
+    if (!d) return null;                        // not ready → caller falls back
+    const q = fold(query);
+    if (!q) return [];
+    const limit = opts.limit || 50;
+    const favs = opts.favs;                     // Set | null
+    const need = (opts.wiki ? 1 : 0) | (opts.pop ? 2 : 0);
+    const wq = " " + q;
+
+    const tiers = [[], [], []];
+    for (let j = 0; j < d.order.length; j++) {
+      const i = d.order[j];
+      const k = d.keys[i];
+      const at = k.indexOf(q);
+      if (at < 0) continue;
+      if (need && ((+d.flags[i]) & need) !== need) continue;
+      if (favs && !favs.has(d.values[i])) continue;
+
+      const t = at === 0 ? 0 : ((" " + k).indexOf(wq) >= 0 ? 1 : 2);
+      // substring hits are re-ranked by length below, so keep a deeper pool
+      if (tiers[t].length < (t === 2 ? 40 * limit : limit)) tiers[t].push(i);
+      if (tiers[0].length >= limit) break;
+    }
+    // substring tier: shortest labels first (as on the server)
+    tiers[2].sort(function (a, c) { return d.keys[a].length - d.keys[c].length; });   // stable
+
+    const out = [];
+    for (const t of tiers) {
+      for (const i of t) {
+        if (out.length >= limit) return out;
+        out.push({ label: d.labels[i], value: d.values[i] });
+      }
+    }
+    return out;
+  }
+
+  window.pelagicaSearch = { load: load, search: search };
+})();
@@ -0,0 +1,109 @@
+// assets/size_nav.js
+// Size-axis (prev / next) navigation in the browser.
+//
+// The server ships one payload per (wiki, popular) combination from
+// /nav/size-order (ETag-cached):
+//   { gs: [names small → large], len: [Length_cm], ord: [order code], orders: [order names] }
+// Favourites and the order lock are applied here, so stepping and the
+// prev/next disabled state never round-trip to the server.  A species
+// outside the payload is placed by its own length / order ({gs, len, ord}
+// in the size-current store), fetched from /nav/size-current only for
+// such species.
+(function () {
+  const idxCache = new WeakMap();   // payload → Map(gs → i)
+  const subCache = new WeakMap();   // payload → Map(key → Int32Array of payload indices)
+
+  function indexOf(nav, gs) {
+    let m = idxCache.get(nav);
+    if (!m) {
+      m = new Map();
+      nav.gs.forEach((g, i) => m.set(g, i));
+      idxCache.set(nav, m);
+    }
+    const i = m.get(gs);
+    return i === undefined ? -1 : i;
+  }
+
+  // Payload indices of the eligible species (ascending = small → large)
+  function subset(nav, favOn, favsJson, lockOrd) {
+    const key = (favOn ? favsJson || "[]" : "-") + "|" + lockOrd;
+    let byKey = subCache.get(nav);
+    if (!byKey) { byKey = new Map(); subCache.set(nav, byKey); }
+    let sub = byKey.get(key);
+    if (sub) return sub;
+
+    let favs = null;
+    if (favOn) {
+      try { favs = new Set(JSON.parse(favsJson || "[]")); } catch (e) { favs = new Set(); }
+    }
+    const out = [];
+    for (let i = 0; i < nav.gs.length; i++) {
+      if (lockOrd >= 0 && nav.ord[i] !== lockOrd) continue;
+      if (favs && !favs.has(nav.gs[i])) continue;
+      out.push(i);
+    }
+    sub = Int32Array.from(out);
+    if (byKey.size > 16) byKey.clear();
+    byKey.set(key, sub);
+    return sub;
+  }
+
+  // Length / order code of the current species: from the payload, else
+  // from the size-current store (SizeIndex.current) when it is for the
+  // same species; null when neither is known yet.
+  function info(nav, current, cur) {
+    const i = indexOf(nav, current);
+    if (i >= 0) return { i: i, len: nav.len[i], ord: nav.ord[i] };
+    if (cur && cur.gs === current) return { i: -1, len: cur.len, ord: cur.ord };
+    return null;
+  }
+
+  // Position of `current` in `sub`; nearest by length when it is not a
+  // member; 0 when its length is unknown.
+  function locate(nav, sub, me) {
+    let lo = 0, hi = sub.length;
+    if (me.i >= 0) {
+      while (lo < hi) { const mid = (lo + hi) >> 1; if (sub[mid] < me.i) lo = mid + 1; else hi = mid; }
+      if (lo < sub.length && sub[lo] === me.i) return lo;
+      // payload is sorted by length, so `lo` is also the length insertion point
+    } else {
+      if (me.len === null || me.len === undefined) return 0;
+      const key = function (k) { const v = nav.len[sub[k]]; return v === null ? Infinity : v; };
+      while (lo < hi) { const mid = (lo + hi) >> 1; if (key(mid) < me.len) lo = mid + 1; else hi = mid; }
+    }
+    if (me.len === null || me.len === undefined) return 0;
+    const a = Math.max(0, lo - 1), b = Math.min(sub.length - 1, lo);
+    return Math.abs(nav.len[sub[a]] - me.len) <= Math.abs(nav.len[sub[b]] - me.len) ? a : b;
+  }
+
+  function resolve(nav, favOn, favsJson, lockOn, current, cur) {
+    if (!nav || !Array.isArray(nav.gs) || !nav.gs.length || !current) return null;
+    const me = info(nav, current, cur);
+    if (!me) return null;                    // size-current not loaded yet
+    let lockOrd = -1;                       // -1 = no lock
+    if (lockOn) {
+      if (me.ord < 0) return null;          // order unknown → nothing to step through
+      lockOrd = me.ord;
+    }
+    const sub = subset(nav, favOn, favsJson, lockOrd);
+    if (!sub.length) return null;
+    return { sub: sub, idx: locate(nav, sub, me) };
+  }
+
+  window.pelagicaSizeNav = {
+    known: function (nav, current) {
+      return !!nav && Array.isArray(nav.gs) && indexOf(nav, current) >= 0;
+    },
+    step: function (nav, favOn, favsJson, lockOn, current, dir, cur) {
+      const r = resolve(nav, favOn, favsJson, lockOn, current, cur);
+      if (!r) return null;
+      const next = Math.max(0, Math.min(r.sub.length - 1, r.idx + dir));
+      return next === r.idx ? null : nav.gs[r.sub[next]];
+    },
+    ends: function (nav, favOn, favsJson, lockOn, current, cur) {
+      const r = resolve(nav, favOn, favsJson, lockOn, current, cur);
+      if (!r) return null;
+      return [r.idx <= 0, r.idx >= r.sub.length - 1];
+    },
+  };
+})();
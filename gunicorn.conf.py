@@ -0,0 +1,76 @@
+# gunicorn.conf.py
+# ------------------------------------------------------------
+# Preload-and-fork layout: the master imports app.py once (df_full,
+# df_light, popular_set, COMMON_NAMES, taxonomy frames …), freezes the
+# GC so those objects are never rewritten by a collection, and then
+# forks WEB_CONCURRENCY workers that share the pages copy-on-write.
+# The species table itself is a memory-mapped Arrow snapshot
+# (src/process_data.py), so its column buffers are file-backed and
+# shared even without fork.
+#
+#   WEB_CONCURRENCY   workers            (default 1)
+#   GUNICORN_THREADS  threads per worker (default 8)
+#   MEM_REPORT        1 = log per-process / cluster memory at boot
+#   MEM_REPORT_DELAY  seconds before the cluster summary (default 15)
+#   REMBG_WARM        1 = load the rembg model right after a worker starts
+#                     (only with ENABLE_BG_REMOVAL=1 and inline removal)
+import gc
+import os
+import threading
+
+from src.memory_report import format_line, cluster_summary
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8050')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+timeout = 120
+graceful_timeout = 20
+keepalive = 3
+preload_app = True
+
+MEM_REPORT = os.getenv("MEM_REPORT", "1") == "1"
+MEM_REPORT_DELAY = float(os.getenv("MEM_REPORT_DELAY", "15"))
+REMBG_WARM = os.getenv("REMBG_WARM", "1") == "1"
+
+
+def when_ready(server):
+    # Runs in the master after app.py was imported, right before forking.
+    gc.collect()
+    gc.freeze()      # move everything loaded so far to the permanent generation
+    if MEM_REPORT:
+        print(format_line(f"master {os.getpid()} after preload"), flush=True)
+        print(f"🧊 gc.freeze(): {gc.get_freeze_count():,} objects frozen; "
+              f"forking {server.num_workers} worker(s) × {threads} threads", flush=True)
+
+
+def _warm_rembg():
+    # Async mode warms its own process pool (src/bg_jobs.py); inline mode
+    # would otherwise pay model load + first inference on a user request.
+    from src import bg_jobs, wiki
+    if not wiki.ENABLE_BG_REMOVAL or bg_jobs.ENABLED:
+        return
+    try:
+        wiki.warm_rembg()
+        print(f"🔥 worker {os.getpid()}: rembg session warm", flush=True)
+    except Exception as e:
+        print(f"⚠️  rembg warm-up failed: {e}", flush=True)
+
+
+def post_worker_init(worker):
+    if REMBG_WARM:
+        threading.Thread(target=_warm_rembg, daemon=True).start()
+    if not MEM_REPORT:
+        return
+    print(format_line(f"worker {worker.pid} (age {worker.age})"), flush=True)
+
+    # The last worker spawned at boot reports the whole cluster once the
+    # others had a moment to finish booting.
+    if worker.age == worker.cfg.workers:
+        def _report():
+            line = cluster_summary(worker.ppid)
+            if line:
+                print(line, flush=True)
+        t = threading.Timer(MEM_REPORT_DELAY, _report)
+        t.daemon = True
+        t.start()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+bench_rembg.py
+--------------
+Throughput / memory benchmark for background removal (src/rembg_batch.py).
+
+Every combination of model × batch size × BG_MAX_SIDE (× quantised) runs
+in a fresh spawned process, so the reported peak RSS belongs to that
+configuration alone, next to the rembg.remove baseline (batch "plain",
+PlainRemover: the path the app and the warmer use by default) for each
+model × BG_MAX_SIDE.  Reports model load + warm-up time, images/sec over
+the timed rounds and peak RSS.
+
+Input images: --images DIR (jpg/png/webp), else the first --limit files in
+image_cache/, else synthetic noise.
+
+Run:  python -m src.bench_rembg
+      python -m src.bench_rembg --models u2netp,u2net --batch 1,4,8 \\
+             --max-side 512,800 --quantized --limit 32
+      OMP_NUM_THREADS=1 python -m src.bench_rembg      # like the 1-CPU box
+"""
+
+import argparse
+import glob
+import io
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _load_images(folder, limit):
+    paths = []
+    for pattern in ("*.jpg", "*.jpeg", "*.png", "*.webp"):
+        paths.extend(glob.glob(os.path.join(folder or "image_cache", pattern)))
+    paths = sorted(paths)[:limit]
+    if paths:
+        out = []
+        for p in paths:
+            with open(p, "rb") as fh:
+                out.append(fh.read())
+        return out, f"{len(out)} files from {folder or 'image_cache'}"
+
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    out = []
+    for _ in range(limit):
+        buf = io.BytesIO()
+        Image.fromarray(rng.integers(0, 255, (640, 960, 3), dtype=np.uint8)).save(buf, "PNG")
+        out.append(buf.getvalue())
+    return out, f"{limit} synthetic 960×640 images"
+
+
+def _run_config(model, batch, max_side, quantized, images, rounds):
+    """(child process) one configuration → result row."""
+    os.environ["BG_MAX_SIDE"] = str(max_side)      # read by src.wiki at import
+    os.environ["ENABLE_BG_REMOVAL"] = "1"
+    import resource
+    from src.rembg_batch import BatchRemover, PlainRemover
+
+    t0 = time.perf_counter()
+    if batch == "plain":
+        remover = PlainRemover(model).warm()
+    else:
+        remover = BatchRemover(model, quantized=quantized, batch_size=batch).warm()
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        remover.remove(images)
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "model": model + (" (q)" if quantized else ""),
+        "batch": batch,
+        "max_side": max_side,
+        "batched": remover._batched,
+        "load_s": load_s,
+        "ips": rounds * len(images) / elapsed,
+        "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main(models, batches, max_sides, quantized, folder, limit, rounds):
+    images, source = _load_images(folder, limit)
+    print(f"🧪 Benchmarking on {source}, {rounds} round(s), "
+          f"OMP_NUM_THREADS={os.getenv('OMP_NUM_THREADS', '1')}")
+
+    variants = [False, True] if quantized else [False]
+    ctx = multiprocessing.get_context("spawn")
+    rows, plain = [], {}                    # (model, max_side) → rembg.remove img/s
+    configs = [(model, False, max_side, "plain")
+               for model, max_side in itertools.product(models, max_sides)]
+    configs += itertools.product(models, variants, max_sides, batches)
+    for model, q, max_side, batch in configs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            try:
+                row = pool.submit(_run_config, model, batch, max_side, q, images, rounds).result()
+            except Exception as e:
+                print(f"⚠️  {model}{' (q)' if q else ''} batch={batch} side={max_side}: {e}")
+                continue
+        rows.append(row)
+        if batch == "plain":
+            plain[(model, max_side)] = row["ips"]
+        base = plain.get((model, max_side))
+        print(f"   {row['model']:<18} batch={row['batch']:<5} side={row['max_side']:<5} "
+              f"{row['ips']:6.2f} img/s  peak {row['peak_mb']:6.0f} MB  "
+              f"(load {row['load_s']:.1f} s"
+              f"{'' if row['batched'] or batch == 'plain' else ', fixed batch axis'})"
+              + (f"  ×{row['ips'] / base:.2f} vs rembg.remove" if base and batch != "plain" else ""))
+
+    if rows:
+        best = max(rows, key=lambda r: r["ips"])
+        lean = min(rows, key=lambda r: r["peak_mb"])
+        print(f"✅ fastest: {best['model']} batch={best['batch']} side={best['max_side']} "
+              f"({best['ips']:.2f} img/s, {best['peak_mb']:.0f} MB)")
+        print(f"✅ leanest: {lean['model']} batch={lean['batch']} side={lean['max_side']} "
+              f"({lean['ips']:.2f} img/s, {lean['peak_mb']:.0f} MB)")
+
+
+def _csv(kind):
+    return lambda s: [kind(x) for x in s.split(",") if x.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark batched background removal against rembg.remove "
+                    "(images/sec, peak RSS)"
+    )
+    parser.add_argument("--models", type=_csv(str), default=["u2netp"],
+                        help="Comma-separated rembg models (u2net family)")
+    parser.add_argument("--batch", type=_csv(int), default=[1, 4, 8],
+                        help="Comma-separated batch sizes")
+    parser.add_argument("--max-side", type=_csv(int), default=[800],
+                        help="Comma-separated BG_MAX_SIDE values")
+    parser.add_argument("--quantized", action="store_true",
+                        help="Also run dynamically quantised model variants")
+    parser.add_argument("--images", default=None,
+                        help="Folder of input images (default: image_cache/)")
+    parser.add_argument("--limit", type=int, default=16,
+                        help="Number of images per round")
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="Timed passes over the images")
+    args = parser.parse_args()
+
+    main(args.models, args.batch, args.max_side, args.quantized,
+         args.images, args.limit, args.rounds)
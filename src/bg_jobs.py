@@ -0,0 +1,117 @@
+# src/bg_jobs.py
+# ------------------------------------------------------------
+# Background removal off the request path.
+#
+# A cold species used to wait for download → resize → ONNX inference →
+# WebP encode inside the Dash callback.  With BG_ASYNC on, get_commons_thumb
+# caches the raw thumbnail, returns the *processed* file name at once and
+# queues the rembg run here.  /cached-images falls back processed → raw,
+# so the raw image paints first; the browser polls /bg-status/<stem> and
+# swaps in the processed file when it lands (assets/bg_swap.js).
+#
+# Jobs run in a spawn-started process pool (REMBG_PROCS per web worker),
+# so model memory and CPU stay out of the gunicorn worker.  The image is
+# written before its metadata, and metadata presence is what counts as a
+# cache hit.
+#
+# Needs a writable local cache: off when CACHE_WRITE=0 or on R2, where the
+# processed file would never appear – those keep the inline path.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.image_cache import (
+    is_cached, save_image_to_cache, save_metadata_to_cache, enforce_cache_limit,
+)
+
+_IS_FLY = any(k in os.environ for k in ("FLY_APP_NAME", "FLY_ALLOC_ID", "FLY_REGION"))
+_USE_R2 = _IS_FLY or os.getenv("USE_R2", "").strip().lower() in ("1", "true", "yes", "on")
+
+ENABLED = (
+    os.getenv("BG_ASYNC", "1") == "1"
+    and os.getenv("CACHE_WRITE", "1") == "1"
+    and not _USE_R2
+)
+REMBG_PROCS = int(os.getenv("REMBG_PROCS", "1"))
+
+_lock = threading.Lock()
+_pool = {"pid": None, "executor": None, "broken": False}
+_jobs = {}          # processed stem → "pending" | "failed"
+
+
+def _executor() -> ProcessPoolExecutor:
+    pid = os.getpid()
+    if _pool["pid"] != pid or _pool["broken"]:
+        if _pool["pid"] == pid:
+            _pool["executor"].shutdown(wait=False, cancel_futures=True)
+        else:
+            _jobs.clear()                   # inherited from the parent: not ours
+        _pool.update(
+            pid=pid, broken=False,
+            executor=ProcessPoolExecutor(max_workers=REMBG_PROCS,
+                                         mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_warm_child),
+        )
+    return _pool["executor"]
+
+
+def _warm_child():
+    """(child process) load the model once, before the first job arrives."""
+    try:
+        from src import wiki
+        wiki.warm_rembg()
+    except Exception as e:
+        print(f"⚠️  [bg] rembg warm-up skipped: {e}")
+
+
+def _remove_bg_job(raw_path: str, out_stem: str, meta: dict) -> str:
+    """(child process) raw cached thumbnail → background removed → processed cache entry."""
+    from src import wiki
+
+    # one image per job: plain rembg.remove (EXIF transpose, its own pre/post-
+    # processing); src/rembg_batch is for the bulk warmer only
+    wiki._lazy_load_rembg_stack()
+    with open(raw_path, "rb") as fh:
+        img_bytes = wiki._shrink_for_rembg(fh.read())
+    img_bytes = wiki._rembg_remove(img_bytes, session=wiki._get_rembg_session())
+
+    save_image_to_cache(out_stem, img_bytes)
+    save_metadata_to_cache(out_stem, meta, "processed")   # last: marks the entry complete
+    enforce_cache_limit()
+    return out_stem
+
+
+def _finished(stem, future):
+    err = future.exception()
+    with _lock:
+        if err is None:
+            _jobs.pop(stem, None)
+        else:
+            _jobs[stem] = "failed"
+        if isinstance(err, BrokenProcessPool):
+            _pool["broken"] = True          # child died (OOM?) → fresh pool on next submit
+    if err is not None:
+        print(f"⚠️  [bg] background removal failed for {stem}: {err}")
+
+
+def enqueue(raw_path: str, out_stem: str, meta: dict) -> bool:
+    """Queue one job per processed stem; False if already done, queued or failed."""
+    if is_cached(out_stem):
+        return False
+    with _lock:
+        if out_stem in _jobs:
+            return False
+        fut = _executor().submit(_remove_bg_job, raw_path, out_stem, dict(meta))
+        _jobs[out_stem] = "pending"
+    fut.add_done_callback(lambda f: _finished(out_stem, f))
+    return True
+
+
+def state(stem: str):
+    """"done" | "pending" | "failed" | None (unknown to this worker)."""
+    if is_cached(stem):
+        return "done"
+    with _lock:
+        return _jobs.get(stem) if _pool["pid"] == os.getpid() else None
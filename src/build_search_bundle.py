@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+build_search_bundle.py
+----------------------
+Writes the browser-side typeahead index (assets/name_search.js) from
+load_name_table():
+
+    data/processed/search/names.<hash>.json      raw
+    data/processed/search/names.<hash>.json.gz   gzip -9
+    data/processed/search/names.<hash>.json.br   brotli (if installed)
+    data/processed/search/manifest.json          {"file", "hash", "rows", …}
+
+The content hash is in the file name, so the app serves it as immutable;
+rebuilding with new data produces a new name and busts every cache.
+
+Bundle layout (row-aligned arrays):
+    labels  dropdown_label shown in common-dd
+    values  Genus_Species (the dropdown value)
+    flags   one digit per row: bit 0 = has_wiki_page, bit 1 = popular
+
+Run:  python -m src.build_search_bundle
+      python -m src.build_search_bundle --out-dir /tmp/search
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from src.process_data import load_name_table
+
+SEARCH_DIR = os.getenv("SEARCH_BUNDLE_DIR", "data/processed/search")
+POPULAR_CSV = "data/processed/popular_species.csv"
+
+
+def build_bundle() -> dict:
+    df = load_name_table()
+    pop = pd.read_csv(POPULAR_CSV)
+    popular = set(pop["Genus"] + " " + pop["Species"])
+
+    wiki = df["has_wiki_page"].astype(object).eq(True).to_numpy()
+    is_pop = df["Genus_Species"].isin(popular).to_numpy()
+    flags = "".join(str(int(w) | (int(p) << 1)) for w, p in zip(wiki, is_pop))
+
+    return {
+        "v": 1,
+        "labels": df["dropdown_label"].fillna("").astype(str).tolist(),
+        "values": df["Genus_Species"].astype(str).tolist(),
+        "flags": flags,
+    }
+
+
+def main(out_dir=SEARCH_DIR):
+    bundle = build_bundle()
+    raw = json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.blake2b(raw, digest_size=8).hexdigest()
+    name = f"names.{digest}.json"
+
+    os.makedirs(out_dir, exist_ok=True)
+    # drop bundles from earlier builds
+    for old in glob.glob(os.path.join(out_dir, "names.*.json*")):
+        if not os.path.basename(old).startswith(name):
+            os.remove(old)
+
+    path = os.path.join(out_dir, name)
+    with open(path, "wb") as fh:
+        fh.write(raw)
+    with open(path + ".gz", "wb") as fh:
+        fh.write(gzip.compress(raw, compresslevel=9, mtime=0))
+    sizes = {"json": len(raw), "gz": os.path.getsize(path + ".gz")}
+
+    try:
+        import brotli
+        with open(path + ".br", "wb") as fh:
+            fh.write(brotli.compress(raw, quality=11))
+        sizes["br"] = os.path.getsize(path + ".br")
+    except ImportError:
+        print("⚠️  brotli not installed – skipping .br variant")
+
+    manifest = {"file": name, "hash": digest, "rows": len(bundle["values"]), "sizes": sizes}
+    with open(os.path.join(out_dir, "manifest.json"), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    pretty = ", ".join(f"{k} {v / 1024:.0f} kB" for k, v in sizes.items())
+    print(f"✅ Search bundle → {path} ({manifest['rows']:,} rows; {pretty})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the precompressed client-side name search bundle"
+    )
+    parser.add_argument("--out-dir", default=SEARCH_DIR,
+                        help="Destination directory (default: data/processed/search)")
+    args = parser.parse_args()
+
+    main(out_dir=args.out_dir)
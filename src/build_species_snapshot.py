@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+build_species_snapshot.py
+-------------------------
+Parses data/processed/filtered_combined_species.csv, applies the extra
+species + common-name overrides, merges gbif_taxonomy.csv and writes the
+result (df_full) to a versioned Arrow snapshot that the app memory-maps
+at boot instead of redoing all of that work.
+
+Run:  python -m src.build_species_snapshot
+      python -m src.build_species_snapshot --out /tmp/species.arrow
+"""
+
+import argparse
+import os
+import time
+
+from src.process_data import (
+    SNAPSHOT_PATH, SNAPSHOT_VERSION, merge_species_taxonomy,
+    write_species_snapshot, load_species_snapshot,
+)
+
+
+def main(out=SNAPSHOT_PATH, check=True):
+    start = time.time()
+    print("📑 Building merged species table from CSV …")
+    df = merge_species_taxonomy()
+    print(f"   {len(df):,} rows × {df.shape[1]} cols in {time.time() - start:.1f} s")
+
+    write_species_snapshot(df, out)
+    size_mb = os.path.getsize(out) / 1024**2
+    print(f"✅ Snapshot v{SNAPSHOT_VERSION} written → {out} ({size_mb:.1f} MB)")
+
+    if check:
+        start = time.time()
+        back = load_species_snapshot(out)
+        if back is None or back.shape != df.shape or list(back.columns) != list(df.columns):
+            raise SystemExit("❌ Snapshot round-trip failed")
+        print(f"🔁 Round-trip OK ({time.time() - start:.2f} s to map + convert)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the prebuilt species snapshot used at app boot"
+    )
+    parser.add_argument("--out", default=SNAPSHOT_PATH,
+                        help="Destination .arrow file")
+    parser.add_argument("--no-check", action="store_true",
+                        help="Skip the read-back sanity check")
+    args = parser.parse_args()
+
+    main(out=args.out, check=not args.no_check)
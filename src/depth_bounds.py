@@ -0,0 +1,64 @@
+# src/depth_bounds.py
+# ------------------------------------------------------------
+# Compact payloads behind the depth (up / down) navigation.
+#
+# The depth bounds of a species never change while the app runs, so they
+# ship once in a static, ETag-cached table (/nav/species-table):
+#
+#     { v, gs: [name per table id], sh: b64 float32, dp: b64 float32 }
+#
+# Only rows with usable bounds (both present, deep ≥ shallow) get a table
+# id.  A filter combination (wiki / popular / favourites [+ order lock])
+# then reduces to a sorted list of table ids, sent as base64 int32 and
+# memoised per key – instead of re-building [[gs, shallow, deep], …] for
+# tens of thousands of rows on every toggle.
+import base64
+import hashlib
+import json
+from functools import lru_cache
+
+import numpy as np
+
+
+def _b64(a: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(a).tobytes()).decode("ascii")
+
+
+class DepthBounds:
+    def __init__(self, filter_index, maxsize: int = 64):
+        self._filters = filter_index
+        sh, dp = filter_index.depth_sh, filter_index.depth_dp
+
+        ok = ~np.isnan(sh) & ~np.isnan(dp)
+        ok[ok] = dp[ok] >= sh[ok]
+        self.table_pos = np.flatnonzero(ok).astype(np.int32)          # table id → row
+        self.tid = np.full(filter_index.n, -1, dtype=np.int32)         # row → table id
+        self.tid[self.table_pos] = np.arange(len(self.table_pos), dtype=np.int32)
+        for a in (self.table_pos, self.tid):
+            a.flags.writeable = False
+
+        body = {
+            "v": 1,
+            "gs": filter_index.names[self.table_pos].tolist(),
+            "sh": _b64(sh[self.table_pos].astype("<f4")),
+            "dp": _b64(dp[self.table_pos].astype("<f4")),
+        }
+        self.table_json = json.dumps(body, separators=(",", ":")).encode()
+        self.table_etag = hashlib.blake2b(self.table_json, digest_size=12).hexdigest()
+
+        self.eligible_for = lru_cache(maxsize=maxsize)(self._eligible_for)
+
+    def eligible(self, wiki_val, pop_val, fav_val=None, favs_data=None, lock_order=None):
+        """{"t": table etag, "n": count, "ids": b64 int32} – shared, do not mutate."""
+        if lock_order is not None and not isinstance(lock_order, str):
+            lock_order = ""               # unknown (NaN) order → empty, and a stable cache key
+        return self.eligible_for(*self._filters.key(wiki_val, pop_val, fav_val, favs_data),
+                                 lock_order)
+
+    def _eligible_for(self, wiki_on, pop_on, favs, lock_order=None):
+        pos = self._filters.positions_for(wiki_on, pop_on, favs)
+        if lock_order is not None:
+            pos = self._filters.select(pos, "order", lock_order)
+        ids = self.tid[pos]
+        ids = ids[ids >= 0].astype("<i4")                 # positions are sorted → ids too
+        return {"t": self.table_etag, "n": int(len(ids)), "ids": _b64(ids)}
@@ -0,0 +1,297 @@
+# src/fav_utils/fav_store.py
+# ------------------------------------------------------------
+# Favourites in one SQLite file (WAL) instead of fav_state.csv + fav_events.csv.
+#
+#     fav_state(sid, species, last_state, last_ts)     one row per (sid, species)
+#     fav_events(ts, sid, species, state)              append-only, indexed by ts
+#
+# /fav/toggle used to read the whole state CSV, mask it and rewrite it on
+# every click.  Here a toggle is a primary-key lookup plus two inserts, so
+# its cost no longer grows with history.  Toggles are handed to one writer
+# thread per process, which commits everything queued meanwhile in a
+# single transaction (group commit).  Check and write happen inside that
+# BEGIN IMMEDIATE transaction, so concurrent toggles — other threads or
+# other workers — cannot overwrite each other.  A caller that gives up
+# waiting cancels its queued toggle, so a toggle reported as failed is
+# never committed later; one already inside a commit is waited for.
+#
+# On first use an empty store imports the existing CSVs; `export` writes
+# them back in the old format (scoring / warm_cache read the store).
+#
+#   FAV_STORE=0         disable (CSV files, as before)
+#   FAV_STORE_PATH      database file (default data/processed/favs.sqlite3)
+#
+# Run:  python -m src.fav_utils.fav_store stats
+#       python -m src.fav_utils.fav_store export     # → fav_state.csv / fav_events.csv
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+
+ENABLED = os.getenv("FAV_STORE", "1") == "1"
+DB_PATH = os.getenv("FAV_STORE_PATH", "data/processed/favs.sqlite3")
+FAV_DIR = "data/processed"
+FAV_EVENTS_CSV = os.path.join(FAV_DIR, "fav_events.csv")
+FAV_STATE_CSV = os.path.join(FAV_DIR, "fav_state.csv")
+RATE_LIMIT_S = 30                  # min seconds between flips of one (sid, species)
+MAX_BATCH = 256
+
+OK, IDEMPOTENT, TOO_FAST = "ok", "idempotent", "too-fast"
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS fav_state (
+        sid        TEXT NOT NULL,
+        species    TEXT NOT NULL,
+        last_state INTEGER NOT NULL,
+        last_ts    REAL NOT NULL,
+        PRIMARY KEY (sid, species)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fav_events (
+        ts      REAL NOT NULL,
+        sid     TEXT NOT NULL,
+        species TEXT NOT NULL,
+        state   INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS fav_events_ts ON fav_events (ts)",
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+_st = {"broken": False, "writer_pid": None, "queue": None, "batches": 0, "toggles": 0}
+
+
+def _connect():
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    c = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None, check_same_thread=False)
+    c.execute("PRAGMA journal_mode=WAL")
+    c.execute("PRAGMA synchronous=NORMAL")
+    for stmt in _SCHEMA:
+        c.execute(stmt)
+    return c
+
+
+def _conn():
+    """Per-thread (and per-process) read connection; None when disabled or unavailable."""
+    if not ENABLED or _st["broken"]:
+        return None
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        try:
+            c = _connect()
+            _import_if_empty(c)
+        except sqlite3.Error as e:
+            print(f"⚠️  fav store disabled ({DB_PATH}): {e}")
+            _st["broken"] = True
+            return None
+        _local.conn, _local.pid = c, pid
+    return _local.conn
+
+
+def available() -> bool:
+    return _conn() is not None
+
+
+# ---- CSV import / export ----------------------------------------------------
+def _ts(iso) -> float:
+    return datetime.fromisoformat(str(iso)).timestamp()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _read_csv(path):
+    import csv
+    try:
+        with open(path, newline="", encoding="utf-8") as fh:
+            return list(csv.DictReader(fh))
+    except FileNotFoundError:
+        return []
+
+
+def _is_empty(c) -> bool:
+    return c.execute("SELECT 1 FROM fav_state UNION ALL SELECT 1 FROM fav_events LIMIT 1"
+                     ).fetchone() is None
+
+
+def _import_if_empty(c):
+    """Existing CSVs → an empty store (once; other processes see the rows and skip)."""
+    if not _is_empty(c):
+        return
+    state = [(r["sid"], r["species"], int(r["last_state"]), _ts(r["last_ts_utc"]))
+             for r in _read_csv(FAV_STATE_CSV)]
+    events = [(_ts(r["ts_utc"]), r["sid"], r["species"], int(r["state"]))
+              for r in _read_csv(FAV_EVENTS_CSV)]
+    if not state and not events:
+        return
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        if not _is_empty(c):
+            c.execute("ROLLBACK")                 # another process imported meanwhile
+            return
+        c.executemany("INSERT OR REPLACE INTO fav_state VALUES (?, ?, ?, ?)", state)
+        c.executemany("INSERT INTO fav_events VALUES (?, ?, ?, ?)", events)
+        c.execute("COMMIT")
+    except sqlite3.Error:
+        c.execute("ROLLBACK")
+        raise
+    print(f"📥 fav store: imported {len(state):,} states, {len(events):,} events from CSV")
+
+
+def export_csv(state_path=FAV_STATE_CSV, events_path=FAV_EVENTS_CSV) -> tuple:
+    """Store → the CSV layout the app used before; (states, events) written."""
+    import csv
+    c = _conn()
+    if c is None:
+        return 0, 0
+    n_state = n_events = 0
+    with open(state_path + ".tmp", "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(["sid", "species", "last_state", "last_ts_utc"])
+        for sid, species, st, ts in c.execute(
+                "SELECT sid, species, last_state, last_ts FROM fav_state ORDER BY last_ts"):
+            w.writerow([sid, species, st, _iso(ts)])
+            n_state += 1
+    with open(events_path + ".tmp", "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(["ts_utc", "sid", "species", "state"])
+        for ts, sid, species, st in c.execute(
+                "SELECT ts, sid, species, state FROM fav_events ORDER BY ts"):
+            w.writerow([_iso(ts), sid, species, st])
+            n_events += 1
+    os.replace(state_path + ".tmp", state_path)
+    os.replace(events_path + ".tmp", events_path)
+    return n_state, n_events
+
+
+# ---- writes: group commit ---------------------------------------------------
+def _apply(c, sid, species, state, now) -> str:
+    row = c.execute("SELECT last_state, last_ts FROM fav_state WHERE sid = ? AND species = ?",
+                    (sid, species)).fetchone()
+    if row is not None:
+        last_state, last_ts = row
+        if last_state == state:
+            return IDEMPOTENT
+        if now - last_ts < RATE_LIMIT_S:
+            return TOO_FAST
+    c.execute("INSERT INTO fav_events (ts, sid, species, state) VALUES (?, ?, ?, ?)",
+              (now, sid, species, state))
+    c.execute("INSERT OR REPLACE INTO fav_state (sid, species, last_state, last_ts) "
+              "VALUES (?, ?, ?, ?)", (sid, species, state, now))
+    return OK
+
+
+def _writer(c, q):
+    while True:
+        batch = [q.get()]
+        while len(batch) < MAX_BATCH:                 # everything queued meanwhile
+            try:
+                batch.append(q.get_nowait())
+            except queue.Empty:
+                break
+        # callers that timed out cancelled theirs; the rest can no longer cancel
+        batch = [(args, fut) for args, fut in batch if fut.set_running_or_notify_cancel()]
+        if not batch:
+            continue
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            results = [_apply(c, *args) for args, _ in batch]
+            c.execute("COMMIT")
+        except Exception as e:
+            if c.in_transaction:
+                c.execute("ROLLBACK")
+            print(f"⚠️  fav store: commit of {len(batch)} toggles failed: {e}")
+            for _, fut in batch:
+                fut.set_exception(e)
+            continue
+        _st["batches"] += 1
+        _st["toggles"] += len(batch)
+        for (_, fut), res in zip(batch, results):
+            fut.set_result(res)
+
+
+def _queue():
+    """This process's writer queue (threads don't survive gunicorn's fork)."""
+    pid = os.getpid()
+    if _st["writer_pid"] != pid:
+        with _lock:
+            if _st["writer_pid"] != pid:
+                q = queue.Queue()
+                threading.Thread(target=_writer, args=(_connect(), q),
+                                 name="fav-store", daemon=True).start()
+                _st.update(writer_pid=pid, queue=q)
+    return _st["queue"]
+
+
+def toggle(sid: str, species: str, state: int, now: datetime | None = None,
+           timeout: float = 10) -> str:
+    """
+    Record a favourite flip; OK, IDEMPOTENT (already in that state) or TOO_FAST.
+    Raises TimeoutError when the writer did not get to it within *timeout*
+    (the toggle is then withdrawn: nothing is written).
+    """
+    if _conn() is None:                     # also runs the CSV import before the first write
+        raise RuntimeError("fav store unavailable")
+    ts = (now or datetime.now(timezone.utc)).timestamp()
+    fut = Future()
+    _queue().put(((sid, species, int(state), ts), fut))
+    try:
+        return fut.result(timeout=timeout)
+    except FutureTimeout:
+        if fut.cancel():
+            raise
+        return fut.result()                 # already in a commit (bounded by the busy timeout)
+
+
+# ---- reads ------------------------------------------------------------------
+def events_frame(start: datetime | None = None, end: datetime | None = None):
+    """Events in [start, end) as the DataFrame fav_events.csv used to give."""
+    import pandas as pd
+    c = _conn()
+    sql, args = "SELECT ts, sid, species, state FROM fav_events", []
+    if start is not None:
+        sql, args = sql + " WHERE ts >= ? AND ts < ?", [start.timestamp(), end.timestamp()]
+    df = pd.DataFrame(c.execute(sql, args).fetchall(), columns=["ts_utc", "sid", "species", "state"])
+    df["ts_utc"] = pd.to_datetime(df["ts_utc"], unit="s", utc=True)
+    return df
+
+
+def favourited_species() -> list:
+    """Species currently favourited by at least one session."""
+    c = _conn()
+    return [s for (s,) in c.execute(
+        "SELECT DISTINCT species FROM fav_state WHERE last_state = 1")]
+
+
+def stats() -> dict:
+    c = _conn()
+    if c is None:
+        return {}
+    return {
+        "states": c.execute("SELECT COUNT(*) FROM fav_state").fetchone()[0],
+        "events": c.execute("SELECT COUNT(*) FROM fav_events").fetchone()[0],
+        "batches": _st["batches"],
+        "toggles": _st["toggles"],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or export the favourites store")
+    parser.add_argument("action", choices=["stats", "export"])
+    args = parser.parse_args()
+
+    if not available():
+        raise SystemExit(f"❌ fav store unavailable ({DB_PATH})")
+    if args.action == "export":
+        n_state, n_events = export_csv()
+        print(f"📤 {n_state:,} states → {FAV_STATE_CSV}, {n_events:,} events → {FAV_EVENTS_CSV}")
+    s = stats()
+    print(f"   {s['states']:,} (sid, species) states, {s['events']:,} events in {DB_PATH}")
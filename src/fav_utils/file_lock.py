@@ -0,0 +1,26 @@
+# file_lock.py
+# Cross-process lock for the small CSV stores in data/processed.
+# With several gunicorn workers the read-modify-write in /fav/toggle and
+# the weekly-winner append can interleave; flock serialises them (and
+# threads inside one worker too, since every call opens its own fd).
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:          # non-POSIX dev box → no-op lock
+    fcntl = None
+
+
+@contextmanager
+def locked(path):
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
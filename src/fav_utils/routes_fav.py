@@ -4,6 +4,8 @@ from datetime import timedelta
 import pandas as pd
 from flask import request, jsonify
 from .utils_time import utcnow  # adjust import if utils_time is elsewhere
+from .file_lock import locked
+from . import fav_store
 
 FAV_DIR     = "data/processed"
 FAV_EVENTS  = os.path.join(FAV_DIR, "fav_events.csv")
@@ -50,52 +52,66 @@ def register_fav_routes(app_or_server):
         if not sid or not species:
             return jsonify({"ok": False, "err": "bad-args"}), 400
 
-        now = utcnow()
-
-        try:
-            st = pd.read_csv(FAV_STATE)
-        except FileNotFoundError:
-            st = pd.DataFrame(columns=["sid","species","last_state","last_ts_utc"])
+        # SQLite store: O(1) per toggle, group-committed, no lost updates
+        if fav_store.available():
+            try:
+                res = fav_store.toggle(sid, species, state, now=utcnow())
+            except Exception:           # incl. timeout: the toggle was withdrawn, safe to retry
+                return jsonify({"ok": False, "err": "store"}), 503
+            if res == fav_store.IDEMPOTENT:
+                return jsonify({"ok": True, "idempotent": True})
+            if res == fav_store.TOO_FAST:
+                return jsonify({"ok": False, "err": "too-fast"}), 429
+            return jsonify({"ok": True})
 
-        mask = (st.sid == sid) & (st.species == species)
+        # FAV_STORE=0: whole-file CSV rewrite, one writer at a time across workers/threads
+        with locked(FAV_STATE):
+            now = utcnow()
 
-        if mask.any():
             try:
-                last_state = int(st.loc[mask, "last_state"].iloc[0])
-            except Exception:
-                last_state = None
-            last_ts = pd.to_datetime(
-                st.loc[mask, "last_ts_utc"].iloc[0], utc=True, errors="coerce"
+                st = pd.read_csv(FAV_STATE)
+            except FileNotFoundError:
+                st = pd.DataFrame(columns=["sid","species","last_state","last_ts_utc"])
+
+            mask = (st.sid == sid) & (st.species == species)
+
+            if mask.any():
+                try:
+                    last_state = int(st.loc[mask, "last_state"].iloc[0])
+                except Exception:
+                    last_state = None
+                last_ts = pd.to_datetime(
+                    st.loc[mask, "last_ts_utc"].iloc[0], utc=True, errors="coerce"
+                )
+
+                # Idempotent no-op
+                if last_state == state:
+                    return jsonify({"ok": True, "idempotent": True})
+
+                # Lightweight rate limit
+                if last_ts is not None and (now - last_ts) < timedelta(seconds=30):
+                    return jsonify({"ok": False, "err": "too-fast"}), 429
+
+            # Append event (audit/debug)
+            _append_csv(
+                FAV_EVENTS,
+                {"ts_utc": now.isoformat(), "sid": sid, "species": species, "state": state},
             )
 
-            # Idempotent no-op
-            if last_state == state:
-                return jsonify({"ok": True, "idempotent": True})
-
-            # Lightweight rate limit
-            if last_ts is not None and (now - last_ts) < timedelta(seconds=30):
-                return jsonify({"ok": False, "err": "too-fast"}), 429
-
-        # Append event (audit/debug)
-        _append_csv(
-            FAV_EVENTS,
-            {"ts_utc": now.isoformat(), "sid": sid, "species": species, "state": state},
-        )
-
-        # Upsert current state
-        if mask.any():
-            st.loc[mask, ["last_state","last_ts_utc"]] = [state, now.isoformat()]
-        else:
-            st = pd.concat([
-                st,
-                pd.DataFrame([{
-                    "sid": sid, "species": species,
-                    "last_state": state, "last_ts_utc": now.isoformat()
-                }])
-            ], ignore_index=True)
-
-        st.to_csv(FAV_STATE, index=False)
-        return jsonify({"ok": True})
+            # Upsert current state
+            if mask.any():
+                st.loc[mask, ["last_state","last_ts_utc"]] = [state, now.isoformat()]
+            else:
+                st = pd.concat([
+                    st,
+                    pd.DataFrame([{
+                        "sid": sid, "species": species,
+                        "last_state": state, "last_ts_utc": now.isoformat()
+                    }])
+                ], ignore_index=True)
+
+            st.to_csv(FAV_STATE, index=False)
+            return jsonify({"ok": True})
 
     # Register the route on the Flask server
     flask_server.add_url_rule(
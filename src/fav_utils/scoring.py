@@ -2,6 +2,8 @@
 import os, pandas as pd
 from src.fav_utils.utils_time import prev_full_hour_window, prev_mon_sun_week, last_60m_window
 from datetime import timezone
+from src.fav_utils.file_lock import locked
+from src.fav_utils import fav_store
 
 DATA_DIR   = "data/processed"
 FAV_EVENTS = os.path.join(DATA_DIR, "fav_events.csv")
@@ -28,7 +30,6 @@ def top_species(*, debug=False, option="ever_favved", m0=0.6, horizon=8):
     Return (winner_species_or_None, scores_series).
     Tie-breaker: highest score → FEWEST past wins in winners.csv → alphabetical.
     """
-    events  = _load_df(FAV_EVENTS, ["ts_utc","sid","species","state"])
     winners = _load_df(WINNERS,    ["week_start_utc","species"])
 
     if debug:
@@ -39,6 +40,12 @@ def top_species(*, debug=False, option="ever_favved", m0=0.6, horizon=8):
         start, end = prev_mon_sun_week()
         week_start = start
 
+    # only the window's events (indexed range query), not the whole history
+    if fav_store.available():
+        events = fav_store.events_frame(start, end)
+    else:
+        events = _load_df(FAV_EVENTS, ["ts_utc","sid","species","state"])
+
     if events.empty:
         return None, pd.Series(dtype=float)
 
@@ -81,14 +88,15 @@ def record_weekly_winner_if_missing():
     if not winner:
         return False
     start, _ = prev_mon_sun_week()
-    try:
-        w = pd.read_csv(WINNERS)
-    except FileNotFoundError:
-        w = pd.DataFrame(columns=["week_start_utc","species"])
-    key = pd.to_datetime(start, utc=True).isoformat()
-    if (w["week_start_utc"] == key).any():
-        return False
-    w = pd.concat([w, pd.DataFrame([{"week_start_utc": key, "species": winner}])], ignore_index=True)
-    w.to_csv(WINNERS, index=False)
+    with locked(WINNERS):
+        try:
+            w = pd.read_csv(WINNERS)
+        except FileNotFoundError:
+            w = pd.DataFrame(columns=["week_start_utc","species"])
+        key = pd.to_datetime(start, utc=True).isoformat()
+        if (w["week_start_utc"] == key).any():
+            return False
+        w = pd.concat([w, pd.DataFrame([{"week_start_utc": key, "species": winner}])], ignore_index=True)
+        w.to_csv(WINNERS, index=False)
     return True
 
@@ -0,0 +1,138 @@
+# src/filter_index.py
+# ------------------------------------------------------------
+# Precomputed filter bitmaps for df_full.
+#
+# Every dropdown / navigation callback used to rebuild a boolean mask
+# (incl. `isin(popular_set)` over ~69k rows), re-parse the favourites
+# JSON and copy the surviving rows with `frame.loc[mask]`.  Here the
+# per-row flags are computed once at boot and each filter combination
+# resolves to a read-only array of row positions, memoised in a bounded
+# LRU keyed by (wiki, popular, favourites, size, depth).
+#
+# Positions index df_full AND df_light (load_name_table() is a column
+# projection of the same frame), so callbacks can `iloc` either one —
+# or, better, read the factorised columns below without touching pandas.
+import json
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def _as_flag(col: pd.Series) -> np.ndarray:
+    return col.astype(object).eq(True).to_numpy(dtype=bool)
+
+
+def _frozen(a: np.ndarray) -> np.ndarray:
+    a.flags.writeable = False
+    return a
+
+
+class FilterIndex:
+    def __init__(self, df: pd.DataFrame, popular_set, species_index, maxsize: int = 64):
+        self.df = df
+        self.n = len(df)
+        self._index = species_index
+
+        # ---- per-row bitmaps ----------------------------------------
+        self.wiki    = _as_flag(df["has_wiki_page"])
+        self.popular = df["Genus_Species"].isin(popular_set).to_numpy()
+
+        length = pd.to_numeric(df["Length_cm"], errors="coerce")
+        self.has_size = (length.notna() & (length > 0)).to_numpy()
+        self.has_depth = (
+            (df["DepthRangeComShallow"].notna() & df["DepthRangeComDeep"].notna())
+            | (df["DepthRangeShallow"].notna() & df["DepthRangeDeep"].notna())
+        ).to_numpy()
+
+        # depth bounds used for navigation: commercial value when present, else raw
+        def _coalesce(com, raw):
+            return pd.to_numeric(df[com].where(df[com].notna(), df[raw]),
+                                 errors="coerce").to_numpy(dtype=float)
+        self.depth_sh = _coalesce("DepthRangeComShallow", "DepthRangeShallow")
+        self.depth_dp = _coalesce("DepthRangeComDeep",    "DepthRangeDeep")
+
+        self.names = df["Genus_Species"].to_numpy(dtype=object)
+        self._codes = {}          # col → (codes int32, sorted uniques)
+        for col in ("order", "family", "genus", "Genus", "Species"):
+            if col in df:
+                self.codes(col)   # build at boot so forked workers share them
+        self.positions_for = lru_cache(maxsize=maxsize)(self._positions_for)
+        self.fav_positions = lru_cache(maxsize=maxsize)(self._fav_positions)
+        self.mask_for = lru_cache(maxsize=maxsize)(self._mask_for)
+
+    # ---- keys --------------------------------------------------------
+    @staticmethod
+    def key(wiki_val, pop_val, fav_val=None, favs_data=None):
+        """Normalise raw toggle/store values → hashable (wiki, pop, favs_json|None)."""
+        wiki_on = bool(wiki_val) and "wiki" in wiki_val
+        pop_on  = bool(pop_val)  and "pop"  in pop_val
+        favs    = (favs_data or "[]") if (fav_val and "fav" in fav_val) else None
+        return wiki_on, pop_on, favs
+
+    # ---- positions ---------------------------------------------------
+    def positions(self, wiki_val, pop_val, fav_val=None, favs_data=None,
+                  size_on=False, depth_on=False) -> np.ndarray:
+        """Sorted, read-only int32 row positions passing every active filter."""
+        return self.positions_for(*self.key(wiki_val, pop_val, fav_val, favs_data),
+                                  bool(size_on), bool(depth_on))
+
+    def _positions_for(self, wiki_on, pop_on, favs, size_on=False, depth_on=False):
+        mask = np.ones(self.n, dtype=bool)
+        if wiki_on:
+            mask &= self.wiki
+        if pop_on:
+            mask &= self.popular
+        if size_on:
+            mask &= self.has_size
+        if depth_on:
+            mask &= self.has_depth
+        if favs is not None:
+            fav_mask = np.zeros(self.n, dtype=bool)
+            fav_mask[self.fav_positions(favs)] = True
+            mask &= fav_mask
+        return _frozen(np.flatnonzero(mask).astype(np.int32))
+
+    def mask(self, wiki_val, pop_val, fav_val=None, favs_data=None):
+        """Read-only bool row mask for the filters, or None when nothing is filtered."""
+        key = self.key(wiki_val, pop_val, fav_val, favs_data)
+        return None if key == (False, False, None) else self.mask_for(*key)
+
+    def _mask_for(self, wiki_on, pop_on, favs):
+        m = np.zeros(self.n, dtype=bool)
+        m[self.positions_for(wiki_on, pop_on, favs)] = True
+        return _frozen(m)
+
+    def _fav_positions(self, favs_json):
+        try:
+            names = json.loads(favs_json or "[]")
+        except (TypeError, ValueError):
+            names = []
+        if not isinstance(names, list):
+            names = []
+        pos = self._index.positions(n for n in names if isinstance(n, str))
+        return _frozen(np.unique(pos).astype(np.int32))
+
+    # ---- factorised columns -----------------------------------------
+    def codes(self, col):
+        """(int32 codes, sorted uniques) for *col*; NaN → -1."""
+        hit = self._codes.get(col)
+        if hit is None:
+            codes, uniques = pd.factorize(self.df[col].astype(object), sort=True)
+            hit = (_frozen(codes.astype(np.int32)), np.asarray(uniques, dtype=object))
+            self._codes[col] = hit
+        return hit
+
+    def distinct(self, col, pos) -> list:
+        """Sorted non-null values of *col* among rows *pos*."""
+        codes, uniques = self.codes(col)
+        u = np.unique(codes[pos])
+        return uniques[u[u >= 0]].tolist()
+
+    def select(self, pos, col, value) -> np.ndarray:
+        """Subset of *pos* whose *col* equals *value* (empty if value unknown)."""
+        codes, uniques = self.codes(col)
+        i = int(np.searchsorted(uniques, value)) if isinstance(value, str) else -1
+        if i < 0 or i >= len(uniques) or uniques[i] != value:
+            return pos[:0]
+        return pos[codes[pos] == i]
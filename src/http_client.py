@@ -0,0 +1,94 @@
+# src/http_client.py
+# ------------------------------------------------------------
+# Shared outbound HTTP for Wikipedia / Commons / R2 lookups.
+#
+#   • one keep-alive requests.Session per process (urllib3 pools,
+#     reused across callbacks instead of a new TCP+TLS handshake per call)
+#   • retry with exponential backoff on connection errors, 429 and 5xx
+#     (Retry-After honoured), idempotent methods only
+#   • a per-host semaphore so a burst of cold species can't hammer one API
+#   • a small thread pool for running independent lookups concurrently
+#
+# Everything is created lazily and re-created after a fork, so importing
+# this module in the gunicorn master (preload_app) is safe.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_POOL_SIZE      = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_HOST_PARALLEL  = int(os.getenv("HTTP_HOST_PARALLEL", "4"))
+HTTP_RETRIES        = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_WORKERS        = int(os.getenv("HTTP_WORKERS", "8"))
+DEFAULT_TIMEOUT     = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+_lock = threading.Lock()
+_state = {"pid": None, "session": None, "executor": None, "hosts": {}}
+
+
+def _fresh_state():
+    """(Re)build session / pool / semaphores when first used in this process."""
+    pid = os.getpid()
+    if _state["pid"] == pid:
+        return _state
+    with _lock:
+        if _state["pid"] != pid:
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                  pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+            s = requests.Session()
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _state.update(
+                session=s,
+                executor=ThreadPoolExecutor(max_workers=HTTP_WORKERS,
+                                            thread_name_prefix="http"),
+                hosts={},
+                pid=pid,
+            )
+    return _state
+
+
+def _host_sem(url: str) -> threading.BoundedSemaphore:
+    hosts = _fresh_state()["hosts"]
+    host = urlsplit(url).netloc
+    sem = hosts.get(host)
+    if sem is None:
+        with _lock:
+            sem = hosts.setdefault(host, threading.BoundedSemaphore(HTTP_HOST_PARALLEL))
+    return sem
+
+
+def session() -> requests.Session:
+    return _fresh_state()["session"]
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Pooled, retried request; at most HTTP_HOST_PARALLEL in flight per host."""
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    with _host_sem(url):
+        return session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def head(url: str, **kwargs) -> requests.Response:
+    return request("HEAD", url, **kwargs)
+
+
+def submit(fn, *args, **kwargs):
+    """Run *fn* on the shared I/O pool → concurrent.futures.Future."""
+    return _fresh_state()["executor"].submit(fn, *args, **kwargs)
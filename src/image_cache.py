@@ -2,10 +2,13 @@ import os, json, hashlib, time
 from PIL import Image
 from io import BytesIO
 
+from src import image_manifest, image_variants, meta_store
+
 CACHE_DIR = "./image_cache"
 MAX_CACHE_SIZE_GB = 2
 
 os.makedirs(CACHE_DIR, exist_ok=True)
+image_manifest.attach(CACHE_DIR)
 
 def url_to_stem(url: str) -> str:
     return hashlib.md5(url.encode()).hexdigest()
@@ -16,32 +19,78 @@ def get_cached_image_path(stem: str) -> str:
 def get_cached_metadata_path(stem: str) -> str:
     return os.path.join(CACHE_DIR, f"{stem}.json")
 
+def _entry_paths(stem: str) -> list:
+    """Metadata JSON, image and srcset variants of one entry (may not all exist)."""
+    return ([get_cached_metadata_path(stem), get_cached_image_path(stem)]
+            + [os.path.join(CACHE_DIR, n) for n in image_variants.all_names(stem)])
+
 def save_image_to_cache(stem: str, img_data: bytes):
     img = Image.open(BytesIO(img_data)).convert("RGBA")
     img.save(get_cached_image_path(stem), "WEBP", quality=85)
+    try:
+        image_variants.write_variants(stem, img, CACHE_DIR)
+    except Exception as e:                   # the full-size image is what matters
+        print(f"⚠️  srcset variants failed for {stem}: {e}")
+
+def _entry_size(stem: str) -> int:
+    size = 0
+    for path in _entry_paths(stem):
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            pass
+    return size
 
-def save_metadata_to_cache(stem: str, metadata: dict):
-    with open(get_cached_metadata_path(stem), "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
+def save_metadata_to_cache(stem: str, metadata: dict, variant: str = ""):
+    """Store the metadata (marks the entry complete) and index it; variant "raw" | "processed"."""
+    if not meta_store.put(meta_store.IMAGE, stem, metadata):
+        with open(get_cached_metadata_path(stem), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+    image_manifest.add(stem, _entry_size(stem), variant)
+
+def is_cached(stem: str) -> bool:
+    return meta_store.has(meta_store.IMAGE, stem) or os.path.exists(get_cached_metadata_path(stem))
 
 def load_cached_image_and_meta(url: str) -> tuple[str | None, dict | None]:
     stem = url_to_stem(url)
     image_path = get_cached_image_path(stem)
     meta_path  = get_cached_metadata_path(stem)
 
-    # ✅ JSON presence alone counts as a cache hit
+    meta = meta_store.get(meta_store.IMAGE, stem)
+    if meta is not None:
+        image_manifest.touch(stem)
+        return image_path, meta
+
+    # ✅ per-file layout: JSON presence alone counts as a cache hit
     if os.path.exists(meta_path):
         with open(meta_path, "r", encoding="utf-8") as f:
-            return image_path, json.load(f)
+            meta = json.load(f)
+        if not image_manifest.has(stem):                 # not indexed yet → adopt it
+            image_manifest.add(stem, _entry_size(stem))
+        image_manifest.touch(stem)
+        return image_path, meta
     return None, None
 
 
 def enforce_cache_limit():
     max_bytes = MAX_CACHE_SIZE_GB * 1024**3
-    total = sum(f.stat().st_size for f in os.scandir(CACHE_DIR) if f.is_file())
-    while total > max_bytes:
-        files = [(f.path, f.stat().st_mtime) for f in os.scandir(CACHE_DIR)]
-        oldest = min(files, key=lambda x: x[1])[0]
-        os.remove(oldest)
-        total = sum(f.stat().st_size for f in os.scandir(CACHE_DIR) if f.is_file())
+    evicted = image_manifest.evict(max_bytes)
+    if evicted is None:                     # no manifest: one scan, oldest first
+        files = [(f.path, f.stat()) for f in os.scandir(CACHE_DIR) if f.is_file()]
+        total = sum(st.st_size for _, st in files)
+        for path, st in sorted(files, key=lambda x: x[1].st_mtime):
+            if total <= max_bytes:
+                break
+            meta_store.delete(meta_store.IMAGE, os.path.splitext(os.path.basename(path))[0])
+            os.remove(path)
+            total -= st.st_size
+        return
+    for stem in evicted:
+        # metadata first: without it the entry no longer counts as cached
+        meta_store.delete(meta_store.IMAGE, stem)
+        for path in _entry_paths(stem):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
 
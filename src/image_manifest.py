@@ -0,0 +1,301 @@
+# src/image_manifest.py
+# ------------------------------------------------------------
+# SQLite index of image_cache/, so size accounting and eviction stop
+# touching the directory.
+#
+#     entries(stem, variant, size, last_access)
+#     totals(bytes)                 sum of entries.size, kept by triggers
+#
+# size is the bytes of one cache entry on disk (.webp and its srcset
+# variants, plus its .json in the per-file layout; metadata itself lives
+# in src/meta_store).  The database is shared by every process that
+# writes the cache (web workers, bg_jobs children, warm_cache), and all
+# state lives in it: the total is one row, and eviction reads the oldest
+# entries off the last_access index inside its own transaction, so it
+# costs O(entries removed · log n) rather than a directory rescan, with no
+# per-process copy to reload when another process writes.  Access times
+# are batched in memory and flushed at most every ACCESS_FLUSH_S seconds.
+#
+# On first use an empty manifest is filled from the existing directory
+# (complete entries only: a .json, or a row in the meta store).  Anything
+# missing here is adopted on its first lookup.  Only used where the cache
+# is written (CACHE_WRITE=1).
+#
+#   IMAGE_MANIFEST=0        disable (directory scans, as before)
+#   IMAGE_MANIFEST_PATH     database file (default cache/image_manifest.sqlite3)
+#
+# Run:  python -m src.image_manifest --stats
+#       python -m src.image_manifest --rebuild     # re-import image_cache/
+import os
+import sqlite3
+import threading
+import time
+
+from src import meta_store
+
+ENABLED = os.getenv("IMAGE_MANIFEST", "1") == "1" and os.getenv("CACHE_WRITE", "1") == "1"
+DB_PATH = os.getenv("IMAGE_MANIFEST_PATH", "cache/image_manifest.sqlite3")
+ACCESS_FLUSH_S = int(os.getenv("IMAGE_MANIFEST_FLUSH_S", "60"))
+EVICT_BATCH = 256
+
+_SCHEMA_VERSION = 3          # v1 also held the metadata JSON, v2 had no totals
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        stem        TEXT PRIMARY KEY,
+        variant     TEXT NOT NULL DEFAULT '',
+        size        INTEGER NOT NULL,
+        last_access REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS entries_access ON entries (last_access)",
+    "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO totals (id, bytes) VALUES (0, 0)",
+    # writes go through upserts (not INSERT OR REPLACE, whose implicit
+    # delete would skip the delete trigger), so these see every change
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_ins AFTER INSERT ON entries
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size WHERE id = 0; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_del AFTER DELETE ON entries
+    BEGIN UPDATE totals SET bytes = bytes - OLD.size WHERE id = 0; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_upd AFTER UPDATE OF size ON entries
+    BEGIN UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 0; END
+    """,
+)
+_UPSERT = (
+    "INSERT INTO entries (stem, variant, size, last_access) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (stem) DO UPDATE SET variant = excluded.variant, size = excluded.size, "
+    "last_access = excluded.last_access"
+)
+
+_lock = threading.RLock()
+_st = {
+    "pid": None, "conn": None, "broken": False, "cache_dir": None,
+    "touched": {},             # stem → last access, not yet written
+    "flushed": 0.0,
+}
+
+
+def attach(cache_dir: str):
+    """Directory imported into an empty manifest on first use."""
+    _st["cache_dir"] = cache_dir
+
+
+def _conn():
+    """Process-wide connection (caller holds _lock); None when disabled or unavailable."""
+    if not ENABLED or _st["broken"]:
+        return None
+    if _st["pid"] != os.getpid():
+        try:
+            os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+            c = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None,
+                                check_same_thread=False)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            if c.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                c.execute("DROP TABLE IF EXISTS entries")     # derived data: re-imported below
+                c.execute("DROP TABLE IF EXISTS totals")
+                c.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+            for stmt in _SCHEMA:
+                c.execute(stmt)
+        except sqlite3.Error as e:
+            print(f"⚠️  image manifest disabled ({DB_PATH}): {e}")
+            _st["broken"] = True
+            return None
+        _st.update(pid=os.getpid(), conn=c, touched={}, flushed=time.time())
+        if _st["cache_dir"] and c.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is None:
+            _import(c, _st["cache_dir"], rebuild=False)
+    return _st["conn"]
+
+
+def available() -> bool:
+    with _lock:
+        return _conn() is not None
+
+
+# ---- access times -----------------------------------------------------------
+def _flush(c):
+    if _st["touched"]:
+        try:
+            c.execute("BEGIN")
+            c.executemany("UPDATE entries SET last_access = ? WHERE stem = ?",
+                          [(t, s) for s, t in _st["touched"].items()])
+            c.execute("COMMIT")
+        except sqlite3.Error as e:
+            if c.in_transaction:
+                c.execute("ROLLBACK")
+            print(f"⚠️  image manifest: access flush failed: {e}")
+        _st["touched"].clear()
+    _st["flushed"] = time.time()
+
+
+def _total(c) -> int:
+    return c.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+
+def _touch(c, stem):
+    now = time.time()
+    _st["touched"][stem] = now
+    if now - _st["flushed"] > ACCESS_FLUSH_S:
+        _flush(c)
+
+
+# ---- public -----------------------------------------------------------------
+def touch(stem: str):
+    """Mark a cache hit (LRU order; written to the database in batches)."""
+    with _lock:
+        c = _conn()
+        if c is not None:
+            _touch(c, stem)
+
+
+def has(stem: str) -> bool:
+    with _lock:
+        c = _conn()
+        if c is None:
+            return False
+        try:
+            return c.execute("SELECT 1 FROM entries WHERE stem = ?", (stem,)).fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+
+def add(stem: str, size: int, variant: str = ""):
+    """Record a complete entry (after its metadata is written)."""
+    with _lock:
+        c = _conn()
+        if c is None:
+            return
+        try:
+            c.execute(_UPSERT, (stem, variant, size, time.time()))
+        except sqlite3.Error as e:
+            print(f"⚠️  image manifest: add failed for {stem}: {e}")
+            return
+        _st["touched"].pop(stem, None)
+
+
+def evict(max_bytes: int):
+    """Drop least recently used entries until ≤ max_bytes.
+
+    Returns the evicted stems (their files are the caller's to delete),
+    or None when the manifest is unavailable.
+    """
+    with _lock:
+        c = _conn()
+        if c is None:
+            return None
+        removed = []
+        try:
+            _flush(c)
+            if _total(c) <= max_bytes:          # common case: one row read, no write lock
+                return removed
+            c.execute("BEGIN IMMEDIATE")
+            total = _total(c)                   # other processes may have evicted meanwhile
+            while total > max_bytes:
+                batch = []
+                for stem, size in c.execute("SELECT stem, size FROM entries "
+                                            "ORDER BY last_access LIMIT ?", (EVICT_BATCH,)
+                                            ).fetchall():
+                    if total <= max_bytes:
+                        break
+                    batch.append((stem,))
+                    total -= size
+                if not batch:
+                    break
+                c.executemany("DELETE FROM entries WHERE stem = ?", batch)
+                removed.extend(s for (s,) in batch)
+            c.execute("COMMIT")
+        except sqlite3.Error as e:
+            if c.in_transaction:
+                c.execute("ROLLBACK")
+            print(f"⚠️  image manifest: eviction failed: {e}")
+            return []
+    return removed
+
+
+def total_bytes() -> int:
+    with _lock:
+        c = _conn()
+        if c is None:
+            return 0
+        return _total(c)
+
+
+def stats() -> dict:
+    """{variant: {"entries": n, "bytes": b}}."""
+    with _lock:
+        c = _conn()
+        if c is None:
+            return {}
+        rows = c.execute("SELECT variant, COUNT(*), SUM(size) FROM entries GROUP BY variant").fetchall()
+    return {(v or "unknown"): {"entries": n, "bytes": b} for v, n, b in rows}
+
+
+# ---- import -----------------------------------------------------------------
+def _import(c, cache_dir: str, rebuild: bool) -> int:
+    """One scandir over cache_dir → manifest rows for every complete entry."""
+    files = {}                                  # stem → [bytes, newest mtime, has json]
+    try:
+        entries = list(os.scandir(cache_dir))
+    except OSError:
+        return 0
+    for e in entries:
+        stem, _, ext = e.name.partition(".")           # srcset variants: <stem>.w320.webp
+        if not ext.endswith(("json", "webp", "avif")) or not e.is_file():
+            continue
+        st = e.stat()
+        f = files.setdefault(stem, [0, 0.0, False])
+        f[0] += st.st_size
+        f[1] = max(f[1], st.st_mtime)
+        f[2] = f[2] or ext == "json"
+
+    stored = set(meta_store.keys(meta_store.IMAGE))
+    rows = [(stem, "", size, mtime)
+            for stem, (size, mtime, has_json) in files.items()
+            if has_json or stem in stored]
+
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        if rebuild:
+            c.execute("DELETE FROM entries")
+        elif c.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is not None:
+            c.execute("ROLLBACK")                 # another process imported meanwhile
+            return 0
+        c.executemany(_UPSERT, rows)
+        c.execute("COMMIT")
+    except sqlite3.Error as e:
+        if c.in_transaction:
+            c.execute("ROLLBACK")
+        print(f"⚠️  image manifest: import of {cache_dir} failed: {e}")
+        return 0
+    print(f"🗂️  image manifest: indexed {len(rows):,} entries from {cache_dir}")
+    return len(rows)
+
+
+def rebuild(cache_dir: str) -> int:
+    """Re-index cache_dir from scratch (variants become unknown)."""
+    with _lock:
+        c = _conn()
+        return 0 if c is None else _import(c, cache_dir, rebuild=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.image_cache import CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the image_cache manifest")
+    parser.add_argument("--rebuild", action="store_true",
+                        help=f"Re-import {CACHE_DIR} into {DB_PATH}")
+    parser.add_argument("--stats", action="store_true", help="Entries and bytes per variant")
+    args = parser.parse_args()
+
+    attach(CACHE_DIR)
+    if args.rebuild:
+        rebuild(CACHE_DIR)
+    if args.stats or not args.rebuild:
+        for variant, s in stats().items():
+            print(f"   {variant:<10} {s['entries']:>7,} entries  {s['bytes'] / 1024**2:8.1f} MB")
@@ -0,0 +1,368 @@
+# src/image_pack.py
+# ------------------------------------------------------------
+# Append-only pack files for image_cache/ WebPs, served straight out of
+# the pack.
+#
+#     cache/image_packs/images-0001.pack   blobs, back to back (≤ PACK_MAX_MB)
+#     cache/image_packs/index.json         {"blobs": {hash: [pack, offset, length]},
+#                                           "names": {stem: hash},
+#                                           "src":   {stem: [size, mtime_ns]}}
+#
+# Blobs are keyed by content hash (blake2b-128), so identical files (e.g.
+# raw == processed for the transparency blacklist) are stored once.  The
+# hash doubles as the ETag.  Packs are only ever appended to; the index is
+# rewritten atomically afterwards, so a reader never sees an offset past
+# what was fsynced.  Dead blobs (names dropped) are reclaimed by compact.
+#
+# Serving: the index is loaded into a dict per process (reloaded when its
+# mtime changes) and each pack is memory-mapped.  Under gunicorn the blob
+# goes out through wsgi.file_wrapper → sendfile() from the pack's offset,
+# bounded by Content-Length (zero-copy); elsewhere as a memoryview of the
+# mapping.  Single byte ranges are honoured; multi-range requests get the
+# whole blob (200).
+#
+# Packs mirror the loose files, they never replace them: the loose file
+# stays the source of truth for is_cached / the raw-first path, eviction
+# and r2_sync.  A packed blob is only served while its loose file still
+# exists with the size and mtime it was packed from, so an evicted or
+# re-fetched entry is never answered from a stale blob (the next build
+# re-packs it).
+#
+#   IMAGE_PACK_DIR     pack directory (default cache/image_packs)
+#   PACK_MAX_MB        roll over to a new pack file past this size (256)
+#
+# Run:  python -m src.image_pack build            # pack new loose .webp files
+#       python -m src.image_pack compact          # rewrite packs without dead blobs
+#       python -m src.image_pack verify           # re-hash every blob
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import threading
+
+PACK_DIR = os.getenv("IMAGE_PACK_DIR", "cache/image_packs")
+PACK_MAX = int(os.getenv("PACK_MAX_MB", "256")) * 1024**2
+INDEX_PATH = os.path.join(PACK_DIR, "index.json")
+
+_lock = threading.Lock()
+_st = {"mtime": None, "blobs": {}, "names": {}, "src": {}, "maps": {}}
+
+
+def content_hash(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _pack_path(name: str) -> str:
+    return os.path.join(PACK_DIR, name)
+
+
+# ---- index ------------------------------------------------------------------
+def _read_index(path=INDEX_PATH) -> dict:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            idx = json.load(fh)
+    except FileNotFoundError:
+        return {"packs": [], "blobs": {}, "names": {}, "src": {}}
+    idx.setdefault("packs", sorted({b[0] for b in idx.get("blobs", {}).values()}))
+    idx.setdefault("src", {})
+    return idx
+
+
+def _write_index(idx: dict):
+    tmp = INDEX_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(idx, fh, separators=(",", ":"))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, INDEX_PATH)
+
+
+def _current():
+    """Index for this process, reloaded when index.json changes on disk."""
+    try:
+        mtime = os.stat(INDEX_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime != _st["mtime"]:
+        with _lock:
+            if mtime != _st["mtime"]:
+                idx = _read_index() if mtime else {"blobs": {}, "names": {}, "src": {}}
+                # old mappings are dropped, not closed: a response may still hold a view
+                _st.update(mtime=mtime, blobs=idx["blobs"], names=idx["names"],
+                           src=idx["src"], maps={})
+    return _st
+
+
+def _map(pack: str):
+    m = _st["maps"].get(pack)
+    if m is None:
+        with _lock:
+            m = _st["maps"].get(pack)
+            if m is None:
+                with open(_pack_path(pack), "rb") as fh:
+                    m = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                _st["maps"][pack] = m
+    return m
+
+
+# ---- read / serve -----------------------------------------------------------
+def _signature(path: str):
+    """[size, mtime_ns] of a loose file, or None when it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def locate(stem: str, loose_path: str | None = None):
+    """(pack, offset, length, hash) of a packed image, or None.
+
+    With *loose_path*, only while that file is still the one that was packed.
+    """
+    st = _current()
+    h = st["names"].get(stem)
+    if h is None:
+        return None
+    if loose_path is not None and _signature(loose_path) != st["src"].get(stem):
+        return None
+    pack, offset, length = st["blobs"][h]
+    return pack, offset, length, h
+
+
+def read(stem: str, loose_path: str | None = None):
+    """Bytes of a packed image, or None."""
+    loc = locate(stem, loose_path)
+    if loc is None:
+        return None
+    pack, offset, length, _ = loc
+    return _map(pack)[offset:offset + length]
+
+
+def serve(stem: str, loose_path: str, max_age: int = 86400):
+    """Flask response for a packed image (ETag / Range aware), or None → serve loose_path."""
+    from flask import current_app, request
+
+    loc = locate(stem, loose_path)
+    if loc is None:
+        return None
+    pack, offset, length, h = loc
+    resp = current_app.response_class(mimetype="image/webp")
+    resp.headers["Cache-Control"] = f"public, max-age={max_age}"
+    resp.headers["Accept-Ranges"] = "bytes"
+    resp.set_etag(h)
+    if h in {t.split(":", 1)[0] for t in request.if_none_match.as_set()}:
+        resp.status_code = 304
+        return resp
+
+    start, stop = 0, length
+    rng = request.range
+    if rng is not None and (rng.units != "bytes" or len(rng.ranges) != 1):
+        rng = None                            # multi-range / other units: whole blob, 200
+    span = rng.range_for_length(length) if rng is not None else None
+    if rng is not None and span is None:
+        resp.status_code = 416
+        resp.headers["Content-Range"] = f"bytes */{length}"
+        return resp
+    if span is not None:
+        start, stop = span
+        resp.status_code = 206
+        resp.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{length}"
+
+    wrapper = request.environ.get("wsgi.file_wrapper")
+    if wrapper is not None and "gunicorn" in request.environ.get("SERVER_SOFTWARE", ""):
+        # gunicorn sendfile()s from the file position for Content-Length bytes
+        fh = open(_pack_path(pack), "rb")
+        fh.seek(offset + start)
+        resp.response = wrapper(fh)
+    else:
+        resp.response = [memoryview(_map(pack))[offset + start:offset + stop]]
+    resp.direct_passthrough = True
+    resp.content_length = stop - start
+    return resp
+
+
+# ---- build / compact / verify -----------------------------------------------
+def _pack_no(name: str) -> int:
+    return int(name[len("images-"):-len(".pack")])
+
+
+class _Writer:
+    """Appends blobs to the newest pack, rolling over at PACK_MAX.
+
+    With *first* set (compact), every pack is a fresh file numbered from it.
+    """
+
+    def __init__(self, idx: dict, first: int | None = None):
+        self.idx = idx
+        self.first = first
+        self.fh = None
+        self.pack = None
+
+    def _open(self, need: int):
+        packs = self.idx["packs"]
+        resume = self.first is None and self.pack is None and packs
+        self.close()
+        if resume and os.path.getsize(_pack_path(packs[-1])) + need <= PACK_MAX:
+            self.pack = packs[-1]
+        else:
+            n = (self.first + len(packs) if self.first is not None
+                 else max([_pack_no(p) for p in packs] or [0]) + 1)
+            self.pack = f"images-{n:04d}.pack"
+            packs.append(self.pack)
+        self.fh = open(_pack_path(self.pack), "ab")
+
+    def add(self, data: bytes) -> str:
+        h = content_hash(data)
+        if h in self.idx["blobs"]:
+            return h
+        if self.fh is None or self.fh.tell() + len(data) > PACK_MAX:
+            self._open(len(data))
+        offset = self.fh.tell()
+        self.fh.write(data)
+        self.idx["blobs"][h] = [self.pack, offset, len(data)]
+        return h
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.flush()
+            os.fsync(self.fh.fileno())        # pack bytes durable before the index points at them
+            self.fh.close()
+            self.fh = None
+
+
+def _locked(fn):
+    """Run a build step under an exclusive lock on the pack directory."""
+    def wrapper(*args, **kwargs):
+        os.makedirs(PACK_DIR, exist_ok=True)
+        with open(os.path.join(PACK_DIR, ".lock"), "w") as lk:
+            fcntl.flock(lk, fcntl.LOCK_EX)
+            return fn(*args, **kwargs)
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+@_locked
+def build(cache_dir: str) -> int:
+    """Pack every loose <stem>.webp that is new or changed, drop names whose file
+    is gone (evicted); number of names (re)packed."""
+    idx = _read_index()
+    writer = _Writer(idx)
+    seen, new = set(), 0
+    for e in sorted(os.scandir(cache_dir), key=lambda e: e.name):
+        stem, ext = os.path.splitext(e.name)
+        if ext != ".webp" or not e.is_file():
+            continue
+        seen.add(stem)
+        sig = _signature(e.path)
+        if stem in idx["names"] and idx["src"].get(stem) == sig:
+            continue                          # unchanged since it was packed
+        with open(e.path, "rb") as fh:
+            data = fh.read()
+        idx["names"][stem] = writer.add(data)
+        idx["src"][stem] = sig
+        new += 1
+    writer.close()
+    gone = [stem for stem in idx["names"] if stem not in seen]
+    for stem in gone:
+        del idx["names"][stem]
+        idx["src"].pop(stem, None)
+    _write_index(idx)
+
+    size = sum(os.path.getsize(_pack_path(p)) for p in idx["packs"])
+    print(f"📦 {new:,} images packed, {len(gone):,} dropped ({len(idx['names']):,} names, "
+          f"{len(idx['blobs']):,} blobs, {len(idx['packs'])} pack(s), {size / 1024**2:.1f} MB)")
+    return new
+
+
+@_locked
+def compact() -> int:
+    """Rewrite the packs with only the blobs some name still points at; bytes reclaimed."""
+    old = _read_index()
+    live = sorted(set(old["names"].values()), key=lambda h: tuple(old["blobs"][h][:2]))
+    before = sum(os.path.getsize(_pack_path(p)) for p in old["packs"])
+
+    first = max([_pack_no(p) for p in old["packs"]] or [0]) + 1
+    new = {"packs": [], "blobs": {}, "names": dict(old["names"]), "src": dict(old["src"])}
+    writer = _Writer(new, first=first)
+    maps = {}
+    for h in live:
+        pack, offset, length = old["blobs"][h]
+        if pack not in maps:
+            with open(_pack_path(pack), "rb") as fh:
+                maps[pack] = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        writer.add(maps[pack][offset:offset + length])
+    writer.close()
+    _write_index(new)
+    for m in maps.values():
+        m.close()
+    for p in old["packs"]:
+        os.remove(_pack_path(p))
+
+    after = sum(os.path.getsize(_pack_path(p)) for p in new["packs"])
+    print(f"🧹 compacted {len(old['packs'])} → {len(new['packs'])} pack(s), "
+          f"{len(old['blobs']) - len(new['blobs']):,} dead blobs, "
+          f"{(before - after) / 1024**2:.1f} MB reclaimed")
+    return before - after
+
+
+def verify() -> bool:
+    """Re-hash every blob and check the index against the pack files."""
+    idx = _read_index()
+    problems = []
+    sizes = {}
+    for p in idx["packs"]:
+        try:
+            sizes[p] = os.path.getsize(_pack_path(p))
+        except OSError:
+            problems.append(f"missing pack {p}")
+    maps = {}
+    end = dict.fromkeys(sizes, 0)
+    for h, (pack, offset, length) in idx["blobs"].items():
+        if pack not in sizes:
+            problems.append(f"blob {h} in unknown pack {pack}")
+            continue
+        if offset + length > sizes[pack]:
+            problems.append(f"blob {h} runs past the end of {pack}")
+            continue
+        if pack not in maps:
+            with open(_pack_path(pack), "rb") as fh:
+                maps[pack] = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if content_hash(maps[pack][offset:offset + length]) != h:
+            problems.append(f"blob {h} in {pack}@{offset} does not match its hash")
+        end[pack] = max(end[pack], offset + length)
+    for m in maps.values():
+        m.close()
+    for stem, h in idx["names"].items():
+        if h not in idx["blobs"]:
+            problems.append(f"{stem} points at missing blob {h}")
+    dead = len(set(idx["blobs"]) - set(idx["names"].values()))
+    tail = sum(sizes[p] - end[p] for p in sizes)
+
+    for msg in problems[:50]:
+        print(f"❌ {msg}")
+    if len(problems) > 50:
+        print(f"❌ … {len(problems) - 50:,} more")
+    print(f"{'✅' if not problems else '⚠️ '} {len(idx['names']):,} names, {len(idx['blobs']):,} blobs "
+          f"in {len(idx['packs'])} pack(s); {dead:,} dead blobs, {tail:,} unindexed tail bytes "
+          f"({len(problems):,} problems)")
+    return not problems
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Pack image_cache/ WebPs into a few large files")
+    parser.add_argument("action", choices=["build", "compact", "verify"])
+    parser.add_argument("--cache-dir", default="image_cache",
+                        help="Loose image folder to pack (build)")
+    args = parser.parse_args()
+
+    if args.action == "build":
+        build(args.cache_dir)
+    elif args.action == "compact":
+        compact()
+    else:
+        sys.exit(0 if verify() else 1)
@@ -0,0 +1,130 @@
+# src/image_variants.py
+# ------------------------------------------------------------
+# Smaller copies of every cached image, for <img srcset>.
+#
+# Images are cached at one width (get_commons_thumb(width=640)).  When an
+# entry is written, save_image_to_cache also writes downscaled copies next
+# to it, and optionally AVIF twins:
+#
+#     <stem>.webp          cached width (640)
+#     <stem>.w320.webp     IMAGE_VARIANT_WIDTHS (default 160,320), never upscaled
+#     <stem>.avif / <stem>.w320.avif      IMAGE_AVIF=1 (Pillow with AVIF support)
+#
+# species-img / sow-thumb get a srcset of /cached-images/…&vw=<w> URLs.
+# The route serves the variant when it exists, otherwise the full image,
+# so entries cached before this change (or not yet backfilled) still
+# render.  AVIF goes to browsers that send Accept: image/avif.
+#
+# Run:  python -m src.image_variants               # backfill image_cache/
+#       python -m src.image_variants --avif        # …including AVIF twins
+import os
+import re
+
+WIDTHS = tuple(sorted(int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "160,320").split(",")
+                      if w.strip()))
+AVIF = os.getenv("IMAGE_AVIF", "0") == "1"
+BASE_WIDTH = 640                        # width the app caches (get_commons_thumb default)
+
+# CSS widths of the two <img>s (assets/css/custom.css: #image-wrapper, #sow-thumb)
+SPECIES_SIZES = "(max-width: 768px) min(82vw, 480px), min(52vw, 520px)"
+SOW_SIZES = "64px"
+
+_NAME = re.compile(r"([0-9a-f]{32})(?:\.w(\d+))?\.(webp|avif)")
+_state = {"avif": None}
+
+
+def avif_supported() -> bool:
+    if _state["avif"] is None:
+        from PIL import features
+        _state["avif"] = bool(features.check("avif"))
+    return _state["avif"]
+
+
+def variant_name(stem: str, width: int | None = None, ext: str = "webp") -> str:
+    return f"{stem}.w{width}.{ext}" if width else f"{stem}.{ext}"
+
+
+def parse_name(fname: str):
+    """"<stem>[.w<width>].<ext>" → (stem, width | None, ext), or None."""
+    m = _NAME.fullmatch(fname)
+    return (m.group(1), int(m.group(2)) if m.group(2) else None, m.group(3)) if m else None
+
+
+def all_names(stem: str) -> list:
+    """Every derived file a cache entry may have (for size accounting / eviction)."""
+    names = [variant_name(stem, w) for w in WIDTHS]
+    names += [variant_name(stem, w, "avif") for w in (None,) + WIDTHS]
+    return names
+
+
+def write_variants(stem: str, img, cache_dir: str, avif: bool = AVIF) -> list:
+    """Downscaled WebP (and AVIF) copies of an RGBA PIL image; names written."""
+    from PIL import Image
+
+    written = []
+    avif = avif and avif_supported()
+    if avif:
+        img.save(os.path.join(cache_dir, variant_name(stem, ext="avif")), "AVIF", quality=60)
+        written.append(variant_name(stem, ext="avif"))
+    for w in WIDTHS:
+        if w >= img.width:
+            continue
+        small = img.resize((w, max(1, round(img.height * w / img.width))), Image.LANCZOS)
+        small.save(os.path.join(cache_dir, variant_name(stem, w)), "WEBP", quality=80)
+        written.append(variant_name(stem, w))
+        if avif:
+            small.save(os.path.join(cache_dir, variant_name(stem, w, "avif")), "AVIF", quality=60)
+            written.append(variant_name(stem, w, "avif"))
+    return written
+
+
+def srcset(src: str, full_src: str | None = None, base_width: int = BASE_WIDTH) -> str | None:
+    """srcset for a /cached-images URL (query string included), or None for anything else.
+
+    *full_src* is the candidate for the full width (e.g. the direct R2 URL),
+    default *src*; the narrower ones always go through the route, which
+    falls back to the full image when a variant is missing.
+    """
+    if not src or not src.startswith("/cached-images/"):
+        return None
+    sep = "&" if "?" in src else "?"
+    parts = [f"{src}{sep}vw={w} {w}w" for w in WIDTHS if w < base_width]
+    parts.append(f"{full_src or src} {base_width}w")
+    return ", ".join(parts)
+
+
+def backfill(cache_dir: str, avif: bool = AVIF) -> int:
+    """Write missing variants for every cached <stem>.webp; entries touched."""
+    from PIL import Image
+
+    done = 0
+    for e in os.scandir(cache_dir):
+        parsed = parse_name(e.name)
+        if not parsed or parsed[1] or parsed[2] != "webp":
+            continue
+        stem = parsed[0]
+        want = [variant_name(stem, w) for w in WIDTHS]
+        if avif:
+            want.append(variant_name(stem, ext="avif"))
+        if all(os.path.exists(os.path.join(cache_dir, n)) for n in want):
+            continue
+        with Image.open(e.path) as im:
+            write_variants(stem, im.convert("RGBA"), cache_dir, avif=avif)
+        done += 1
+    return done
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.image_cache import CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="Write srcset variants for cached images")
+    parser.add_argument("--avif", action="store_true", default=AVIF,
+                        help="Also write AVIF twins (needs Pillow AVIF support)")
+    args = parser.parse_args()
+
+    if args.avif and not avif_supported():
+        parser.error("this Pillow build cannot write AVIF")
+    n = backfill(CACHE_DIR, avif=args.avif)
+    print(f"🖼️  variants written for {n:,} cached images (widths {', '.join(map(str, WIDTHS))}"
+          f"{', AVIF' if args.avif else ''})")
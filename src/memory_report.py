@@ -0,0 +1,80 @@
+# src/memory_report.py
+# ------------------------------------------------------------
+# Tiny /proc reader used by gunicorn.conf.py to show how much of each
+# worker's memory is really shared with the preloaded master.
+#
+#   Rss      – what `top` shows; counts shared pages in every process
+#   Pss      – shared pages split evenly between the processes using them
+#   Private  – pages only this process owns (what one more worker costs)
+#
+# Linux only; every helper returns {} / None elsewhere.
+import os
+
+_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty",
+           "Private_Clean", "Private_Dirty", "Swap")
+
+
+def read_smaps(pid="self") -> dict:
+    """Return {field: kB} from /proc/<pid>/smaps_rollup ({} if unavailable)."""
+    out = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                if key in _FIELDS:
+                    out[key] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        return {}
+    if out:
+        out["Shared"]  = out.get("Shared_Clean", 0) + out.get("Shared_Dirty", 0)
+        out["Private"] = out.get("Private_Clean", 0) + out.get("Private_Dirty", 0)
+    return out
+
+
+def _mb(kb: int) -> str:
+    return f"{kb / 1024:7.1f} MB"
+
+
+def format_line(label: str, pid="self") -> str:
+    m = read_smaps(pid)
+    if not m:
+        return f"🧠 {label}: memory report unavailable (no /proc/{pid}/smaps_rollup)"
+    return (f"🧠 {label}: rss {_mb(m['Rss'])} | pss {_mb(m['Pss'])} | "
+            f"shared {_mb(m['Shared'])} | private {_mb(m['Private'])}")
+
+
+def child_pids(ppid: int) -> list:
+    """PIDs whose parent is *ppid* (gunicorn workers of a master)."""
+    try:
+        with open(f"/proc/{ppid}/task/{ppid}/children") as fh:
+            return [int(p) for p in fh.read().split()]
+    except OSError:
+        pass
+    kids = []
+    for name in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as fh:
+                # field 4 is ppid; comm (field 2) may contain spaces → split after ')'
+                if int(fh.read().rsplit(")", 1)[1].split()[1]) == ppid:
+                    kids.append(int(name))
+        except (OSError, ValueError, IndexError):
+            continue
+    return kids
+
+
+def cluster_summary(master_pid: int) -> str | None:
+    """
+    Compare the naive cost (every process holding its own copy = Σ rss)
+    with what the kernel actually charges (Σ pss) for master + workers.
+    """
+    pids = [master_pid] + child_pids(master_pid)
+    stats = [m for m in (read_smaps(p) for p in pids) if m]
+    if len(stats) < 2:
+        return None
+    rss = sum(m["Rss"] for m in stats)
+    pss = sum(m["Pss"] for m in stats)
+    saved = 100 * (1 - pss / rss) if rss else 0.0
+    return (f"🧠 cluster ({len(stats) - 1} workers + master): "
+            f"Σrss {_mb(rss)} vs Σpss {_mb(pss)} → {saved:.0f}% shared")
@@ -0,0 +1,296 @@
+# src/meta_store.py
+# ------------------------------------------------------------
+# One embedded key-value file for cache metadata, in place of a JSON file
+# per cached image (image_cache/<stem>.json) and per blurb (text_cache/).
+#
+#     kv(ns, key, codec, value)     ns = "image" | "blurb"
+#
+# Keys are the stems the file layout already uses (the md5 file names),
+# so both layouts address the same entries and import/export is a copy.
+# A read is one primary-key lookup; a deploy ships cache/meta_store.sqlite3
+# instead of thousands of small files.
+#
+# Values are JSON, optionally zstd-compressed (META_STORE_ZSTD=1, needs the
+# `zstandard` package); the codec is stored per row, so both can coexist.
+# With CACHE_WRITE=0 the file is opened read-only (immutable, no locks or
+# WAL files), so it can live on a read-only image.  Immutable ignores the
+# -wal file, so rows written since the last checkpoint would be invisible:
+# `checkpoint` folds the WAL into the main file (the Docker build runs it),
+# and a non-empty -wal found at boot is opened plain `mode=ro` instead.
+#
+#   META_STORE=0        disable (per-file JSON, as before)
+#   META_STORE_PATH     database file (default cache/meta_store.sqlite3)
+#
+# Run:  python -m src.meta_store import            # image_cache/ + text_cache/ → store
+#       python -m src.meta_store import --prune    # …and delete the imported JSON files
+#       python -m src.meta_store export            # store → JSON files
+#       python -m src.meta_store checkpoint        # fold the WAL in before shipping
+#       python -m src.meta_store stats
+import json
+import os
+import sqlite3
+import threading
+
+ENABLED = os.getenv("META_STORE", "1") == "1"
+DB_PATH = os.getenv("META_STORE_PATH", "cache/meta_store.sqlite3")
+READ_ONLY = os.getenv("CACHE_WRITE", "1") != "1"
+ZSTD = os.getenv("META_STORE_ZSTD", "0") == "1"
+
+IMAGE = "image"
+BLURB = "blurb"
+
+_JSON, _ZSTD = 0, 1                      # codec column
+
+_local = threading.local()
+_state = {"broken": False, "zstd": None}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    ns    TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    codec INTEGER NOT NULL DEFAULT 0,
+    value BLOB NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID
+"""
+
+
+def _zstd():
+    """(compressor, decompressor) from `zstandard`, imported on first use; None if missing."""
+    if _state["zstd"] is None:
+        try:
+            import zstandard
+            _state["zstd"] = (zstandard.ZstdCompressor(level=10), zstandard.ZstdDecompressor())
+        except ImportError:
+            print("⚠️  `zstandard` is not installed; meta store values stay plain JSON")
+            _state["zstd"] = False
+    return _state["zstd"]
+
+
+def _conn():
+    """Per-thread (and per-process) connection; None when disabled or unavailable."""
+    if not ENABLED or _state["broken"]:
+        return None
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        try:
+            if READ_ONLY:
+                if not os.path.exists(DB_PATH):
+                    return None
+                mode = "ro" if _wal_pending() else "ro&immutable=1"
+                c = sqlite3.connect(f"file:{os.path.abspath(DB_PATH)}?mode={mode}", uri=True)
+            else:
+                os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+                c = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+                c.execute("PRAGMA journal_mode=WAL")
+                c.execute("PRAGMA synchronous=NORMAL")
+                c.execute(_SCHEMA)
+        except sqlite3.Error as e:
+            print(f"⚠️  meta store disabled ({DB_PATH}): {e}")
+            _state["broken"] = True
+            return None
+        _local.conn, _local.pid = c, pid
+    return _local.conn
+
+
+def _wal_pending() -> bool:
+    """True when a non-empty -wal sits next to the store (uncheckpointed writes)."""
+    try:
+        return os.path.getsize(DB_PATH + "-wal") > 0
+    except OSError:
+        return False
+
+
+def available() -> bool:
+    return _conn() is not None
+
+
+def writable() -> bool:
+    return not READ_ONLY and _conn() is not None
+
+
+def _encode(value: dict):
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if ZSTD and _zstd():
+        return _ZSTD, _zstd()[0].compress(raw)
+    return _JSON, raw
+
+
+def _decode(codec: int, blob: bytes) -> dict:
+    if codec == _ZSTD:
+        if not _zstd():
+            raise RuntimeError(f"{DB_PATH} holds zstd values; pip install zstandard")
+        blob = _zstd()[1].decompress(blob)
+    return json.loads(blob)
+
+
+# ---- public -----------------------------------------------------------------
+def get(ns: str, key: str):
+    """Stored dict, or None (missing, or store unavailable)."""
+    c = _conn()
+    if c is None:
+        return None
+    try:
+        row = c.execute("SELECT codec, value FROM kv WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+    except sqlite3.Error:
+        return None
+    return _decode(*row) if row else None
+
+
+def has(ns: str, key: str) -> bool:
+    c = _conn()
+    if c is None:
+        return False
+    try:
+        return c.execute("SELECT 1 FROM kv WHERE ns = ? AND key = ?", (ns, key)).fetchone() is not None
+    except sqlite3.Error:
+        return False
+
+
+def put(ns: str, key: str, value: dict) -> bool:
+    """Store *value*; False if the store is read-only or unavailable."""
+    return put_many(ns, [(key, value)]) > 0
+
+
+def put_many(ns: str, items) -> int:
+    """Store (key, dict) pairs in one transaction; number written."""
+    c = None if READ_ONLY else _conn()
+    if c is None:
+        return 0
+    rows = [(ns, key) + _encode(value) for key, value in items]
+    try:
+        c.execute("BEGIN")
+        c.executemany("INSERT OR REPLACE INTO kv (ns, key, codec, value) VALUES (?, ?, ?, ?)", rows)
+        c.execute("COMMIT")
+    except sqlite3.Error as e:
+        if c.in_transaction:
+            c.execute("ROLLBACK")
+        print(f"⚠️  meta store write failed ({ns}, {len(rows)} rows): {e}")
+        return 0
+    return len(rows)
+
+
+def delete(ns: str, key: str):
+    c = None if READ_ONLY else _conn()
+    if c is None:
+        return
+    try:
+        c.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (ns, key))
+    except sqlite3.Error:
+        pass
+
+
+def keys(ns: str) -> list:
+    c = _conn()
+    if c is None:
+        return []
+    return [k for (k,) in c.execute("SELECT key FROM kv WHERE ns = ?", (ns,))]
+
+
+def items(ns: str):
+    """(key, dict) for every entry of *ns*."""
+    c = _conn()
+    if c is None:
+        return
+    for key, codec, value in c.execute("SELECT key, codec, value FROM kv WHERE ns = ?", (ns,)):
+        yield key, _decode(codec, value)
+
+
+def stats() -> dict:
+    """{ns: {"entries": n, "bytes": stored value bytes}}."""
+    c = _conn()
+    if c is None:
+        return {}
+    rows = c.execute("SELECT ns, COUNT(*), SUM(LENGTH(value)) FROM kv GROUP BY ns").fetchall()
+    return {ns: {"entries": n, "bytes": b} for ns, n, b in rows}
+
+
+def checkpoint() -> bool:
+    """Fold the WAL into the main file and drop -wal/-shm (also with CACHE_WRITE=0)."""
+    if not ENABLED or not os.path.exists(DB_PATH):
+        return False
+    c = sqlite3.connect(DB_PATH, timeout=10, isolation_level=None)
+    try:
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        c.execute("PRAGMA journal_mode=DELETE")   # writers switch back to WAL on open
+    finally:
+        c.close()
+    return True
+
+
+# ---- file layout ⇄ store ----------------------------------------------------
+def _dirs():
+    from src.image_cache import CACHE_DIR
+    from src.text_cache import TEXT_CACHE_DIR
+    return {IMAGE: CACHE_DIR, BLURB: TEXT_CACHE_DIR}
+
+
+def import_files(prune: bool = False, batch: int = 500) -> dict:
+    """JSON files of image_cache/ and text_cache/ → store; {ns: entries imported}."""
+    counts = {}
+    for ns, folder in _dirs().items():
+        paths = sorted(e.path for e in os.scandir(folder)
+                       if e.name.endswith(".json") and e.is_file())
+        done = 0
+        for i in range(0, len(paths), batch):
+            chunk = []
+            for path in paths[i:i + batch]:
+                try:
+                    with open(path, encoding="utf-8") as fh:
+                        chunk.append((os.path.basename(path)[:-len(".json")], json.load(fh)))
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  skipped {path}: {e}")
+            written = put_many(ns, chunk)
+            if written != len(chunk):
+                raise RuntimeError(f"meta store write failed while importing {folder}")
+            done += written
+            if prune:
+                for key, _ in chunk:
+                    os.remove(os.path.join(folder, f"{key}.json"))
+        counts[ns] = done
+        print(f"📥 {ns}: {done:,} entries from {folder}" + (" (files removed)" if prune else ""))
+    checkpoint()
+    return counts
+
+
+def export_files(overwrite: bool = False) -> dict:
+    """Store → one JSON file per entry (the pre-store layout); {ns: files written}."""
+    counts = {}
+    for ns, folder in _dirs().items():
+        os.makedirs(folder, exist_ok=True)
+        done = 0
+        for key, value in items(ns):
+            path = os.path.join(folder, f"{key}.json")
+            if not overwrite and os.path.exists(path):
+                continue
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(value, fh, indent=2)
+            done += 1
+        counts[ns] = done
+        print(f"📤 {ns}: {done:,} files written to {folder}")
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Move cache metadata between per-file JSON and the single-file store"
+    )
+    parser.add_argument("action", choices=["import", "export", "checkpoint", "stats"])
+    parser.add_argument("--prune", action="store_true",
+                        help="import: delete each JSON file once it is in the store")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="export: replace existing JSON files")
+    args = parser.parse_args()
+
+    if args.action == "import":
+        import_files(prune=args.prune)
+    elif args.action == "export":
+        export_files(overwrite=args.overwrite)
+    elif args.action == "checkpoint":
+        if not checkpoint():
+            raise SystemExit(f"❌ no meta store at {DB_PATH}")
+        print(f"🧹 {DB_PATH}: WAL checkpointed, -wal/-shm removed")
+    for ns, s in stats().items():
+        print(f"   {ns:<6} {s['entries']:>7,} entries  {s['bytes'] / 1024:8.0f} kB in {DB_PATH}")
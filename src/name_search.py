@@ -0,0 +1,133 @@
+# src/name_search.py
+# ------------------------------------------------------------
+# Typeahead index for the common-name dropdown.
+#
+# Keys are the dropdown labels ("Clown anemonefish (Amphiprion
+# ocellaris)") normalised once at boot: accents folded, case-folded,
+# punctuation collapsed to single spaces.  Lookups are tiered:
+#
+#   0  label prefix          "clown"  → Clown anemonefish …
+#   1  word prefix           "anem"   → … anemonefish …, (Amphiprion …)
+#   2  substring             "nemone" → trigram postings ∩, then verified
+#   3  typo-tolerant (opt.)  "anemonfish" → share of query trigrams present
+#
+# Tiers 0/1 share one sorted array of (row, word offset) pairs, searched
+# with bisect; tier 2/3 use a trigram → rows posting table.  An optional
+# boolean row mask (FilterIndex.mask) applies the wiki/popular/favourites
+# filters without touching pandas.
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text) -> str:
+    """Accent-fold, case-fold and collapse everything else to single spaces."""
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def _trigrams(key: str) -> set:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameSearch:
+    def __init__(self, labels, fuzzy: bool = True):
+        keys = [fold(s) for s in labels]
+        self.keys = keys
+        self.fuzzy = fuzzy
+
+        # ---- word-start suffixes, sorted → tiers 0 / 1 -----------------
+        rows, offs = [], []
+        for r, k in enumerate(keys):
+            if not k:
+                continue
+            rows.append(r)
+            offs.append(0)
+            for m in re.finditer(" ", k):
+                rows.append(r)
+                offs.append(m.end())
+        rows = np.asarray(rows, dtype=np.int32)
+        offs = np.asarray(offs, dtype=np.int16)
+        order = sorted(range(len(rows)), key=lambda i: keys[rows[i]][offs[i]:])
+        self._rows = rows[order]
+        self._offs = offs[order]
+        self._suffix = lambda i: keys[self._rows[i]][self._offs[i]:]
+
+        # ---- trigram postings → tiers 2 / 3 ----------------------------
+        post = {}
+        ntri = np.zeros(len(keys), dtype=np.int16)
+        for r, k in enumerate(keys):
+            tris = _trigrams(k) if k else ()
+            ntri[r] = len(tris)
+            for t in tris:
+                post.setdefault(t, []).append(r)
+        self._post = {t: np.asarray(v, dtype=np.int32) for t, v in post.items()}
+        self._ntri = ntri
+
+    # ------------------------------------------------------------------
+    def search(self, query, mask=None, limit: int = 50) -> list:
+        """Row positions of the best ≤ *limit* matches, best first."""
+        q = fold(query)
+        if not q:
+            return []
+        out, seen = [], set()
+
+        def take(rows):
+            for r in rows:
+                r = int(r)
+                if r in seen or (mask is not None and not mask[r]):
+                    continue
+                seen.add(r)
+                out.append(r)
+                if len(out) >= limit:
+                    return True
+            return False
+
+        # tiers 0 + 1: one bisect over the sorted word-start suffixes
+        n = len(self._rows)
+        lo = bisect.bisect_left(range(n), q, key=self._suffix)
+        hi = bisect.bisect_left(range(n), q + "\uffff", key=self._suffix, lo=lo)
+        rows, offs = self._rows[lo:hi], self._offs[lo:hi]
+        if take(rows[offs == 0]) or take(rows[offs > 0]):
+            return out
+
+        # tier 2: substring – intersect trigram postings, then verify
+        inner = {q[i:i + 3] for i in range(len(q) - 2)}      # unpadded: may sit mid-word
+        if inner:
+            lists = sorted((self._post.get(t) for t in inner), key=lambda a: -1 if a is None else len(a))
+            if lists[0] is not None:
+                cand = lists[0]
+                for a in lists[1:]:
+                    cand = np.intersect1d(cand, a, assume_unique=True)
+                    if not len(cand):
+                        break
+                hits = [r for r in cand.tolist() if q in self.keys[r]]
+                hits.sort(key=lambda r: len(self.keys[r]))
+                if take(hits):
+                    return out
+        else:
+            # 1–2 chars have no trigram: plain scan (rare – word prefixes usually fill up first)
+            if take(r for r, k in enumerate(self.keys) if q in k):
+                return out
+
+        # tier 3: typo tolerance – share of the query's trigrams a label has,
+        # shorter labels first on ties
+        if self.fuzzy and len(q) >= 4:
+            qt = _trigrams(q)
+            arrays = [self._post[t] for t in qt if t in self._post]
+            if arrays:
+                cand, shared = np.unique(np.concatenate(arrays), return_counts=True)
+                score = shared / len(qt)
+                keep = score >= 0.5
+                cand, score = cand[keep], score[keep]
+                best = np.lexsort((self._ntri[cand], -score))[: 4 * limit]
+                take(cand[best])
+        return out
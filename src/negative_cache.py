@@ -0,0 +1,136 @@
+# src/negative_cache.py
+# ------------------------------------------------------------
+# Persistent "nothing there" results for the Wikipedia / Commons lookups.
+#
+# get_commons_thumb / get_blurb return (None, …) for many obscure
+# species; without a record of that, every worker restart or lru
+# eviction replays the whole lookup chain.  Misses are stored in a small
+# SQLite table shared by all workers (WAL, one connection per thread):
+#
+#     (kind, key) → reason, detail, attempts, expires
+#
+# Each reason has its own TTL (env, seconds).  Fetch errors back off
+# exponentially from NEG_TTL_FETCH_ERROR up to NEG_TTL_FETCH_ERROR_MAX,
+# so a flaky upstream is retried soon while a missing page is not.
+#
+#   NEG_CACHE=0        disable (lookups always miss, nothing written)
+#   NEG_CACHE_PATH     database file (default cache/negative_cache.sqlite3)
+import os
+import sqlite3
+import threading
+import time
+
+NO_PAGE     = "no_page"       # no Wikipedia article under any known title
+NO_IMAGE    = "no_image"      # article, but no usable image / imageinfo
+OVERSIZED   = "oversized"     # image over MAX_IMAGE_KB even after re-encode
+FETCH_ERROR = "fetch_error"   # network / API failure (retried with backoff)
+
+_DAY = 86400
+TTL = {
+    NO_PAGE:     int(os.getenv("NEG_TTL_NO_PAGE",     str(30 * _DAY))),
+    NO_IMAGE:    int(os.getenv("NEG_TTL_NO_IMAGE",    str(14 * _DAY))),
+    OVERSIZED:   int(os.getenv("NEG_TTL_OVERSIZED",   str(30 * _DAY))),
+    FETCH_ERROR: int(os.getenv("NEG_TTL_FETCH_ERROR", "300")),
+}
+FETCH_ERROR_MAX = int(os.getenv("NEG_TTL_FETCH_ERROR_MAX", str(_DAY)))
+
+ENABLED = os.getenv("NEG_CACHE", "1") == "1"
+DB_PATH = os.getenv("NEG_CACHE_PATH", "cache/negative_cache.sqlite3")
+
+_local = threading.local()
+_state = {"broken": False}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS negative (
+    kind     TEXT NOT NULL,
+    key      TEXT NOT NULL,
+    reason   TEXT NOT NULL,
+    detail   TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    created  REAL NOT NULL,
+    expires  REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID
+"""
+
+
+def _conn():
+    """Per-thread (and per-process) connection; None when disabled or unavailable."""
+    if not ENABLED or _state["broken"]:
+        return None
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        try:
+            os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+            c = sqlite3.connect(DB_PATH, timeout=5, isolation_level=None)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            c.execute(_SCHEMA)
+        except sqlite3.Error as e:
+            print(f"⚠️  negative cache disabled ({DB_PATH}): {e}")
+            _state["broken"] = True
+            return None
+        _local.conn, _local.pid = c, pid
+    return _local.conn
+
+
+def check(kind: str, key: str):
+    """Reason string if *key* is a known, unexpired miss; else None."""
+    c = _conn()
+    if c is None:
+        return None
+    try:
+        row = c.execute("SELECT reason, expires FROM negative WHERE kind = ? AND key = ?",
+                        (kind, key)).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row and row[1] > time.time() else None
+
+
+def record(kind: str, key: str, reason: str, detail: str = ""):
+    """Remember a miss; repeated fetch errors back off exponentially."""
+    c = _conn()
+    if c is None:
+        return
+    now = time.time()
+    try:
+        row = c.execute("SELECT reason, attempts FROM negative WHERE kind = ? AND key = ?",
+                        (kind, key)).fetchone()
+        attempts = row[1] + 1 if row and row[0] == reason else 1
+        ttl = TTL.get(reason, TTL[FETCH_ERROR])
+        if reason == FETCH_ERROR:
+            ttl = min(ttl * 2 ** (attempts - 1), FETCH_ERROR_MAX)
+        c.execute(
+            "INSERT OR REPLACE INTO negative (kind, key, reason, detail, attempts, created, expires) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, key, reason, (detail or "")[:300], attempts, now, now + ttl),
+        )
+    except sqlite3.Error as e:
+        print(f"⚠️  negative cache write failed for {kind}:{key}: {e}")
+
+
+def clear(kind: str, key: str):
+    """Forget a miss (e.g. after a successful fetch)."""
+    c = _conn()
+    if c is None:
+        return
+    try:
+        c.execute("DELETE FROM negative WHERE kind = ? AND key = ?", (kind, key))
+    except sqlite3.Error:
+        pass
+
+
+def stats() -> dict:
+    """{kind: {reason: live entries}}."""
+    c = _conn()
+    if c is None:
+        return {}
+    out = {}
+    try:
+        rows = c.execute("SELECT kind, reason, COUNT(*) FROM negative WHERE expires > ? "
+                         "GROUP BY kind, reason", (time.time(),)).fetchall()
+    except sqlite3.Error:
+        return {}
+    for kind, reason, n in rows:
+        out.setdefault(kind, {})[reason] = n
+    return out
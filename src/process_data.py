@@ -1,6 +1,6 @@
 import pandas as pd, requests
 from functools import lru_cache
-import os
+import os, json, hashlib, datetime
 
 def cm_to_in(cm):
     return round(cm / 2.54, 1) if pd.notna(cm) else None
@@ -124,7 +124,19 @@ def load_species_data() -> pd.DataFrame:
 
 @lru_cache(maxsize=1)
 def load_species_with_taxonomy() -> pd.DataFrame:
-    """Return the master species table WITH kingdom-…-genus columns."""
+    """
+    Return the master species table WITH kingdom-…-genus columns.
+    Uses the prebuilt snapshot when it is present and current; otherwise
+    parses + merges the CSVs like before.
+    """
+    df = load_species_snapshot()
+    if df is not None:
+        return df
+    return merge_species_taxonomy()
+
+
+def merge_species_taxonomy() -> pd.DataFrame:
+    """Build the merged species + GBIF taxonomy table from the raw CSVs."""
     df_sp  = load_species_data()                # your 52 MB main table
     df_tax = pd.read_csv("data/processed/gbif_taxonomy.csv")
 
@@ -146,9 +158,138 @@ def load_species_with_taxonomy() -> pd.DataFrame:
     return merged
     
 def load_name_table() -> pd.DataFrame:
+    # sliced from the merged table so rows line up with df_full and a
+    # snapshot boot never has to touch the CSV
     cols = ["Genus", "Species", "FBname", "has_wiki_page", "Genus_Species",
             "dropdown_label"]
-    return load_species_data()[cols]
+    return load_species_with_taxonomy()[cols]
+
+
+# ------------- Prebuilt columnar snapshot ---------------------------
+# `python -m src.build_species_snapshot` writes the fully merged + typed
+# df_full to an Arrow IPC file; the app memory-maps it at boot instead of
+# re-parsing the CSVs. Bump SNAPSHOT_VERSION whenever the table-building
+# code above (dtypes, derived columns, extra species) changes.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = os.getenv("SPECIES_SNAPSHOT", "data/processed/species_snapshot.arrow")
+SNAPSHOT_SOURCES = (
+    "data/processed/filtered_combined_species.csv",
+    "data/processed/common_name_overrides.txt",
+    "data/processed/gbif_taxonomy.csv",
+)
+
+
+def _source_stat(paths=SNAPSHOT_SOURCES) -> str:
+    """Size + mtime of the input files: the boot-time check, no file is read."""
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append([path, st.st_size, st.st_mtime_ns])
+        except OSError:
+            sig.append([path, None, None])
+    return json.dumps(sig, separators=(",", ":"))
+
+
+def _source_fingerprint(paths=SNAPSHOT_SOURCES) -> str:
+    """Content hash of the input files (missing files hash as empty)."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        h.update(path.encode())
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def write_species_snapshot(df: pd.DataFrame, path=SNAPSHOT_PATH) -> str:
+    """
+    Write df to an uncompressed Arrow IPC file (uncompressed so it can be
+    memory-mapped). Floats keep NaN instead of nulls so numeric columns
+    convert back to pandas without a copy; object columns holding mixed
+    types (e.g. Database = "fishbase" | 0 | -1) are stored as JSON text.
+    """
+    import pyarrow as pa
+
+    json_cols = [name for name in df.columns
+                 if df[name].dtype == object and not _is_arrow_friendly(df[name])]
+    encoded = df.assign(**{
+        name: [json.dumps(None if v is pd.NA else v) for v in df[name].tolist()]
+        for name in json_cols
+    })
+
+    table = pa.Table.from_pandas(encoded, preserve_index=False)
+    for i, name in enumerate(table.column_names):
+        if pd.api.types.is_float_dtype(df[name].dtype):
+            table = table.set_column(i, name, pa.array(df[name].to_numpy(), from_pandas=False))
+
+    meta = dict(table.schema.metadata or {})
+    meta.update({
+        b"pelagica.version":     str(SNAPSHOT_VERSION).encode(),
+        b"pelagica.sources":     _source_fingerprint().encode(),
+        b"pelagica.source_stat": _source_stat().encode(),
+        b"pelagica.json_cols":   json.dumps(json_cols).encode(),
+        b"pelagica.built_utc":   datetime.datetime.now(datetime.timezone.utc).isoformat().encode(),
+    })
+    table = table.replace_schema_metadata(meta)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)           # atomic: running workers keep the old mapping
+    return path
+
+
+def _is_arrow_friendly(col: pd.Series) -> bool:
+    import pyarrow as pa
+    try:
+        pa.array(col, from_pandas=True)
+        return True
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return False
+
+
+def load_species_snapshot(path=SNAPSHOT_PATH) -> pd.DataFrame | None:
+    """
+    Memory-map the snapshot and return it as a DataFrame, or None when
+    pyarrow is missing or the file is absent / built by another version /
+    built from different source files (set SPECIES_SNAPSHOT_VERIFY=0 to
+    skip that check, e.g. when the CSVs are not shipped).  The check is
+    size + mtime; the sources are only hashed when those differ (a checkout
+    or copy that touched the files without changing them).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print("• pyarrow not installed – ignoring species snapshot")
+        return None
+
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    except Exception as e:
+        print(f"• species snapshot unreadable ({e}) – falling back to CSV")
+        return None
+
+    meta = table.schema.metadata or {}
+    if meta.get(b"pelagica.version", b"").decode() != str(SNAPSHOT_VERSION):
+        print("• species snapshot version mismatch – falling back to CSV")
+        return None
+    if (os.getenv("SPECIES_SNAPSHOT_VERIFY", "1") == "1"
+            and meta.get(b"pelagica.source_stat", b"").decode() != _source_stat()):
+        if meta.get(b"pelagica.sources", b"").decode() != _source_fingerprint():
+            print("• species snapshot is stale (sources changed) – falling back to CSV")
+            return None
+
+    print(f"• loading species snapshot {path}…")
+    df = table.to_pandas(split_blocks=True)
+    for name in json.loads(meta.get(b"pelagica.json_cols", b"[]")):
+        df[name] = df[name].map(json.loads)
+    return df
     
     
 def load_homo_sapiens():
@@ -0,0 +1,209 @@
+# src/r2_manifest.py
+# ------------------------------------------------------------
+# In-memory list of the objects on R2, so "does this file exist?" is a set
+# lookup instead of a HEAD request.
+#
+# In production /cached-images probed up to three names per image and
+# _sound_paths three extensions per species, each a blocking HEAD (2 s
+# timeout) on a worker thread.  The manifest covers the mirrored trees:
+#
+#     image_cache/…            assets/species/sound/…
+#
+# It is written at sync time (src/r2_sync lists the bucket; python -m
+# src.r2_manifest build uses the local trees instead, only right for a
+# bucket mirrored from this machine) as gzipped JSON, shipped in the image at
+# R2_MANIFEST_PATH and uploaded next to the objects as r2_manifest.json.gz.
+# Boot loads the local copy; a daemon thread per process then re-fetches
+# the remote one every R2_MANIFEST_TTL seconds (conditional GET, ETag).
+#
+# has() answers True/False once a manifest is loaded and None before,
+# in which case callers fall back to probing R2.
+#
+#   R2_MANIFEST=0       disable (always probe)
+#   R2_MANIFEST_PATH    local copy (default data/processed/r2_manifest.json.gz)
+#   R2_MANIFEST_TTL     refresh interval in seconds (default 300)
+#
+# Run:  python -m src.r2_manifest build
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+
+from src import http_client
+
+ENABLED = os.getenv("R2_MANIFEST", "1") == "1"
+LOCAL_PATH = os.getenv("R2_MANIFEST_PATH", "data/processed/r2_manifest.json.gz")
+REMOTE_KEY = "r2_manifest.json.gz"
+TTL = int(os.getenv("R2_MANIFEST_TTL", "300"))
+
+# local folder → key prefix on R2 (the trees the app looks up)
+PREFIXES = {
+    "image_cache": "image_cache/",
+    os.path.join("assets", "species", "sound"): "assets/species/sound/",
+}
+
+_lock = threading.Lock()
+_st = {"objects": None, "generated": None, "loaded_at": None, "etag": None,
+       "base_url": None, "pid": None, "refreshes": 0, "errors": 0,
+       "generation": 0}                 # bumped per installed manifest (cache keys)
+
+
+# ---- build ------------------------------------------------------------------
+def _payload(prefixes: dict) -> dict:
+    return {
+        "generated": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "prefixes": {prefix: sorted(names) for prefix, names in prefixes.items()},
+    }
+
+
+def build_payload(roots: dict = PREFIXES) -> dict:
+    """{"generated": iso, "prefixes": {prefix: [names]}} from the local trees."""
+    prefixes = {}
+    for folder, prefix in roots.items():
+        names = []
+        if os.path.isdir(folder):
+            for dirpath, _, files in os.walk(folder):
+                rel = os.path.relpath(dirpath, folder)
+                for f in files:
+                    names.append(f if rel == "." else f"{rel.replace(os.sep, '/')}/{f}")
+        prefixes[prefix] = names
+    return _payload(prefixes)
+
+
+def payload_from_keys(keys) -> dict:
+    """Same payload from object keys known to be on R2 (src/r2_sync's bucket listing)."""
+    prefixes = {prefix: [] for prefix in PREFIXES.values()}
+    for key in keys:
+        for prefix, names in prefixes.items():
+            if key.startswith(prefix):
+                names.append(key[len(prefix):])
+                break
+    return _payload(prefixes)
+
+
+def encode(payload: dict) -> bytes:
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), mtime=0)
+
+
+def write(payload: dict, path: str = LOCAL_PATH) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(encode(payload))
+    os.replace(tmp, path)
+    return path
+
+
+# ---- load / refresh ---------------------------------------------------------
+def _install(payload: dict, etag=None):
+    objects = frozenset(prefix + name
+                        for prefix, names in payload.get("prefixes", {}).items()
+                        for name in names)
+    with _lock:
+        _st.update(objects=objects, generated=payload.get("generated"),
+                   loaded_at=time.time(), etag=etag, generation=_st["generation"] + 1)
+
+
+def load_local(path: str = LOCAL_PATH) -> bool:
+    try:
+        with open(path, "rb") as fh:
+            _install(json.loads(gzip.decompress(fh.read())))
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        print(f"⚠️  R2 manifest {path} unreadable: {e}")
+        return False
+    print(f"🗂️  R2 manifest: {len(_st['objects']):,} objects (generated {_st['generated']})")
+    return True
+
+
+def refresh() -> bool:
+    """Re-fetch the remote manifest if it changed; True if a new one was installed."""
+    if not _st["base_url"]:
+        return False
+    headers = {"If-None-Match": _st["etag"]} if _st["etag"] else {}
+    try:
+        with http_client.get(f"{_st['base_url']}/{REMOTE_KEY}", headers=headers, timeout=10) as r:
+            if r.status_code == 304:
+                _st["loaded_at"] = time.time()
+                return False
+            r.raise_for_status()
+            body = r.content                     # gzip bytes, unless served Content-Encoding: gzip
+            payload = json.loads(gzip.decompress(body) if body[:2] == b"\x1f\x8b" else body)
+            etag = r.headers.get("ETag")
+    except Exception as e:
+        _st["errors"] += 1
+        if _st["errors"] == 1 or _st["errors"] % 20 == 0:
+            print(f"⚠️  R2 manifest refresh failed ({_st['errors']}×): {e}")
+        return False
+    _install(payload, etag)
+    _st["refreshes"] += 1
+    return True
+
+
+def _refresher():
+    while True:
+        refresh()
+        time.sleep(TTL if _st["objects"] is not None else min(TTL, 30))
+
+
+def _ensure_refresher():
+    """One refresh thread per process (threads don't survive gunicorn's fork)."""
+    pid = os.getpid()
+    if _st["pid"] != pid and _st["base_url"]:
+        with _lock:
+            if _st["pid"] != pid:
+                _st["pid"] = pid
+                threading.Thread(target=_refresher, name="r2-manifest", daemon=True).start()
+
+
+def start(base_url: str):
+    """Boot: load the shipped manifest (else fetch it once) and keep it fresh."""
+    if not ENABLED:
+        return
+    _st["base_url"] = base_url.rstrip("/")
+    if not load_local():
+        refresh()
+
+
+# ---- lookups ----------------------------------------------------------------
+def has(rel_path: str):
+    """True / False if rel_path ("image_cache/x.webp") is on R2; None when unknown."""
+    _ensure_refresher()
+    objects = _st["objects"]
+    if objects is None:
+        return None
+    return rel_path.lstrip("/") in objects
+
+
+def generation() -> int:
+    """Changes whenever a new manifest is installed; 0 before the first."""
+    return _st["generation"]
+
+
+def stats() -> dict:
+    return {
+        "objects": len(_st["objects"]) if _st["objects"] is not None else None,
+        "generated": _st["generated"],
+        "age_s": round(time.time() - _st["loaded_at"]) if _st["loaded_at"] else None,
+        "refreshes": _st["refreshes"],
+        "errors": _st["errors"],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Write the R2 object manifest from the local image_cache/ and sound trees"
+    )
+    parser.add_argument("action", choices=["build"])
+    parser.add_argument("--out", default=LOCAL_PATH, help="Output file (gzipped JSON)")
+    args = parser.parse_args()
+
+    payload = build_payload()
+    path = write(payload, args.out)
+    counts = ", ".join(f"{p} {len(n):,}" for p, n in payload["prefixes"].items())
+    print(f"✅ {path}: {counts} (upload it to R2 as {REMOTE_KEY})")
@@ -0,0 +1,318 @@
+# src/r2_sync.py
+# ------------------------------------------------------------
+# Incremental upload of the local caches to R2 (or any S3-compatible
+# endpoint), so a warm no longer means re-uploading every object.
+#
+#     image_cache/ → image_cache/      text_cache/ → text_cache/
+#     assets/species/sound/ → assets/species/sound/
+#
+# The bucket holds sync_manifest.json.gz, {key: [content hash, size]} for
+# everything this tool uploaded.  A run hashes the local trees (hashes are
+# remembered by path/size/mtime in cache/r2_sync_hashes.json, so only
+# changed files are read again), diffs them against that manifest and
+# uploads only new or changed objects, several at a time (boto3 switches
+# to parallel multipart above R2_SYNC_MULTIPART_MB).  Every finished upload
+# is appended to a journal; an interrupted run picks up from remote
+# manifest + journal instead of starting over.  At the end the merged
+# manifest is uploaded.  The existence manifest the app reads
+# (src/r2_manifest, also written to data/processed/) comes from a listing
+# of the bucket instead, so objects this tool never uploaded (sounds put
+# there by hand, images cached on another machine) still count as present;
+# the sync manifest is only used for diffing.
+#
+#   R2_ENDPOINT             S3 endpoint (https://<account>.r2.cloudflarestorage.com)
+#   R2_BUCKET               bucket name
+#   R2_ACCESS_KEY_ID        credentials (else boto3's usual AWS_* chain)
+#   R2_SECRET_ACCESS_KEY
+#
+# Needs `boto3` (pip install boto3); the app itself does not.
+#
+# Run:  python -m src.r2_sync --dry-run        # what would be uploaded
+#       python -m src.r2_sync                  # upload + manifests
+#       python -m src.r2_sync --delete         # …and remove objects deleted locally
+#       python -m src.r2_sync --adopt          # first run on a bucket filled by hand
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src import r2_manifest
+
+ENDPOINT = os.getenv("R2_ENDPOINT", "")
+BUCKET = os.getenv("R2_BUCKET", "")
+MULTIPART_MB = int(os.getenv("R2_SYNC_MULTIPART_MB", "8"))
+
+TREES = {
+    "image_cache": "image_cache/",
+    "text_cache": "text_cache/",
+    os.path.join("assets", "species", "sound"): "assets/species/sound/",
+}
+SYNC_MANIFEST_KEY = "sync_manifest.json.gz"
+HASH_CACHE_PATH = os.path.join("cache", "r2_sync_hashes.json")
+JOURNAL_DIR = "cache"
+CACHE_CONTROL = "public, max-age=86400"          # same as the /cached-images redirect
+
+_SKIP_SUFFIXES = (".tmp", ".lock", ".part")
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("audio/ogg", ".ogg")
+
+
+def _client():
+    try:
+        import boto3
+        from botocore.config import Config
+    except ImportError:
+        raise SystemExit("❌ r2_sync needs boto3: pip install boto3")
+    return boto3.client(
+        "s3",
+        endpoint_url=ENDPOINT or None,
+        aws_access_key_id=os.getenv("R2_ACCESS_KEY_ID") or None,
+        aws_secret_access_key=os.getenv("R2_SECRET_ACCESS_KEY") or None,
+        region_name=os.getenv("R2_REGION", "auto"),
+        config=Config(retries={"max_attempts": 5, "mode": "standard"},
+                      max_pool_connections=64),
+    )
+
+
+# ---- local side -------------------------------------------------------------
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def local_objects(trees: dict = TREES, hash_cache_path: str = HASH_CACHE_PATH) -> dict:
+    """{key: (path, hash, size)} for every file under the synced trees."""
+    try:
+        with open(hash_cache_path, encoding="utf-8") as fh:
+            known = json.load(fh)
+    except (OSError, ValueError):
+        known = {}
+
+    objects, fresh, hashed = {}, {}, 0
+    for folder, prefix in trees.items():
+        if not os.path.isdir(folder):
+            continue
+        for dirpath, _, files in os.walk(folder):
+            rel = os.path.relpath(dirpath, folder)
+            for f in files:
+                if f.startswith(".") or f.endswith(_SKIP_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, f)
+                st = os.stat(path)
+                sig = [st.st_size, st.st_mtime_ns]
+                cached = known.get(path)
+                if cached and cached[:2] == sig:
+                    digest = cached[2]
+                else:
+                    digest = file_hash(path)
+                    hashed += 1
+                fresh[path] = sig + [digest]
+                key = prefix + (f if rel == "." else f"{rel.replace(os.sep, '/')}/{f}")
+                objects[key] = (path, digest, st.st_size)
+
+    if hashed or len(fresh) != len(known):
+        os.makedirs(os.path.dirname(hash_cache_path) or ".", exist_ok=True)
+        tmp = hash_cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(fresh, fh, separators=(",", ":"))
+        os.replace(tmp, hash_cache_path)
+    print(f"🔎 {len(objects):,} local files ({hashed:,} hashed, rest unchanged since last run)")
+    return objects
+
+
+# ---- remote state -----------------------------------------------------------
+def _get(s3, key: str):
+    """Object bytes, or None when it does not exist."""
+    from botocore.exceptions import ClientError
+    try:
+        return s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+
+
+def remote_manifest(s3) -> dict:
+    """{key: [hash, size]} as of the last completed sync."""
+    body = _get(s3, SYNC_MANIFEST_KEY)
+    return json.loads(gzip.decompress(body)) if body else {}
+
+
+def _listing(s3, prefix: str = ""):
+    """Every object under *prefix* in the bucket (list_objects_v2, paginated)."""
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix):
+        yield from page.get("Contents", [])
+
+
+def bucket_keys(s3) -> list:
+    """Keys actually in the bucket under the prefixes the app looks up."""
+    return [obj["Key"] for prefix in r2_manifest.PREFIXES.values()
+            for obj in _listing(s3, prefix)]
+
+
+def adopt(s3, local: dict, remote: dict) -> int:
+    """Add objects already in the bucket (uploaded by other means) whose MD5 ETag
+    matches the local file to *remote*, so a first run does not re-upload them."""
+    adopted = 0
+    for obj in _listing(s3):
+        key, etag = obj["Key"], obj["ETag"].strip('"')
+        if key in remote or key not in local or "-" in etag:       # "-": multipart, not an MD5
+            continue
+        path, digest, size = local[key]
+        if obj["Size"] != size:
+            continue
+        with open(path, "rb") as fh:
+            if hashlib.md5(fh.read()).hexdigest() != etag:
+                continue
+        remote[key] = [digest, size]
+        adopted += 1
+    print(f"🤝 adopted {adopted:,} objects already in the bucket")
+    return adopted
+
+
+def _journal_path() -> str:
+    return os.path.join(JOURNAL_DIR, f"r2_sync.{BUCKET}.journal")
+
+
+def _read_journal() -> dict:
+    """Uploads (and deletes) finished by an interrupted run: {key: [hash, size] | None}."""
+    done = {}
+    try:
+        with open(_journal_path(), encoding="utf-8") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) == 3:
+                    digest, size, key = parts
+                    done[key] = None if digest == "-" else [digest, int(size)]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _put_json_gz(s3, key: str, body: bytes, cache_control: str = "no-cache"):
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body,
+                  ContentType="application/gzip", CacheControl=cache_control)
+
+
+# ---- sync -------------------------------------------------------------------
+def sync(jobs: int = 8, delete: bool = False, dry_run: bool = False,
+         adopt_existing: bool = False) -> dict:
+    """Upload new/changed local files; {"uploaded", "deleted", "unchanged", "bytes"}."""
+    if not BUCKET:
+        raise SystemExit("❌ set R2_BUCKET (and R2_ENDPOINT / credentials)")
+    from boto3.s3.transfer import TransferConfig
+
+    s3 = _client()
+    local = local_objects()
+    remote = remote_manifest(s3)
+    journal = _read_journal()
+    if journal:
+        print(f"↩️  resuming: {len(journal):,} operations from an interrupted run")
+        for key, entry in journal.items():
+            if entry is None:
+                remote.pop(key, None)
+            else:
+                remote[key] = entry
+    if adopt_existing:
+        adopt(s3, local, remote)
+
+    todo = [(key, path, digest, size) for key, (path, digest, size) in local.items()
+            if remote.get(key, [None])[0] != digest]
+    prefixes = tuple(TREES.values())
+    gone = sorted(k for k in remote if k not in local and k.startswith(prefixes)) if delete else []
+    total = sum(t[3] for t in todo)
+    print(f"⬆️  {len(todo):,} to upload ({total / 1024**2:.1f} MB), "
+          f"{len(local) - len(todo):,} unchanged" + (f", {len(gone):,} to delete" if delete else ""))
+    if dry_run:
+        for key, *_ in todo[:20]:
+            print(f"   + {key}")
+        for key in gone[:20]:
+            print(f"   - {key}")
+        return {"uploaded": 0, "deleted": 0, "unchanged": len(local) - len(todo), "bytes": 0}
+
+    transfer = TransferConfig(multipart_threshold=MULTIPART_MB * 1024**2,
+                              multipart_chunksize=MULTIPART_MB * 1024**2,
+                              max_concurrency=4)
+    lock = threading.Lock()
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    done, sent, started = 0, 0, time.time()
+
+    def upload(key, path, digest, size):
+        extra = {"CacheControl": CACHE_CONTROL}
+        ctype = mimetypes.guess_type(path)[0]
+        if ctype:
+            extra["ContentType"] = ctype
+        s3.upload_file(path, BUCKET, key, ExtraArgs=extra, Config=transfer)
+        return key, digest, size
+
+    with open(_journal_path(), "a", encoding="utf-8") as jf:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(upload, *t) for t in todo]
+            failed = 0
+            for fut in as_completed(futures):
+                try:
+                    key, digest, size = fut.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"⚠️  upload failed: {e}")
+                    continue
+                with lock:
+                    jf.write(f"{digest}\t{size}\t{key}\n")
+                    jf.flush()
+                    remote[key] = [digest, size]
+                    done += 1
+                    sent += size
+                    if done % 200 == 0:
+                        rate = sent / max(time.time() - started, 1e-6) / 1024**2
+                        print(f"   {done:,}/{len(todo):,} uploaded ({rate:.1f} MB/s)")
+        if failed:
+            raise SystemExit(f"❌ {failed:,} uploads failed; re-run to resume "
+                             f"({done:,} recorded in {_journal_path()})")
+
+        for i in range(0, len(gone), 1000):
+            batch = gone[i:i + 1000]
+            s3.delete_objects(Bucket=BUCKET,
+                              Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True})
+            for key in batch:
+                jf.write(f"-\t0\t{key}\n")
+                remote.pop(key, None)
+            jf.flush()
+
+    # manifests last: they only list objects that are really there
+    _put_json_gz(s3, SYNC_MANIFEST_KEY,
+                 gzip.compress(json.dumps(remote, separators=(",", ":")).encode("utf-8"), mtime=0))
+    payload = r2_manifest.payload_from_keys(bucket_keys(s3))
+    r2_manifest.write(payload)
+    _put_json_gz(s3, r2_manifest.REMOTE_KEY, r2_manifest.encode(payload))
+    os.remove(_journal_path())
+
+    print(f"✅ {done:,} uploaded ({sent / 1024**2:.1f} MB) in {time.time() - started:.1f} s, "
+          f"{len(gone):,} deleted; manifests updated ({len(remote):,} objects)")
+    return {"uploaded": done, "deleted": len(gone),
+            "unchanged": len(local) - len(todo), "bytes": sent}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Upload new/changed cache files to R2 and refresh the object manifests"
+    )
+    parser.add_argument("--jobs", type=int, default=8, help="Parallel uploads")
+    parser.add_argument("--delete", action="store_true",
+                        help="Also delete remote objects whose local file is gone")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    parser.add_argument("--adopt", action="store_true",
+                        help="Skip objects already in the bucket with identical content (MD5 ETag)")
+    args = parser.parse_args()
+
+    sync(jobs=args.jobs, delete=args.delete, dry_run=args.dry_run, adopt_existing=args.adopt)
@@ -0,0 +1,185 @@
+# src/rembg_batch.py
+# ------------------------------------------------------------
+# Batched background removal for the u2net model family.
+#
+# rembg.remove() runs one image per ONNX call.  For bulk cache fills this
+# module stacks several pre-resized images (wiki._shrink_for_rembg, i.e.
+# BG_MAX_SIDE) into one (N, 3, 320, 320) tensor and runs them together,
+# reproducing rembg's u2net pre/post-processing (per-image max scaling +
+# ImageNet normalisation in, min-max mask → LANCZOS resize → naive cutout
+# out), so the cut-outs match the single-image path.
+#
+# It has not yet been checked against rembg.remove with the real u2netp
+# weights, and it skips rembg's EXIF transpose, so nothing uses it by
+# default: single-image paths (inline, bg_jobs) stay on rembg.remove, the
+# bulk warmer uses PlainRemover (rembg.remove behind the same interface)
+# unless run with --bg-batch, and src/bench_rembg.py times both.
+#
+# Exports whose batch axis is fixed to 1 are detected on the first call
+# and fed one image per run instead.  REMBG_QUANTIZED=1 uses a dynamically
+# quantised (uint8 weights) copy of the model, written next to the
+# original on first use.
+#
+#   remover = get_remover()          # per-process PlainRemover (warm() once)
+#   remover = get_remover(batched=True)               # … BatchRemover
+#   out = remover.remove([png_bytes, …])
+import io
+import os
+import threading
+
+import numpy as np
+
+U2NET_FAMILY = ("u2net", "u2netp", "u2net_human_seg", "silueta")
+_MEAN = np.array((0.485, 0.456, 0.406), dtype=np.float32)
+_STD = np.array((0.229, 0.224, 0.225), dtype=np.float32)
+_SIZE = (320, 320)
+
+REMBG_BATCH = int(os.getenv("REMBG_BATCH", "4"))
+REMBG_QUANTIZED = os.getenv("REMBG_QUANTIZED", "0") == "1"
+
+
+def _model_path(model_name: str) -> str:
+    """Local .onnx of a rembg model (downloaded by rembg if missing)."""
+    from rembg.sessions import sessions_class
+    for sc in sessions_class:
+        if sc.name() == model_name:
+            return sc.download_models()
+    raise ValueError(f"unknown rembg model: {model_name}")
+
+
+def quantized_path(model_name: str) -> str:
+    """Dynamically quantised copy of *model_name* (created once, cached on disk)."""
+    src = _model_path(model_name)
+    dst = src[:-len(".onnx")] + ".quant.onnx"
+    if not os.path.exists(dst):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        tmp = dst + ".tmp"
+        quantize_dynamic(src, tmp, weight_type=QuantType.QUInt8)
+        os.replace(tmp, dst)
+        print(f"🗜️  quantised {model_name} → {dst}")
+    return dst
+
+
+class BatchRemover:
+    def __init__(self, model_name: str = "u2netp", quantized: bool = False,
+                 batch_size: int = REMBG_BATCH):
+        if model_name not in U2NET_FAMILY:
+            raise ValueError(f"batch mode supports {', '.join(U2NET_FAMILY)}, not {model_name}")
+        from src import wiki
+        import onnxruntime as ort
+
+        wiki._lazy_load_rembg_stack()
+        self._wiki = wiki
+        self._Image = wiki._Image
+        self.model_name = model_name
+        self.quantized = quantized
+        self.batch_size = max(1, batch_size)
+
+        # same memory-saver options as wiki._mem_saver_session
+        opts = ort.SessionOptions()
+        nthreads = int(os.getenv("OMP_NUM_THREADS", "1"))
+        opts.intra_op_num_threads = nthreads
+        opts.inter_op_num_threads = nthreads
+        opts.enable_cpu_mem_arena = False
+        opts.enable_mem_pattern = False
+        path = quantized_path(model_name) if quantized else _model_path(model_name)
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+
+        dim = self.session.get_inputs()[0].shape[0]
+        self._batched = not (isinstance(dim, int) and dim == 1)   # symbolic / None → dynamic
+        self._lock = threading.Lock()
+
+    # ---- pre / post-processing (mirrors rembg's U2netSession) ---------------
+    def _tensor(self, im) -> np.ndarray:
+        a = np.asarray(im.convert("RGB").resize(_SIZE, self._Image.LANCZOS), dtype=np.float32)
+        a = a / max(float(a.max()), 1e-6)
+        return ((a - _MEAN) / _STD).transpose(2, 0, 1)
+
+    def _cutout(self, im, pred: np.ndarray) -> bytes:
+        mi, ma = float(pred.min()), float(pred.max())
+        pred = (pred - mi) / (ma - mi) if ma > mi else np.zeros_like(pred)
+        mask = self._Image.fromarray((pred * 255).astype("uint8"), mode="L")
+        mask = mask.resize(im.size, self._Image.LANCZOS)
+        empty = self._Image.new("RGBA", im.size, 0)
+        out = self._Image.composite(im.convert("RGBA"), empty, mask)
+        buf = io.BytesIO()
+        out.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def _run(self, x: np.ndarray) -> np.ndarray:
+        if self._batched and len(x) > 1:
+            try:
+                return self.session.run(None, {self._input: x})[0][:, 0]
+            except Exception:
+                self._batched = False          # fixed batch axis → one at a time from now on
+        return np.concatenate([self.session.run(None, {self._input: x[i:i + 1]})[0][:, 0]
+                               for i in range(len(x))])
+
+    # ---- public -------------------------------------------------------------
+    def remove(self, images: list) -> list:
+        """Background-removed PNG bytes for each input (bytes), in order."""
+        out = []
+        for start in range(0, len(images), self.batch_size):
+            chunk = [self._Image.open(io.BytesIO(self._wiki._shrink_for_rembg(b)))
+                     for b in images[start:start + self.batch_size]]
+            x = np.stack([self._tensor(im) for im in chunk]).astype(np.float32)
+            with self._lock:
+                preds = self._run(x)
+            out.extend(self._cutout(im, p) for im, p in zip(chunk, preds))
+        return out
+
+    def warm(self):
+        """One dummy batch: loads weights and lets ORT plan the graph before real traffic."""
+        x = np.zeros((min(2, self.batch_size),) + (3,) + _SIZE, dtype=np.float32)
+        with self._lock:
+            self._run(x)
+        return self
+
+
+class PlainRemover:
+    """rembg.remove one image at a time (the app's path), behind BatchRemover's interface."""
+
+    batch_size = 1
+    quantized = False
+    _batched = False
+
+    def __init__(self, model_name: str = "u2netp"):
+        from src import wiki
+
+        wiki._lazy_load_rembg_stack()
+        self._wiki = wiki
+        self.model_name = model_name
+        self.session = wiki._mem_saver_session(model_name)
+
+    def remove(self, images: list) -> list:
+        """Background-removed PNG bytes for each input (bytes), in order."""
+        wiki = self._wiki
+        return [wiki._rembg_remove(wiki._shrink_for_rembg(b), session=self.session)
+                for b in images]
+
+    def warm(self):
+        buf = io.BytesIO()
+        self._wiki._Image.new("RGB", (64, 64), "white").save(buf, format="PNG")
+        self.remove([buf.getvalue()])
+        return self
+
+
+_remover = {"pid": None, "objs": {}}
+_remover_lock = threading.Lock()
+
+
+def get_remover(batched: bool = False):
+    """Per-process remover for REMBG_MODEL (u2netp): PlainRemover, or with *batched*
+    a BatchRemover (REMBG_QUANTIZED / REMBG_BATCH)."""
+    pid = os.getpid()
+    with _remover_lock:
+        if _remover["pid"] != pid:
+            _remover.update(pid=pid, objs={})
+        obj = _remover["objs"].get(batched)
+        if obj is None:
+            model = os.getenv("REMBG_MODEL", "u2netp")
+            obj = (BatchRemover(model, quantized=REMBG_QUANTIZED) if batched
+                   else PlainRemover(model))
+            _remover["objs"][batched] = obj
+    return obj
@@ -0,0 +1,103 @@
+# src/single_flight.py
+# ------------------------------------------------------------
+# Keyed request coalescing ("single flight").
+#
+# lru_cache only helps once a result exists: while the first call for an
+# uncached species is still downloading / running rembg, every other
+# thread asking for the same species starts its own copy.  Here the
+# first caller for a key becomes the leader and computes; concurrent
+# callers for that key block until it finishes and share its result (or
+# its exception).  Nothing is cached – stack it under lru_cache:
+#
+#     @lru_cache(maxsize=128)
+#     @single_flight
+#     def get_commons_thumb(...): ...
+#
+# Counters are per process (each gunicorn worker has its own).
+import functools
+import os
+import threading
+
+SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", "120"))   # s, then compute anyway
+
+_groups = {}        # name → SingleFlight
+
+
+class _Call:
+    __slots__ = ("done", "result", "exc")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0        # every do()
+        self.leaders = 0      # computed the value
+        self.shared = 0       # waited for a leader instead (= duplicate work avoided)
+        self.timeouts = 0     # waited too long and computed on their own
+        self.errors = 0       # leader raised
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if call.done.wait(SINGLE_FLIGHT_WAIT):
+                if call.exc is not None:
+                    raise call.exc
+                return call.result
+            with self._lock:
+                self.timeouts += 1
+            return fn(*args, **kwargs)
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.exc = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls, "leaders": self.leaders, "shared": self.shared,
+                "timeouts": self.timeouts, "errors": self.errors,
+                "in_flight": len(self._inflight),
+            }
+
+
+def single_flight(fn):
+    """Coalesce concurrent calls of *fn* with equal arguments."""
+    group = _groups.setdefault(fn.__qualname__, SingleFlight(fn.__qualname__))
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+        return group.do(key, fn, *args, **kwargs)
+
+    wrapper.flight = group
+    return wrapper
+
+
+def stats() -> dict:
+    """{name: counters} for every single-flight group in this process."""
+    return {name: g.stats() for name, g in _groups.items()}
@@ -0,0 +1,97 @@
+# src/size_index.py
+# ------------------------------------------------------------
+# Size-axis navigation without per-click sorting.
+#
+# A global small → large rank (Length_cm, tie-break Length_in, stable)
+# is computed once.  Each filter / favourites / order-lock subset is the
+# sorted array of its members' ranks, memoised per key, so extremes are
+# an index instead of filter → sort_values → tolist(); prev / next run in
+# the browser (assets/size_nav.js) on the client_payload() arrays.
+import hashlib
+import json
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def _frozen(a: np.ndarray) -> np.ndarray:
+    a.flags.writeable = False
+    return a
+
+
+class SizeIndex:
+    def __init__(self, df: pd.DataFrame, filter_index, species_index, maxsize: int = 64):
+        self._filters = filter_index
+        self._index   = species_index
+
+        cm   = pd.to_numeric(df["Length_cm"], errors="coerce").to_numpy(dtype=float)
+        inch = pd.to_numeric(df["Length_in"], errors="coerce").to_numpy(dtype=float)
+
+        # NaNs sort last in lexsort, like sort_values(na_position="last")
+        order = np.lexsort((inch, cm)).astype(np.int32)      # rank → row position
+        rank  = np.empty_like(order)
+        rank[order] = np.arange(len(order), dtype=np.int32)  # row position → rank
+
+        self.order   = _frozen(order)
+        self.rank    = _frozen(rank)
+        self.by_rank = _frozen(cm[order])                      # Length_cm in rank order
+
+        self.subset_for = lru_cache(maxsize=maxsize)(self._subset_for)
+        self.client_payload = lru_cache(maxsize=8)(self._client_payload)
+
+    # ---- subsets -----------------------------------------------------
+    def subset(self, wiki_val, pop_val, fav_val=None, favs_data=None, lock_order=None):
+        """Sorted ranks of the size-eligible species for these filters."""
+        return self.subset_for(*self._filters.key(wiki_val, pop_val, fav_val, favs_data),
+                               lock_order)
+
+    def _subset_for(self, wiki_on, pop_on, favs, lock_order=None):
+        pos = self._filters.positions_for(wiki_on, pop_on, favs, True, False)
+        if lock_order is not None:
+            pos = self._filters.select(pos, "order", lock_order)
+        return _frozen(np.sort(self.rank[pos]))
+
+    # ---- lookups -----------------------------------------------------
+    def name_at(self, ranks, i) -> str:
+        return self._filters.names[self.order[ranks[i]]]
+
+    def current(self, gs) -> dict:
+        """
+        {"gs", "len", "ord"} of one species for assets/size_nav.js, which
+        needs them when *gs* is not in the /nav/size-order payload (not
+        size-eligible, or the filters changed after it was picked).
+        """
+        p = self._index.pos(gs)
+        if p is None:
+            return {"gs": gs, "len": None, "ord": -1}
+        cm = self.by_rank[self.rank[p]]
+        codes, _ = self._filters.codes("order")
+        return {"gs": gs, "len": None if np.isnan(cm) else round(float(cm), 3),
+                "ord": int(codes[p])}
+
+    def extreme(self, ranks, largest: bool):
+        if len(ranks) == 0:
+            return None
+        return self.name_at(ranks, -1 if largest else 0)
+
+    # ---- browser payload (assets/size_nav.js) ---------------------------
+    def _client_payload(self, wiki_on: bool, pop_on: bool):
+        """
+        (json bytes, etag) for one (wiki, popular) combination: names in
+        small → large order, their Length_cm and an order code, so the
+        browser can apply favourites / order-lock and step locally.
+        """
+        ranks = self.subset_for(wiki_on, pop_on, None)
+        pos = self.order[ranks]
+        codes, orders = self._filters.codes("order")
+        body = {
+            "v": 1,
+            "gs":  self._filters.names[pos].tolist(),
+            "len": [None if np.isnan(x) else round(float(x), 3) for x in self.by_rank[ranks]],
+            "ord": codes[pos].tolist(),
+            "orders": orders.tolist(),
+        }
+        raw = json.dumps(body, separators=(",", ":")).encode()
+        etag = hashlib.blake2b(raw, digest_size=12).hexdigest()
+        return raw, etag
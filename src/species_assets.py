@@ -0,0 +1,202 @@
+# src/species_assets.py
+# ------------------------------------------------------------
+# Precomputed species → assets table, so the species-change callbacks do
+# dictionary lookups instead of probing the filesystem / R2 one by one.
+#
+#     "Genus species": {
+#         "img":   "<stem>.webp",      cached image the app shows (processed,
+#         "img_vw": [160, 320],        or raw for transparency-blacklisted
+#         "raw":   "<stem>.webp",      species / when no processed copy exists)
+#         "raw_vw": [160],             srcset widths present for each
+#         "sound": "/assets/species/sound/X.mp3",
+#         "cite":  "…",                sound citation (.txt next to the audio)
+#         "chat":  ["intro", …],       personality intros (present ⇔ chat JSON exists)
+#     }
+#
+# Built from the trees that ship with / get synced to R2 (image_cache/,
+# assets/species/sound/, assets/species/chat/), written as
+# gzipped JSON and loaded once per process.  Sound, citation and chat are
+# authoritative once the table is loaded; images only answer positively
+# (dev keeps caching new ones at runtime), a species without an entry
+# falls back to the probing path.
+#
+#   SPECIES_ASSETS=0        disable (probe per request, as before)
+#   SPECIES_ASSETS_PATH     table file (default data/processed/species_assets.json.gz)
+#
+# Run:  python -m src.species_assets              # rebuild after syncing assets
+import datetime
+import gzip
+import json
+import os
+
+from src import image_variants
+from src.image_cache import url_to_stem
+
+ENABLED = os.getenv("SPECIES_ASSETS", "1") == "1"
+PATH = os.getenv("SPECIES_ASSETS_PATH", "data/processed/species_assets.json.gz")
+SOUND_DIR = os.path.join("assets", "species", "sound")
+CHAT_DIR = os.path.join("assets", "species", "chat")
+SOUND_EXTS = (".ogg", ".mp3", ".wav")             # first one present wins
+IMAGE_WIDTH = 640                                 # get_commons_thumb default
+
+_st = {"table": None, "generated": None, "loaded": False}
+
+
+def file_base(gs: str) -> str:
+    """"Genus species" → "Genus_species" (sound / chat file names)."""
+    return gs.replace(" ", "_")
+
+
+# ---- build ------------------------------------------------------------------
+def _image_names(cache_dir: str) -> set:
+    """Every servable image name (packs only mirror these loose files)."""
+    return {e.name for e in os.scandir(cache_dir)} if os.path.isdir(cache_dir) else set()
+
+
+def _image_entry(stem: str, names: set):
+    """(file name, [srcset widths present]) for a stem, or None if not cached."""
+    name = image_variants.variant_name(stem)
+    if name not in names:
+        return None
+    return name, [w for w in image_variants.WIDTHS
+                  if image_variants.variant_name(stem, w) in names]
+
+
+def build_table(species, transp: set, cache_dir: str, equivalents: dict | None = None) -> dict:
+    equivalents = equivalents or {}
+    names = _image_names(cache_dir)
+    sounds = set(os.listdir(SOUND_DIR)) if os.path.isdir(SOUND_DIR) else set()
+    chats = set(os.listdir(CHAT_DIR)) if os.path.isdir(CHAT_DIR) else set()
+
+    table = {}
+    for gs in species:
+        entry = {}
+        title = equivalents.get(gs, gs)
+        proc = _image_entry(url_to_stem(f"{title}_{IMAGE_WIDTH}"), names)
+        raw = _image_entry(url_to_stem(f"{title}_{IMAGE_WIDTH}_raw"), names)
+        shown = (raw or proc) if gs in transp else (proc or raw)
+        if shown:
+            entry["img"], entry["img_vw"] = shown
+        if raw:
+            entry["raw"], entry["raw_vw"] = raw
+
+        base = file_base(gs)
+        for ext in SOUND_EXTS:
+            if base + ext in sounds:
+                entry["sound"] = f"/assets/species/sound/{base}{ext}"
+                break
+        if base + ".txt" in sounds:
+            with open(os.path.join(SOUND_DIR, base + ".txt"), encoding="utf-8") as fh:
+                cite = fh.read().strip()
+            if cite:
+                entry["cite"] = cite
+        if base + ".json" in chats:
+            try:
+                with open(os.path.join(CHAT_DIR, base + ".json"), encoding="utf-8") as fh:
+                    entry["chat"] = (json.load(fh) or {}).get("intros") or []
+            except (OSError, ValueError) as e:
+                print(f"⚠️  skipped chat for {gs}: {e}")
+        if entry:
+            table[gs] = entry
+    return table
+
+
+def write(table: dict, path: str = PATH) -> str:
+    payload = {
+        "generated": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "species": table,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(gzip.compress(json.dumps(payload, ensure_ascii=False,
+                                          separators=(",", ":")).encode("utf-8"), mtime=0))
+    os.replace(tmp, path)
+    return path
+
+
+# ---- lookups ----------------------------------------------------------------
+def _table():
+    """The loaded table (read on first use), or None when absent / disabled."""
+    if not _st["loaded"]:
+        _st["loaded"] = True
+        if not ENABLED:
+            return None
+        try:
+            with open(PATH, "rb") as fh:
+                payload = json.loads(gzip.decompress(fh.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️  species assets {PATH} unreadable: {e}")
+            return None
+        _st.update(table=payload.get("species", {}), generated=payload.get("generated"))
+        print(f"🗂️  species assets: {len(_st['table']):,} species (generated {_st['generated']})")
+    return _st["table"]
+
+
+def load() -> bool:
+    """Read the table now (boot, before workers fork) instead of on first lookup."""
+    return _table() is not None
+
+
+def get(gs: str):
+    """Asset entry for "Genus species" ({} when it has none); None when no table is loaded."""
+    table = _table()
+    if table is None:
+        return None
+    return table.get(gs, {})
+
+
+def image_name(gs: str, prefer_raw: bool = False, vw: int | None = None):
+    """Cached file name to serve for gs (variant chosen), or None when unknown."""
+    entry = get(gs)
+    if not entry:
+        return None
+    key = "raw" if prefer_raw and "raw" in entry else "img"
+    if key not in entry:
+        return None
+    name = entry[key]
+    if vw and vw in entry.get(f"{key}_vw", ()):
+        return image_variants.variant_name(name[:-len(".webp")], vw)
+    return name
+
+
+def stats() -> dict:
+    table = _st["table"]
+    if table is None:
+        return {"species": None}
+    return {
+        "species": len(table),
+        "generated": _st["generated"],
+        "images": sum("img" in e for e in table.values()),
+        "sounds": sum("sound" in e for e in table.values()),
+        "chats": sum("chat" in e for e in table.values()),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import pandas as pd
+    from src.image_cache import CACHE_DIR
+    from src.process_data import load_name_table
+
+    parser = argparse.ArgumentParser(
+        description="Resolve image / sound / citation / chat assets for every species"
+    )
+    parser.add_argument("--out", default=PATH, help="Output file (gzipped JSON)")
+    args = parser.parse_args()
+
+    try:
+        from src.wiki import WIKI_NAME_EQUIVALENTS
+    except Exception:
+        WIKI_NAME_EQUIVALENTS = {}
+    transp_df = pd.read_csv("data/processed/transparency_blacklist.csv")
+    transp = set(transp_df["Genus"] + " " + transp_df["Species"])
+    species = load_name_table()["Genus_Species"].dropna().tolist()
+
+    table = build_table(species, transp, CACHE_DIR, WIKI_NAME_EQUIVALENTS)
+    path = write(table, args.out)
+    counts = {k: sum(k in e for e in table.values()) for k in ("img", "sound", "cite", "chat")}
+    print(f"✅ {path}: {len(table):,} species with assets "
+          f"({', '.join(f'{k} {n:,}' for k, n in counts.items())})")
@@ -0,0 +1,62 @@
+# src/species_index.py
+# ------------------------------------------------------------
+# Primary-key lookup for df_full: "Genus Species" → row position.
+#
+# Built once at boot; replaces the per-callback
+#     df_full.loc[df_full["Genus_Species"] == gs]
+# scans (≈69k string compares each) with a dict hit + positional read.
+# Duplicate keys keep the FIRST row, matching the old `.iloc[0]`.
+import sys
+import numpy as np
+import pandas as pd
+
+
+class SpeciesIndex:
+    def __init__(self, df: pd.DataFrame, key: str = "Genus_Species"):
+        self.df = df
+        keys = df[key].to_numpy(dtype=object)
+        pos = {}
+        for i, k in enumerate(keys):
+            if isinstance(k, str):
+                pos.setdefault(sys.intern(k), i)
+        self._pos = pos
+
+        # column arrays pulled once so accessors never touch pandas
+        self._order  = df["order"].to_numpy(dtype=object)  if "order"  in df else None
+        self._family = df["family"].to_numpy(dtype=object) if "family" in df else None
+        self._length = (pd.to_numeric(df["Length_cm"], errors="coerce").to_numpy(dtype=float)
+                        if "Length_cm" in df else None)
+
+    # ---- basics -------------------------------------------------
+    def __len__(self):
+        return len(self._pos)
+
+    def __contains__(self, gs) -> bool:
+        return gs in self._pos
+
+    def pos(self, gs) -> int | None:
+        """Row position of *gs* in the frame, or None if unknown."""
+        return self._pos.get(gs) if isinstance(gs, str) else None
+
+    def positions(self, names) -> np.ndarray:
+        """Row positions for every known name in *names* (unknown ones are dropped)."""
+        get = self._pos.get
+        return np.fromiter((p for p in map(get, names) if p is not None), dtype=np.int64)
+
+    # ---- typed accessors ---------------------------------------
+    def row(self, gs) -> pd.Series | None:
+        p = self.pos(gs)
+        return None if p is None else self.df.iloc[p]
+
+    def order(self, gs):
+        p = self.pos(gs)
+        return None if p is None or self._order is None else self._order[p]
+
+    def family(self, gs):
+        p = self.pos(gs)
+        return None if p is None or self._family is None else self._family[p]
+
+    def length_cm(self, gs) -> float:
+        """Length in cm, NaN when unknown or missing."""
+        p = self.pos(gs)
+        return float("nan") if p is None or self._length is None else float(self._length[p])
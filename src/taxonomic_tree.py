@@ -20,17 +20,24 @@ def _safe_sample(df, n):
         return df
     return df.sample(n=n, random_state=None)
 
-def build_taxonomy_elements(df: pd.DataFrame, target_species: str):
+def build_taxonomy_elements(df: pd.DataFrame, target_species: str, index=None):
     """
     Build Cytoscape elements for a single species tree view.
+    `index` (optional) is a SpeciesIndex built on *df*; when given, the
+    target row is fetched by position instead of scanning Genus_Species.
     Returns:
         elements :  list[dict]  (Cytoscape nodes + edges)
         root_id  :  str | None  (highest non-missing rank)
     """
-    row = df.loc[df["Genus_Species"] == target_species]
-    if row.empty:
-        return [], None
-    row = row.iloc[0]
+    if index is not None:
+        row = index.row(target_species)
+        if row is None:
+            return [], None
+    else:
+        row = df.loc[df["Genus_Species"] == target_species]
+        if row.empty:
+            return [], None
+        row = row.iloc[0]
 
     RANKS   = ["kingdom", "phylum", "class", "order", "family", "genus"]
     MISSING = "?"
@@ -0,0 +1,147 @@
+# src/taxonomy_index.py
+# ------------------------------------------------------------
+# Hierarchical index behind the order → family → genus → species
+# dropdown cascade.
+#
+# Rows are permuted once so that every taxon is a contiguous range:
+#
+#     perm sorted by (order, family, genus)      – GBIF columns
+#     perm_sp sorted by (Genus, Species)         – FishBase names used
+#                                                  by the species dropdown
+#
+# A filter combination (wiki / popular / favourites) becomes a bitmap
+# over those permutations; its prefix sum gives the member count of
+# every node with two lookups, so "which orders / families / genera are
+# non-empty" is a vectorised subtraction instead of a filter + unique.
+# Finished option lists are memoised per (filter, level, parent).
+from functools import lru_cache
+
+import numpy as np
+
+
+def _frozen(a: np.ndarray) -> np.ndarray:
+    a.flags.writeable = False
+    return a
+
+
+class _Level:
+    """Nodes of one rank: contiguous [start, end) ranges inside a permutation."""
+
+    def __init__(self, sorted_codes: list):
+        # sorted_codes: code arrays (parent ranks first), already permuted
+        n = len(sorted_codes[0])
+        change = np.zeros(n, dtype=bool)
+        if n:
+            change[0] = True
+            for c in sorted_codes:
+                change[1:] |= c[1:] != c[:-1]
+        self.start = _frozen(np.flatnonzero(change).astype(np.int32))
+        self.end   = _frozen(np.append(self.start[1:], n).astype(np.int32))
+        # code of this rank and of each ancestor, per node
+        self.codes = [_frozen(c[self.start]) for c in sorted_codes]
+
+    def counts(self, prefix: np.ndarray) -> np.ndarray:
+        return prefix[self.end] - prefix[self.start]
+
+
+class TaxonomyIndex:
+    RANKS = ("order", "family", "genus")
+
+    def __init__(self, filter_index, labeler=None, maxsize: int = 32):
+        self._filters = filter_index
+        self._label = labeler or (lambda name: name)
+
+        codes = [filter_index.codes(r) for r in self.RANKS]
+        self._uniques = {r: u for r, (_, u) in zip(self.RANKS, codes)}
+
+        # GBIF hierarchy: NaNs (-1) sort first inside their parent
+        o, f, g = (c for c, _ in codes)
+        self.perm = _frozen(np.lexsort((g, f, o)).astype(np.int32))
+        so, sf, sg = o[self.perm], f[self.perm], g[self.perm]
+        self.levels = {
+            "order":  _Level([so]),
+            "family": _Level([so, sf]),
+            "genus":  _Level([so, sf, sg]),
+        }
+
+        # FishBase Genus → Species grouping for the species dropdown
+        G, self._G = filter_index.codes("Genus")
+        S, self._S = filter_index.codes("Species")
+        self.perm_sp = _frozen(np.lexsort((S, G)).astype(np.int32))
+        self._sp_genus   = _frozen(G[self.perm_sp])
+        self._sp_species = _frozen(S[self.perm_sp])
+
+        self.prefixes = lru_cache(maxsize=maxsize)(self._prefixes)
+        self.options_for = lru_cache(maxsize=4 * maxsize)(self._options_for)
+        self.species_for = lru_cache(maxsize=4 * maxsize)(self._species_for)
+
+    def warm(self):
+        """Precompute the unfiltered-by-parent option lists for every wiki/pop combo."""
+        for wiki_on in (False, True):
+            for pop_on in (False, True):
+                key = (wiki_on, pop_on, None)
+                for rank in self.RANKS:
+                    self.options(rank, key)
+
+    # ---- per-filter bitmaps → prefix sums --------------------------------
+    def _prefixes(self, key):
+        pos = self._filters.positions_for(*key)
+        mask = np.zeros(self._filters.n, dtype=bool)
+        mask[pos] = True
+        tax = np.concatenate(([0], np.cumsum(mask[self.perm], dtype=np.int32)))
+        sp_mask = mask[self.perm_sp]
+        return _frozen(tax), _frozen(sp_mask)
+
+    def counts(self, rank, key) -> dict:
+        """{taxon: member count} for *rank* under filter *key* (non-empty only)."""
+        lvl = self.levels[rank]
+        c = lvl.counts(self.prefixes(key)[0])
+        names = self._uniques[rank]
+        out = {}
+        for code, k in zip(lvl.codes[-1], c):
+            if k and code >= 0:
+                out[names[code]] = out.get(names[code], 0) + int(k)
+        return out
+
+    # ---- dropdown options -------------------------------------------------
+    def options(self, rank, key, order_val=None, family_val=None):
+        """([{"label", "value"}], frozenset(values)) – sorted, memoised."""
+        return self.options_for(rank, key, order_val, family_val)
+
+    def _code(self, rank, value):
+        u = self._uniques[rank]
+        i = int(np.searchsorted(u, value)) if isinstance(value, str) else -1
+        return i if 0 <= i < len(u) and u[i] == value else None
+
+    def _options_for(self, rank, key, order_val, family_val):
+        lvl = self.levels[rank]
+        keep = lvl.counts(self.prefixes(key)[0]) > 0
+        keep &= lvl.codes[-1] >= 0
+        # parent restrictions (ancestor codes are stored first)
+        for depth, (parent, val) in enumerate((("order", order_val), ("family", family_val))):
+            if not val or depth >= len(lvl.codes) - 1:
+                continue
+            code = self._code(parent, val)
+            if code is None:
+                return [], frozenset()
+            keep &= lvl.codes[depth] == code
+
+        names = self._uniques[rank][np.unique(lvl.codes[-1][keep])].tolist()
+        label = self._label if rank != "genus" else (lambda n: n)
+        opts = [{"label": label(n), "value": n} for n in names]
+        return opts, frozenset(names)
+
+    def species(self, key, genus):
+        """Sorted FishBase species epithets of *genus* under filter *key*."""
+        return self.species_for(key, genus)
+
+    def _species_for(self, key, genus):
+        g = int(np.searchsorted(self._G, genus)) if isinstance(genus, str) else -1
+        if not (0 <= g < len(self._G)) or self._G[g] != genus:
+            return []
+        lo = int(np.searchsorted(self._sp_genus, g, side="left"))
+        hi = int(np.searchsorted(self._sp_genus, g, side="right"))
+        sp_mask = self.prefixes(key)[1]
+        codes = self._sp_species[lo:hi][sp_mask[lo:hi]]
+        codes = np.unique(codes[codes >= 0])
+        return self._S[codes].tolist()
@@ -1,13 +1,22 @@
 import os, hashlib, json, time
 
+from src import meta_store
+
 TEXT_CACHE_DIR = "./text_cache"
 MAX_TEXT_CACHE_SIZE_MB = 500
 os.makedirs(TEXT_CACHE_DIR, exist_ok=True)
 
+def _stem(key: str) -> str:
+    return hashlib.md5(key.encode()).hexdigest()
+
 def key_to_filename(key: str) -> str:
-    return os.path.join(TEXT_CACHE_DIR, hashlib.md5(key.encode()).hexdigest() + ".json")
+    return os.path.join(TEXT_CACHE_DIR, _stem(key) + ".json")
 
 def load_cached_blurb(key: str) -> dict | None:
+    data = meta_store.get(meta_store.BLURB, _stem(key))
+    if data is not None:
+        return data
+    # not in the store (or no store): the per-file layout
     path = key_to_filename(key)
     if os.path.exists(path):
         with open(path, "r", encoding="utf-8") as f:
@@ -15,6 +24,8 @@ def load_cached_blurb(key: str) -> dict | None:
     return None
 
 def save_cached_blurb(key: str, data: dict):
+    if meta_store.put(meta_store.BLURB, _stem(key), data):
+        return
     path = key_to_filename(key)
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+warm_cache.py
+-------------
+Bulk-fills image_cache/ and text_cache/ before a deploy, so real users
+don't pay the cold path (MediaWiki lookups, download, rembg) on first view.
+
+Per chunk of species it issues *batched* MediaWiki queries for images
+instead of get_commons_thumb's one-species-at-a-time calls:
+
+    pageimages        ≤ 50 titles / request   (images list as fallback)
+    imageinfo         ≤ 50 File: titles / request (Commons)
+
+then downloads the thumbnails with bounded concurrency (src/http_client)
+under a global requests/sec limit.  Blurbs go through get_blurb's own
+fetch (wiki.fetch_summary: REST page summary, same sentence split, same
+direct → equivalent title fallback), concurrently under the same limit,
+so a warmed blurb is exactly what a cold get_blurb would have cached.
+Entries are written with the app's own helpers and keys, so get_blurb /
+get_commons_thumb hit them directly:
+
+    text_cache   save_cached_blurb(url_to_stem("genus_species_<sentences>"))
+    image_cache  "<title>_<width>_raw"  always
+                 "<title>_<width>"      background removed (--bg; rembg.remove
+                                        like the app, or batched via
+                                        src/rembg_batch with --bg-batch;
+                                        skipped for the transparency blacklist)
+
+Progress is kept in cache/warm_progress.json; re-runs skip species that
+are done or have nothing on Wikipedia (--retry-missing re-checks those)
+and retry chunks that failed on the network.  Misses are recorded in
+src/negative_cache with the reason the app would have recorded, and only
+after every title the app would try has failed.
+
+Run:  python -m src.warm_cache --species popular
+      python -m src.warm_cache --species popular,favs --bg on
+      python -m src.warm_cache --species wiki --rate 5 --workers 4 --limit 2000
+      python -m src.warm_cache --file species.txt      # one "Genus species" per line
+"""
+
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
+
+import pandas as pd
+from tqdm import tqdm
+
+from src import http_client, negative_cache
+from src.image_cache import (
+    url_to_stem, is_cached, save_image_to_cache, save_metadata_to_cache, enforce_cache_limit,
+)
+from src.text_cache import load_cached_blurb, save_cached_blurb
+from src.wiki import HEADERS, WIKI_NAME_EQUIVALENTS, ENABLE_BG_REMOVAL, clean_html, fetch_summary
+
+WIKI_API    = "https://en.wikipedia.org/w/api.php"
+COMMONS_API = "https://commons.wikimedia.org/w/api.php"
+
+PROGRESS_PATH = "cache/warm_progress.json"
+POPULAR_CSV   = "data/processed/popular_species.csv"
+FAV_STATE     = "data/processed/fav_state.csv"
+TRANSP_CSV    = "data/processed/transparency_blacklist.csv"
+
+
+# --------------------------------------------------------------------------- #
+# Species lists
+# --------------------------------------------------------------------------- #
+def _from_csv(path):
+    df = pd.read_csv(path)
+    return (df["Genus"] + " " + df["Species"]).dropna().tolist()
+
+
+def species_list(sources, file=None):
+    names = []
+    if file:
+        with open(file, encoding="utf-8") as fh:
+            names += [ln.strip() for ln in fh if ln.strip() and not ln.startswith("#")]
+    for src in sources:
+        if src == "popular":
+            names += _from_csv(POPULAR_CSV)
+        elif src == "favs":
+            from src.fav_utils import fav_store
+            if fav_store.available():
+                names += fav_store.favourited_species()
+            elif os.path.exists(FAV_STATE):
+                st = pd.read_csv(FAV_STATE)
+                names += st.loc[st["last_state"] == 1, "species"].dropna().unique().tolist()
+        elif src in ("wiki", "all"):
+            from src.process_data import load_name_table
+            df = load_name_table()
+            if src == "wiki":
+                df = df[df["has_wiki_page"].astype(object).eq(True)]
+            names += df["Genus_Species"].dropna().tolist()
+        else:
+            raise SystemExit(f"❌ unknown species source: {src}")
+    seen = set()
+    return [n for n in names
+            if isinstance(n, str) and " " in n and not (n in seen or seen.add(n))]
+
+
+# --------------------------------------------------------------------------- #
+# HTTP: global rate limit + batched MediaWiki queries
+# --------------------------------------------------------------------------- #
+class RateLimit:
+    """At most *rate* requests per second across all threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _query(api, titles, limiter, **params):
+    """
+    One batched action=query (following `continue`).
+    Returns ({final title: page dict}, {requested title: final title}).
+    """
+    pages, renames, cont = {}, {}, {}
+    base = dict(action="query", format="json", titles="|".join(titles), **params)
+    while True:
+        limiter.wait()
+        with http_client.get(api, params={**base, **cont}, headers=HEADERS, timeout=20) as r:
+            r.raise_for_status()
+            data = r.json()
+        q = data.get("query", {})
+        for page in q.get("pages", {}).values():
+            merged = pages.setdefault(page["title"], {})
+            for k, v in page.items():
+                if isinstance(v, list):
+                    merged.setdefault(k, []).extend(v)
+                else:
+                    merged.setdefault(k, v)
+        for step in ("normalized", "redirects"):
+            for m in q.get(step, []):
+                renames[m["from"]] = m["to"]
+        if "continue" not in data:
+            break
+        cont = data["continue"]
+
+    resolved = {}
+    for t in titles:
+        final, hops = t, 0
+        while final in renames and hops < 5:
+            final, hops = renames[final], hops + 1
+        resolved[t] = final
+    return pages, resolved
+
+
+# --------------------------------------------------------------------------- #
+# Blurbs
+# --------------------------------------------------------------------------- #
+def _blurb_key(gs, sentences):
+    genus, species = gs.split(" ", 1)
+    return url_to_stem(f"{genus.strip().lower()}_{species.strip().lower()}_{sentences}")
+
+
+def _warm_blurb(gs, sentences, limiter):
+    """get_blurb's fetch for one species: True (saved) or the last miss reason."""
+    genus, species = gs.split(" ", 1)
+    titles = [f"{genus}_{species}".replace(" ", "_")]
+    if gs in WIKI_NAME_EQUIVALENTS:
+        titles.append(WIKI_NAME_EQUIVALENTS[gs].replace(" ", "_"))
+    reason = negative_cache.NO_PAGE
+    for title in titles:
+        limiter.wait()
+        summary, page_url, reason = fetch_summary(title, sentences)
+        if summary:
+            negative_cache.clear("blurb", gs)
+            save_cached_blurb(_blurb_key(gs, sentences),
+                              {"summary": summary, "page_url": page_url})
+            return True
+    return reason
+
+
+def warm_blurbs(names, sentences, limiter, pool):
+    """{gs: True (saved) | negative_cache reason (every title failed)}."""
+    jobs = {gs: pool.submit(_warm_blurb, gs, sentences, limiter) for gs in names}
+    return {gs: fut.result() for gs, fut in jobs.items()}
+
+
+# --------------------------------------------------------------------------- #
+# Images
+# --------------------------------------------------------------------------- #
+def _image_title(gs):
+    return WIKI_NAME_EQUIVALENTS.get(gs, gs)
+
+
+def _image_cached(gs, width, processed=False):
+    """Raw variant cached (and the background-removed one too, if *processed*)."""
+    title = _image_title(gs)
+    keys = [f"{title}_{width}_raw"] + ([f"{title}_{width}"] if processed else [])
+    return all(is_cached(url_to_stem(k)) for k in keys)
+
+
+def _lead_images(names, width, limiter):
+    """
+    ({gs: (file_name, thumb_url)}, {gs: miss reason}) via pageimages,
+    images-list fallback – get_commons_thumb's single title (the wiki
+    equivalent when there is one) and its NO_PAGE / NO_IMAGE distinction.
+    """
+    titles = [_image_title(gs) for gs in names]
+    pages, resolved = _query(WIKI_API, titles, limiter, prop="pageimages",
+                             piprop="thumbnail|name", pithumbsize=width,
+                             pilimit="max", redirects=1)
+    found, missing, misses = {}, [], {}
+    for gs, t in zip(names, titles):
+        page = pages.get(resolved[t], {})
+        thumb = page.get("thumbnail", {}).get("source")
+        if thumb and page.get("pageimage"):
+            found[gs] = (page["pageimage"], thumb)
+        elif "missing" in page:
+            misses[gs] = negative_cache.NO_PAGE
+        else:
+            missing.append(gs)
+
+    if missing:
+        titles = [_image_title(gs) for gs in missing]
+        pages, resolved = _query(WIKI_API, titles, limiter, prop="images",
+                                 imlimit="max", redirects=1)
+        for gs, t in zip(missing, titles):
+            files = [img["title"] for img in pages.get(resolved[t], {}).get("images", [])]
+            name = next((f.split("File:")[-1] for f in files
+                         if f.lower().endswith((".jpg", ".jpeg", ".png"))), None)
+            if name:
+                found[gs] = (name, "https://commons.wikimedia.org/w/index.php"
+                                   f"?title=Special:FilePath/{quote_plus(name)}&width={width}")
+            else:
+                misses[gs] = negative_cache.NO_IMAGE
+    return found, misses
+
+
+def _image_meta(file_names, width, limiter):
+    """{file name: meta dict in the image_cache JSON format}."""
+    req = [f"File:{n}" for n in file_names]
+    pages, resolved = _query(COMMONS_API, req, limiter, prop="imageinfo",
+                             iiprop="extmetadata|url|timestamp", iiurlwidth=width)
+    today = datetime.date.today().isoformat()
+    out = {}
+    for name, t in zip(file_names, req):
+        info = (pages.get(resolved[t], {}).get("imageinfo") or [None])[0]
+        if not info:
+            continue
+        meta = info.get("extmetadata", {})
+        raw_author = (meta.get("Artist", {}).get("value") or
+                      meta.get("Credit", {}).get("value") or
+                      meta.get("Attribution", {}).get("value") or "")
+        out[name] = {
+            "author": clean_html(raw_author) or "Unknown author",
+            "licence": clean_html(meta.get("LicenseShortName", {}).get("value", "")),
+            "licence_url": meta.get("LicenseUrl", {}).get("value", ""),
+            "upload_date": info.get("timestamp", "")[:10],
+            "retrieval_date": today,
+        }
+    return out
+
+
+def _download(url, limiter):
+    limiter.wait()
+    with http_client.get(url, headers=HEADERS, timeout=20) as r:
+        r.raise_for_status()
+        return r.content
+
+
+def warm_images(names, width, limiter, pool, bg_remover=None, skip_bg=frozenset()):
+    """{gs: True (saved) | negative_cache reason (no usable image) | None (download failed)}."""
+    leads, misses = _lead_images(names, width, limiter)
+    result = {gs: misses.get(gs, negative_cache.NO_IMAGE) for gs in names}
+    metas = {}
+    files = sorted({f for f, _ in leads.values()})
+    for i in range(0, len(files), 50):
+        metas.update(_image_meta(files[i:i + 50], width, limiter))
+
+    jobs = {gs: pool.submit(_download, url, limiter)
+            for gs, (f, url) in leads.items() if f in metas}
+    raw = {}
+    for gs, fut in jobs.items():
+        try:
+            raw[gs] = fut.result()
+        except Exception as e:
+            result[gs] = None
+            print(f"⚠️  download failed for {gs}: {e}")
+
+    for gs, img in raw.items():
+        title = _image_title(gs)
+        meta = metas[leads[gs][0]]
+        stem = url_to_stem(f"{title}_{width}_raw")
+        save_image_to_cache(stem, img)
+        save_metadata_to_cache(stem, meta, "raw")  # JSON last = entry complete
+        negative_cache.clear("image", f"{title}_{width}")
+        result[gs] = True
+
+    if bg_remover is not None:
+        todo = [gs for gs in raw if gs not in skip_bg]
+        for gs, cut in zip(todo, bg_remover.remove([raw[gs] for gs in todo])):
+            stem = url_to_stem(f"{_image_title(gs)}_{width}")
+            save_image_to_cache(stem, cut)
+            save_metadata_to_cache(stem, metas[leads[gs][0]], "processed")
+    enforce_cache_limit()
+    return result
+
+
+# --------------------------------------------------------------------------- #
+# Progress
+# --------------------------------------------------------------------------- #
+def _load_progress(path):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_progress(path, progress):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(progress, fh)
+    os.replace(tmp, path)
+
+
+# --------------------------------------------------------------------------- #
+# Main
+# --------------------------------------------------------------------------- #
+def main(sources, file=None, width=640, sentences=4, rate=5.0, workers=4,
+         chunk=50, limit=None, images=True, blurbs=True, bg="auto", bg_batch=False,
+         retry_missing=False, progress_path=PROGRESS_PATH):
+    names = species_list(sources, file)
+    progress = _load_progress(progress_path)
+    skip = {"done"} if retry_missing else {"done", "missing"}
+    todo = [gs for gs in names if progress.get(gs) not in skip]
+    print(f"📑 {len(names):,} species listed, {len(names) - len(todo):,} already done "
+          f"per {progress_path}" + (f"; warming the next {limit:,}" if limit else ""))
+    if limit:
+        todo = todo[:limit]
+
+    limiter = RateLimit(rate)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warm")
+
+    bg_remover, skip_bg = None, frozenset()
+    if images and (bg == "on" or (bg == "auto" and ENABLE_BG_REMOVAL)):
+        from src.rembg_batch import get_remover
+        bg_remover = get_remover(batched=bg_batch).warm()
+        if os.path.exists(TRANSP_CSV):
+            skip_bg = frozenset(_from_csv(TRANSP_CSV))
+        print(f"🪄 background removal on ({bg_remover.model_name}, "
+              + (f"batch {bg_remover.batch_size})" if bg_batch else "rembg.remove)"))
+
+    counts = {"done": 0, "missing": 0, "failed": 0}
+    start = time.time()
+    for i in tqdm(range(0, len(todo), chunk), desc="Warming caches", unit="chunk"):
+        batch = todo[i:i + chunk]
+        status = {gs: "done" for gs in batch}
+        try:
+            if blurbs:
+                need = [gs for gs in batch if not load_cached_blurb(_blurb_key(gs, sentences))]
+                for gs, ok in warm_blurbs(need, sentences, limiter, pool).items():
+                    if ok is True:
+                        continue
+                    if ok == negative_cache.FETCH_ERROR:
+                        status[gs] = "failed"           # retried next run, nothing persisted
+                    else:
+                        status[gs] = "missing"
+                        negative_cache.record("blurb", gs, ok)
+            if images:
+                need = [gs for gs in batch
+                        if not _image_cached(gs, width, bg_remover is not None and gs not in skip_bg)]
+                for gs, ok in warm_images(need, width, limiter, pool, bg_remover, skip_bg).items():
+                    if ok is None:
+                        status[gs] = "failed"
+                    elif ok is not True:
+                        negative_cache.record("image", f"{_image_title(gs)}_{width}", ok)
+                        if status[gs] == "done":
+                            status[gs] = "missing"
+        except Exception as e:
+            print(f"⚠️  chunk {i // chunk} failed: {e}")
+            status = {gs: "failed" for gs in batch}
+
+        progress.update(status)
+        for s in status.values():
+            counts[s] += 1
+        _save_progress(progress_path, progress)
+
+    pool.shutdown()
+    print(f"✅ Warmed {counts['done']:,} species in {time.time() - start:.1f} s "
+          f"({counts['missing']:,} without article/image, {counts['failed']:,} failed) "
+          f"→ {progress_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk-fill image_cache/ and text_cache/ with batched MediaWiki queries"
+    )
+    parser.add_argument("--species", default="popular",
+                        help="Comma-separated sources: popular, favs, wiki, all")
+    parser.add_argument("--file", default=None,
+                        help="Extra species list, one 'Genus species' per line")
+    parser.add_argument("--width", type=int, default=640, help="Thumbnail width (px)")
+    parser.add_argument("--sentences", type=int, default=4,
+                        help="Blurb length, as requested by update_image")
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="Max requests/second across API calls and downloads")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads")
+    parser.add_argument("--chunk", type=int, default=50,
+                        help="Species per batch (≤ 50: MediaWiki titles limit)")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Stop after this many species")
+    parser.add_argument("--bg", choices=("auto", "on", "off"), default="auto",
+                        help="Also write background-removed variants (auto = ENABLE_BG_REMOVAL)")
+    parser.add_argument("--bg-batch", action="store_true",
+                        help="Batched u2net inference (src/rembg_batch) instead of rembg.remove; "
+                             "not yet checked against rembg.remove output")
+    parser.add_argument("--no-images", action="store_true", help="Blurbs only")
+    parser.add_argument("--no-blurbs", action="store_true", help="Images only")
+    parser.add_argument("--retry-missing", action="store_true",
+                        help="Re-check species recorded without article / image")
+    parser.add_argument("--progress", default=PROGRESS_PATH,
+                        help="Resume file (default: cache/warm_progress.json)")
+    args = parser.parse_args()
+
+    main([s.strip() for s in args.species.split(",") if s.strip()], file=args.file,
+         width=args.width, sentences=args.sentences, rate=args.rate,
+         workers=args.workers, chunk=min(args.chunk, 50), limit=args.limit,
+         images=not args.no_images, blurbs=not args.no_blurbs,
+         bg=args.bg, bg_batch=args.bg_batch,
+         retry_missing=args.retry_missing, progress_path=args.progress)
@@ -25,6 +25,11 @@ import gc
 
 import threading
 
+from src import http_client
+from src.single_flight import single_flight
+from src import bg_jobs
+from src import negative_cache
+
 
 # ---- Background-removal feature flag (env-driven) ----
 ENABLE_BG_REMOVAL = os.getenv("ENABLE_BG_REMOVAL", "1") == "1"
@@ -94,14 +99,8 @@ def _get_rembg_session():
                 _REMBG_SESSION = _mem_saver_session(os.getenv("REMBG_MODEL", "u2netp"))
     return _REMBG_SESSION
     
-def _maybe_remove_bg(img_bytes: bytes) -> bytes:
-    if not ENABLE_BG_REMOVAL:
-        return img_bytes
-
-    # Ensure rembg + onnx + PIL are loaded
-    _lazy_load_rembg_stack()
-
-    # Pre-resize BEFORE model to cap memory
+def _shrink_for_rembg(img_bytes: bytes) -> bytes:
+    """RGBA PNG capped at BG_MAX_SIDE – pre-resize BEFORE the model to cap memory."""
     try:
         with _Image.open(io.BytesIO(img_bytes)) as im:
             im = im.convert("RGBA")
@@ -113,10 +112,31 @@ def _maybe_remove_bg(img_bytes: bytes) -> bytes:
                 im = im.resize(new_size, _Image.LANCZOS)
             buf = io.BytesIO()
             im.save(buf, format="PNG", optimize=True)
-            img_bytes = buf.getvalue()
+            return buf.getvalue()
     except Exception:
         # If PIL not present or anything fails, skip pre-resize and continue
-        pass
+        return img_bytes
+
+
+def warm_rembg():
+    """Load the model and run one tiny image so the first real request skips the cold start."""
+    if not ENABLE_BG_REMOVAL:
+        return
+    _lazy_load_rembg_stack()
+    buf = io.BytesIO()
+    _Image.new("RGB", (64, 64), "white").save(buf, format="PNG")
+    with _REMBG_SEM:
+        _rembg_remove(buf.getvalue(), session=_get_rembg_session())
+
+
+def _maybe_remove_bg(img_bytes: bytes) -> bytes:
+    if not ENABLE_BG_REMOVAL:
+        return img_bytes
+
+    # Ensure rembg + onnx + PIL are loaded
+    _lazy_load_rembg_stack()
+
+    img_bytes = _shrink_for_rembg(img_bytes)
 
     try:
         with _REMBG_SEM:
@@ -158,7 +178,26 @@ WIKI_NAME_EQUIVALENTS = {
 }
 
 
+def fetch_summary(title: str, sentences: int):
+    """(summary, page_url, None) from the REST page summary of *title*, or
+    (None, None, negative_cache reason).  Shared with src/warm_cache."""
+    url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{quote_plus(title)}"
+    try:
+        with http_client.get(url, headers=HEADERS, timeout=10) as r:
+            if r.status_code == 404:
+                return None, None, negative_cache.NO_PAGE
+            r.raise_for_status()
+            data = r.json()
+        summary = html.unescape(data.get("extract", ""))
+        summary = ". ".join(summary.split(". ")[:sentences]).strip() + "."
+        page_url = data.get("content_urls", {}).get("desktop", {}).get("page")
+        return summary, page_url, None
+    except Exception as e:
+        return None, None, negative_cache.FETCH_ERROR
+
+
 @lru_cache(maxsize=512)
+@single_flight          # concurrent misses for one species share a single fetch
 def get_blurb(genus: str, species: str, sentences: int = 2) -> tuple[str | None, str | None]:
     key_string = f"{genus.strip().lower()}_{species.strip().lower()}_{sentences}"
     stem = url_to_stem(key_string)
@@ -167,28 +206,20 @@ def get_blurb(genus: str, species: str, sentences: int = 2) -> tuple[str | None,
     if cached:
         return cached.get("summary"), cached.get("page_url")
 
-    def try_fetch(title: str):
-        url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{quote_plus(title)}"
-        try:
-            with requests.get(url, headers=HEADERS, timeout=10) as r:
-                r.raise_for_status()
-                data = r.json()
-            summary = html.unescape(data.get("extract", ""))
-            summary = ". ".join(summary.split(". ")[:sentences]).strip() + "."
-            page_url = data.get("content_urls", {}).get("desktop", {}).get("page")
-            return summary, page_url
-        except Exception as e:
-            return None, None
+    # known miss (persisted across restarts) → skip the network entirely
+    neg_key = f"{genus.strip()} {species.strip()}"
+    if negative_cache.check("blurb", neg_key):
+        return None, None
 
     # Try the direct title first
     main_title = f"{genus}_{species}".replace(" ", "_")
-    summary, page_url = try_fetch(main_title)
+    summary, page_url, reason = fetch_summary(main_title, sentences)
 
     if not summary:
         alt = WIKI_NAME_EQUIVALENTS.get(f"{genus} {species}")
         if alt:
             print(f"[blurb] Fallback to Wikipedia title for {genus} {species} → {alt}")
-            summary, page_url = try_fetch(alt.replace(" ", "_"))
+            summary, page_url, reason = fetch_summary(alt.replace(" ", "_"), sentences)
 
     if summary:
         if CACHE_WRITE:
@@ -198,7 +229,8 @@ def get_blurb(genus: str, species: str, sentences: int = 2) -> tuple[str | None,
             # read-only mode: serve result but don't persist it
             pass
     else:
-        print(f"[blurb] Failed to fetch summary for {genus} {species}")
+        print(f"[blurb] Failed to fetch summary for {genus} {species} ({reason})")
+        negative_cache.record("blurb", neg_key, reason)
 
 
     return summary, page_url
@@ -230,6 +262,7 @@ def get_blurb(genus: str, species: str, sentences: int = 2) -> tuple[str | None,
 
 
 @lru_cache(maxsize=128)
+@single_flight          # …and a single download + rembg run
 def get_commons_thumb(genus: str,
                       species: str,
                       width: int = 640,
@@ -279,54 +312,66 @@ def get_commons_thumb(genus: str,
             cached_meta.get("retrieval_date"),
         )
 
+    # Async bg removal: raw already cached → (re)queue processing and point at the
+    # processed name; /cached-images serves the raw file until it exists
+    if effective_remove and bg_jobs.ENABLED:
+        raw_path, raw_meta = load_cached_image_and_meta(f"{title_plain}_{width}_raw")
+        if raw_meta and os.path.exists(raw_path):
+            bg_jobs.enqueue(raw_path, stem, raw_meta)
+            return (
+                f"/cached-images/{stem}.webp",
+                raw_meta.get("author"),
+                raw_meta.get("licence"),
+                raw_meta.get("licence_url"),
+                raw_meta.get("upload_date"),
+                raw_meta.get("retrieval_date"),
+            )
+
+    # Known miss (persisted, shared by all workers) → no network at all
+    neg_key = f"{title_plain}_{width}"
+    if negative_cache.check("image", neg_key):
+        return (None,) * 6
+
+    def _miss(reason, detail=""):
+        negative_cache.record("image", neg_key, reason, detail)
+        return (None,) * 6
+
 
-    # ---- Try PageImages for lead image + thumbnail URL ----
+    # ---- Lead image (PageImages) + image list fallback: one query ----
     try:
-        with requests.get(
+        with http_client.get(
             "https://en.wikipedia.org/w/api.php",
             params=dict(action="query", titles=title_plain,
-                        prop="pageimages", piprop="thumbnail|name",
-                        pithumbsize=width, redirects=1, format="json"),
+                        prop="pageimages|images", piprop="thumbnail|name",
+                        pithumbsize=width, imlimit=50, redirects=1, format="json"),
             headers=HEADERS, timeout=10
         ) as r:
             pages = r.json().get("query", {}).get("pages", {})
             page = next(iter(pages.values()), {})
             file_name = page.get("pageimage")
             raw_thumb_url = page.get("thumbnail", {}).get("source")
+            files = [img["title"] for p in pages.values() for img in p.get("images", [])]
     except Exception as e:
         print(f"[Commons] Failed to get PageImages: {e}")
-        return (None,) * 6
+        return _miss(negative_cache.FETCH_ERROR, str(e))
 
-    # ---- Fallback: list images if no lead thumbnail ----
+    # ---- Fallback: first listed photo if no lead thumbnail ----
     if not raw_thumb_url:
-        try:
-            with requests.get(
-                "https://en.wikipedia.org/w/api.php",
-                params=dict(action="query", titles=title_plain,
-                            prop="images", imlimit=50, redirects=1, format="json"),
-                headers=HEADERS, timeout=10
-            ) as r2:
-                pages2 = r2.json().get("query", {}).get("pages", {})
-                files = [img["title"] for p in pages2.values() for img in p.get("images", [])]
-
-            file_name = next(
-                (f.split("File:")[-1] for f in files if f.lower().endswith((".jpg", ".jpeg", ".png"))),
-                None
-            )
-            if not file_name:
-                return (None,) * 6
+        file_name = next(
+            (f.split("File:")[-1] for f in files if f.lower().endswith((".jpg", ".jpeg", ".png"))),
+            None
+        )
+        if not file_name:
+            return _miss(negative_cache.NO_PAGE if "missing" in page else negative_cache.NO_IMAGE)
 
-            raw_thumb_url = (
-                f"https://commons.wikimedia.org/w/index.php"
-                f"?title=Special:FilePath/{quote_plus(file_name)}&width={width}"
-            )
-        except Exception as e:
-            print(f"[Commons fallback] Failed to list images: {e}")
-            return (None,) * 6
+        raw_thumb_url = (
+            f"https://commons.wikimedia.org/w/index.php"
+            f"?title=Special:FilePath/{quote_plus(file_name)}&width={width}"
+        )
 
-    # ---- Get image metadata (author, license, upload date) ----
-    try:
-        with requests.get(
+    # ---- Metadata and thumbnail are independent → fetch both at once ----
+    def _fetch_meta():
+        with http_client.get(
             "https://commons.wikimedia.org/w/api.php",
             params=dict(action="query", titles=f"File:{file_name}",
                         prop="imageinfo", iiprop="extmetadata|url|timestamp",
@@ -334,10 +379,22 @@ def get_commons_thumb(genus: str,
             headers=HEADERS, timeout=10
         ) as r3:
             page = next(iter(r3.json()["query"]["pages"].values()))
-            if "imageinfo" not in page:
-                return (None,) * 6
-            info = page["imageinfo"][0]
-            meta = info["extmetadata"]
+            return page["imageinfo"][0] if "imageinfo" in page else None
+
+    def _fetch_thumb():
+        with http_client.get(raw_thumb_url, headers=HEADERS, timeout=10) as response:
+            response.raise_for_status()
+            return response.content
+
+    thumb_future = http_client.submit(_fetch_thumb)
+
+    # ---- Get image metadata (author, license, upload date) ----
+    try:
+        info = _fetch_meta()
+        if info is None:
+            thumb_future.cancel()
+            return _miss(negative_cache.NO_IMAGE, f"no imageinfo for {file_name}")
+        meta = info["extmetadata"]
 
         raw_author = (meta.get("Artist", {}).get("value") or
                       meta.get("Credit", {}).get("value") or
@@ -349,16 +406,15 @@ def get_commons_thumb(genus: str,
         retrieval_date = datetime.date.today().isoformat()
     except Exception as e:
         print(f"[Commons metadata] Failed: {e}")
-        return (None,) * 6
+        thumb_future.cancel()
+        return _miss(negative_cache.FETCH_ERROR, str(e))
 
-    # ---- Download -> (optional) pre-resize -> (optional) remove-bg ----
+    # ---- Download (already in flight) -> (optional) pre-resize -> (optional) remove-bg ----
     try:
         import io
         from PIL import Image
 
-        with requests.get(raw_thumb_url, headers=HEADERS, timeout=10) as response:
-            response.raise_for_status()
-            img_bytes = response.content
+        img_bytes = thumb_future.result()
 
         # --- SAFETY A: hard cap per-image payload (default 1 MB) ---
         MAX_IMAGE_KB = int(os.getenv("MAX_IMAGE_KB", "1024"))
@@ -376,10 +432,31 @@ def get_commons_thumb(genus: str,
                     img_bytes = buf.getvalue()
             except Exception as e:
                 print(f"[safety] shrink failed: {e}")
-                return (None,) * 6
+                return _miss(negative_cache.OVERSIZED, str(e))
             if len(img_bytes) > MAX_IMAGE_KB * 1024:
                 # Still too large? Bail to avoid unexpected egress.
-                return (None,) * 6
+                return _miss(negative_cache.OVERSIZED, f"{len(img_bytes) // 1024} kB")
+
+        if effective_remove and img_bytes and bg_jobs.ENABLED:
+            # Raw first: cache the untouched thumbnail, return the processed name
+            # (served from the raw file until ready) and run rembg in the background
+            meta = {
+                "author": author,
+                "licence": licence,
+                "licence_url": licence_url,
+                "upload_date": upload_date,
+                "retrieval_date": retrieval_date,
+            }
+            raw_stem = url_to_stem(f"{title_plain}_{width}_raw")
+            try:
+                save_image_to_cache(raw_stem, img_bytes)
+                save_metadata_to_cache(raw_stem, meta, "raw")
+                enforce_cache_limit()
+                bg_jobs.enqueue(get_cached_image_path(raw_stem), stem, meta)
+                return (f"/cached-images/{stem}.webp",
+                        author, licence, licence_url, upload_date, retrieval_date)
+            except Exception as e:
+                print(f"[bg] Raw-first caching failed for {title_plain}, processing inline: {e}")
 
         if effective_remove and img_bytes:
             # Pre-resize BEFORE rembg to cap memory/latency
@@ -423,7 +500,8 @@ def get_commons_thumb(genus: str,
             }
             try:
                 save_image_to_cache(stem, img_bytes)         # write image file
-                save_metadata_to_cache(stem, meta)            # write JSON
+                save_metadata_to_cache(stem, meta,            # write JSON
+                                       "processed" if effective_remove else "raw")
                 enforce_cache_limit()                         # optional: evict if needed
                 fname = os.path.basename(get_cached_image_path(stem))
                 return (
@@ -461,7 +539,7 @@ def get_commons_thumb(genus: str,
 
     except Exception as e:
         print(f"[rembg/cache] Failed to process image for {genus} {species}: {e}")
-        return (None,) * 6
+        return _miss(negative_cache.FETCH_ERROR, str(e))
 
 
 
@@ -565,7 +643,7 @@ def get_commons_thumb(genus: str,
 
 def remove_background_base64(image_url: str, headers: dict = None) -> str | None:
     try:
-        r = requests.get(image_url, headers=headers, timeout=10)
+        r = http_client.get(image_url, headers=headers, timeout=10)
         r.raise_for_status()
         input_data = r.content
 